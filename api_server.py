@@ -0,0 +1,419 @@
+# api_server.py
+
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+
+from config_manager import SETTINGS # Supplies the default host, port and batch pool size
+from calculations import build_nutrition_plan
+from patient_validation import validate_patient_request
+from food_catalogue import parse_predicate
+from logger_config import app_logger, setup_logging
+from metrics import REGISTRY, PLANS_COMPUTED, CALCULATION_SECONDS, SEARCH_SECONDS, WIKI_SEARCHES, CACHE_REQUESTS, VALIDATION_FAILURES
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+BATCH_CHUNK_SIZE = 500 # Patients per process-pool task for POST /plans/batch
+LATENCY_WINDOW = 10000 # Most recent request latencies kept per route for the percentiles
+
+class ApiError(Exception):
+    # Raised by handlers to answer with an error status and a JSON {"error": message} body
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class RouteStats:
+    # Request count, error count and a rolling window of latencies (ms) for one route
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, elapsed_ms, failed):
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.latencies_ms.append(elapsed_ms)
+
+    def summary(self):
+        ordered = sorted(self.latencies_ms)
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3) if ordered else None
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1], 3) if ordered else None
+        }
+
+def plan_response(patient_data):
+    # Runs the same calculation as the GUIs and returns it with the validated inputs it used
+    return {"patient": patient_data, "plan": build_nutrition_plan(patient_data)}
+
+def _plan_batch(payloads):
+    # Process-pool worker: validates and calculates a chunk of patients, one result or error per entry.
+    # A worker's metrics are not the server's, so the chunk's validation failures per field are returned
+    # with the results for the server to count.
+    failures_before = VALIDATION_FAILURES.values()
+    results = []
+    for payload in payloads:
+        is_valid, patient_data, error_message = validate_patient_request(payload)
+        results.append(plan_response(patient_data) if is_valid else {"error": error_message})
+    failures = {
+        labels: count - failures_before.get(labels, 0)
+        for labels, count in VALIDATION_FAILURES.values().items() if count != failures_before.get(labels, 0)
+    }
+    return results, failures
+
+class NutritionApi:
+    def __init__(self, batch_processes=None):
+        # Routes are matched on (method, path); each handler takes (query, body) and returns a JSON-able object
+        self.routes = {
+            ("POST", "/plan"): self.handle_plan,
+            ("POST", "/plans/batch"): self.handle_batch,
+            ("POST", "/meal-plan"): self.handle_meal_plan,
+            ("POST", "/scenarios"): self.handle_scenarios,
+            ("GET", "/foods"): self.handle_foods,
+            ("GET", "/substitutes"): self.handle_substitutes,
+            ("GET", "/stats"): self.handle_stats,
+            ("GET", "/metrics"): self.handle_metrics
+        }
+        self.stats = {f"{method} {path}": RouteStats() for method, path in self.routes}
+        self.batch_processes = batch_processes
+        self.process_pool = None # Created in start(), before any connection is accepted
+        self.food_catalogue = None # Food Wiki loaded once, on the first search or meal plan
+        self.nutrient_matrix = None # Built from the catalogue on the first meal plan
+        self.substitution_index = None # Built from the catalogue on the first substitution query
+        self.food_lock = asyncio.Lock()
+        self.server = None
+
+    async def start(self, host=None, port=None):
+        api_settings = SETTINGS.get("api", {})
+        host = host or api_settings.get("host", "127.0.0.1")
+        port = api_settings.get("port", 8000) if port is None else port
+        self.process_pool = self._create_process_pool()
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        app_logger.info(f"API listening on {self.address}")
+        return self.server
+
+    def _create_process_pool(self):
+        # Workers are started from a clean forkserver (or spawned) process rather than forked from the
+        # server, so they never hold copies of the listening or client sockets: a forked copy would keep
+        # a "Connection: close" socket open after the server closed it and the client would wait forever.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor # Only batch requests need the process machinery
+        processes = self.batch_processes or SETTINGS.get("api", {}).get("batch_processes")
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(max_workers=processes or None, mp_context=multiprocessing.get_context(method))
+
+    @property
+    def address(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.process_pool:
+            self.process_pool.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        # Serves requests on one connection until the client closes it or asks for "Connection: close"
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(self._format_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ApiError as e:
+            # Malformed framing: answer once, then drop the connection
+            writer.write(self._format_response(e.status, {"error": e.message}, False))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass # Client went away, or the server is shutting down
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # Parses one HTTP/1.1 request; returns None when the client has closed the connection
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ApiError(400, "Malformed request line.")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ApiError(400, "Invalid Content-Length header.")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    def _format_response(self, status, payload, keep_alive):
+        # Strings are sent as plain text (the /metrics exposition format); everything else as JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    async def dispatch(self, method, target, body):
+        # Finds the handler for a request, times it and turns exceptions into JSON error responses
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {"error": f"Method {method} is not allowed for {url.path}."}
+            return 404, {"error": f"No route for {url.path}."}
+
+        started = time.perf_counter()
+        try:
+            status, payload = 200, await handler(parse_qs(url.query), body)
+        except ApiError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:
+            app_logger.exception(f"API request {method} {url.path} failed")
+            status, payload = 500, {"error": f"Internal error: {e}"}
+        self.stats[f"{method} {url.path}"].record((time.perf_counter() - started) * 1000, status >= 400)
+        return status, payload
+
+    def _parse_json(self, body):
+        try:
+            return json.loads(body or b"null")
+        except ValueError:
+            raise ApiError(400, "Request body must be valid JSON.")
+
+    async def handle_plan(self, query, body):
+        # A single plan takes microseconds, so it is calculated inline on the event loop
+        is_valid, patient_data, error_message = validate_patient_request(self._parse_json(body))
+        if not is_valid:
+            raise ApiError(400, error_message)
+        with CALCULATION_SECONDS.time(labels=("api",)):
+            response = plan_response(patient_data)
+        PLANS_COMPUTED.inc(labels=("api",))
+        return response
+
+    async def handle_batch(self, query, body):
+        # Splits the patients into chunks calculated in parallel by the process pool
+        request = self._parse_json(body)
+        patients = request.get("patients") if isinstance(request, dict) else request
+        if not isinstance(patients, list):
+            raise ApiError(400, "Expected a JSON list of patients or an object with a 'patients' list.")
+
+        loop = asyncio.get_running_loop()
+        chunks = [patients[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(patients), BATCH_CHUNK_SIZE)]
+        chunk_results = await asyncio.gather(
+            *(loop.run_in_executor(self.process_pool, _plan_batch, chunk) for chunk in chunks)
+        )
+        results = [result for chunk, _ in chunk_results for result in chunk]
+        for _, failures in chunk_results:
+            for labels, count in failures.items():
+                VALIDATION_FAILURES.inc(count, labels=labels)
+        errors = sum(1 for result in results if "error" in result)
+        PLANS_COMPUTED.inc(len(results) - errors, labels=("api_batch",))
+        return {"count": len(results), "errors": errors, "results": results}
+
+    async def handle_meal_plan(self, query, body):
+        # Calculates a patient's plan and assembles a day menu from the Food Wiki to meet it
+        is_valid, patient_data, error_message = validate_patient_request(self._parse_json(body))
+        if not is_valid:
+            raise ApiError(400, error_message)
+        response = plan_response(patient_data)
+        PLANS_COMPUTED.inc(labels=("api",))
+
+        catalogue = await self._get_food_catalogue()
+        loop = asyncio.get_running_loop()
+        if self.nutrient_matrix is None:
+            self.nutrient_matrix = await loop.run_in_executor(None, self._build_nutrient_matrix, catalogue)
+        if not len(self.nutrient_matrix.indices):
+            raise ApiError(503, "No Food Wiki items have energy, protein, carbohydrate and fat values to plan with.")
+
+        from meal_planner import plan_day
+        response["menu"] = await loop.run_in_executor(None, plan_day, self.nutrient_matrix, response["plan"], catalogue)
+        return response
+
+    async def handle_scenarios(self, query, body):
+        # What-if sweep: {"patients": [...]} (or one "patient") and a "grid" of parameter lists, e.g.
+        # {"weight_loss_deficit_kcal": [250, 500, 750], "activity_factor": [1.2, 1.55]}; one summary row per scenario
+        request = self._parse_json(body)
+        if not isinstance(request, dict):
+            raise ApiError(400, "Expected a JSON object with 'patients' (or 'patient') and 'grid'.")
+        payloads = request.get("patients") if "patients" in request else [request.get("patient")]
+        if not isinstance(payloads, list) or not payloads:
+            raise ApiError(400, "'patients' must be a non-empty list of patients.")
+        patients = []
+        for i, payload in enumerate(payloads):
+            is_valid, patient_data, error_message = validate_patient_request(payload)
+            if not is_valid:
+                raise ApiError(400, f"Patient {i}: {error_message}")
+            patients.append(patient_data)
+        grid = request.get("grid") or {}
+        if not isinstance(grid, dict):
+            raise ApiError(400, "'grid' must be an object of parameter lists.")
+
+        loop = asyncio.get_running_loop()
+        scenarios = await loop.run_in_executor(None, self._sweep_scenarios, patients, grid)
+        return {"patients": len(patients), "count": len(scenarios), "scenarios": scenarios}
+
+    def _sweep_scenarios(self, patients, grid):
+        try:
+            from scenario_sweep import patient_arrays, scenario_grid, summarise_sweep # Imported here so plan-only deployments do not need NumPy
+        except ImportError as e:
+            raise ApiError(503, f"Scenario sweeps are unavailable: {e}")
+        try:
+            scenarios = scenario_grid(grid)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        return summarise_sweep(patient_arrays(patients), scenarios)
+
+    def _build_nutrient_matrix(self, catalogue):
+        try:
+            from meal_planner import build_nutrient_matrix # Imported here so plan-only deployments do not need NumPy
+        except ImportError as e:
+            raise ApiError(503, f"Meal planning is unavailable: {e}")
+        return build_nutrient_matrix(catalogue)
+
+    async def _get_food_catalogue(self):
+        # Loads the Food Wiki once, on the first request that needs it
+        if self.food_catalogue is None:
+            async with self.food_lock:
+                if self.food_catalogue is None:
+                    CACHE_REQUESTS.inc(labels=("api_foods", "miss"))
+                    self.food_catalogue = await asyncio.get_running_loop().run_in_executor(None, self._load_foods)
+                    return self.food_catalogue
+        CACHE_REQUESTS.inc(labels=("api_foods", "hit"))
+        return self.food_catalogue
+
+    async def handle_foods(self, query, body):
+        # Searches the Food Wiki by item name or type and/or nutrient ranges, e.g.
+        # GET /foods?q=milk&limit=20 or GET /foods?category=Beverage&where=sugar<5&where=sodium<50
+        catalogue = await self._get_food_catalogue()
+        WIKI_SEARCHES.inc(labels=("api",))
+
+        search = query.get("q", [""])[0]
+        category = query.get("category", [None])[0]
+        try:
+            limit = int(query.get("limit", ["50"])[0])
+        except ValueError:
+            raise ApiError(400, "limit must be a whole number.")
+        try:
+            predicates = [parse_predicate(text) for text in query.get("where", [])]
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+        with SEARCH_SECONDS.time():
+            matches = catalogue.query(search, predicates, category)
+        items = [catalogue[index].to_dict() for index in matches[:limit]]
+        return {"count": len(matches), "items": items}
+
+    async def handle_substitutes(self, query, body):
+        # Healthier alternatives of the same Type, e.g. GET /substitutes?item=22&condition=hypertension&k=5;
+        # "kind" is "similar" when no condition (or one with no nutrients to judge by) was given
+        try:
+            index = int(query.get("item", [""])[0])
+            k = int(query.get("k", [str(SETTINGS.get("substitutions", {}).get("top_k", 5))])[0])
+        except ValueError:
+            raise ApiError(400, "item and k must be whole numbers.")
+        condition = query.get("condition", [None])[0]
+        if condition is not None and condition not in SETTINGS["macro_percentages"]:
+            raise ApiError(400, f"Unknown condition '{condition}'.")
+
+        catalogue = await self._get_food_catalogue()
+        if not 0 <= index < len(catalogue):
+            raise ApiError(404, f"No Food Wiki item {index}.")
+        if self.substitution_index is None:
+            self.substitution_index = await asyncio.get_running_loop().run_in_executor(None, self._build_substitution_index, catalogue)
+
+        with SEARCH_SECONDS.time():
+            substitutes = self.substitution_index.substitutes(index, condition, k)
+        healthier = bool(SETTINGS.get("substitutions", {}).get("condition_nutrients", {}).get(condition))
+        return {
+            "item": catalogue[index].to_dict(),
+            "kind": "healthier" if healthier else "similar",
+            "substitutes": [{"index": i, "distance": round(distance, 4), **catalogue[i].to_dict()} for i, distance in substitutes]
+        }
+
+    def _build_substitution_index(self, catalogue):
+        try:
+            from substitutions import SubstitutionIndex # Imported here so plan-only deployments do not need NumPy
+        except ImportError as e:
+            raise ApiError(503, f"Substitutions are unavailable: {e}")
+        return SubstitutionIndex(catalogue)
+
+    def _load_foods(self):
+        # Reads the workbook once into the compact catalogue
+        try:
+            # Imported here so plan-only deployments do not need pandas
+            from food_data import build_shared_food_data
+            return build_shared_food_data().catalogue
+        except (ImportError, FileNotFoundError, ValueError) as e:
+            raise ApiError(503, f"Food Wiki data is unavailable: {e}")
+
+    async def handle_stats(self, query, body):
+        # Per-route request counts and latency percentiles since the server started
+        return {route: stats.summary() for route, stats in self.stats.items()}
+
+    async def handle_metrics(self, query, body):
+        # Application-wide counters and latency histograms in the Prometheus text format
+        return REGISTRY.render_text()
+
+async def serve(host=None, port=None, batch_processes=None):
+    setup_logging()
+    api = NutritionApi(batch_processes)
+    await api.start(host, port)
+    print(f"Nutrition API listening on {api.address} (Ctrl+C to stop)")
+    try:
+        await api.server.serve_forever()
+    finally:
+        await api.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the nutrition calculations as a local HTTP/JSON API.")
+    parser.add_argument("--host", help="Interface to bind (defaults to the one in settings.json)")
+    parser.add_argument("--port", type=int, help="Port to listen on (defaults to the one in settings.json)")
+    parser.add_argument("--processes", type=int, help="Worker processes for batch requests")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.processes))
+    except KeyboardInterrupt:
+        pass
@@ -1,19 +1,38 @@
 # app_steamlit.py
 
+import time
+
 import streamlit as st
-from user_input import show_calculator
-from food_wiki import show_food_wiki
+
+from metrics import PAGE_RENDER_SECONDS # Per-page rerun latency
 
 st.set_page_config(page_title="Nutrition Therapy App", layout="centered")
 
-# Defines the tabs
-tab1, tab2, tab3 = st.tabs(["Nutrition Calculator", "Food Wiki", "Ingredient Scanner"])
+PAGES = ("Nutrition Calculator", "Food Wiki", "Intake Log", "Progress", "Cohort Analytics", "Scenario Sweep", "Ingredient Scanner")
 
-with tab1:
-    show_calculator()
+# st.tabs runs the code of every tab on each rerun; a selector lets only the chosen page execute
+page = st.radio("Page", PAGES, horizontal=True, label_visibility="collapsed", key="page")
 
-with tab2: # UNCOMMENTED: Display the Food Wiki content
+started = time.perf_counter()
+if page == "Nutrition Calculator":
+    from user_input import show_calculator # Page modules (and pandas/PIL behind the Food Wiki) load on first visit
+    show_calculator()
+elif page == "Food Wiki":
+    from food_wiki import show_food_wiki
     show_food_wiki()
-
-# with tab3:
-    # show_OCR_scanner()
\ No newline at end of file
+elif page == "Intake Log":
+    from intake_tracker import show_intake_log
+    show_intake_log()
+elif page == "Progress":
+    from progress_charts import show_progress
+    show_progress()
+elif page == "Cohort Analytics":
+    from cohort_dashboard import show_cohort_analytics
+    show_cohort_analytics()
+elif page == "Scenario Sweep":
+    from scenario_explorer import show_scenario_sweep
+    show_scenario_sweep()
+else:
+    st.info("The Ingredient Scanner is not available yet.")
+    # show_OCR_scanner()
+PAGE_RENDER_SECONDS.observe(time.perf_counter() - started, labels=(page,))
@@ -1,5 +1,17 @@
 # calculations.py
+import re
+
 from config_manager import SETTINGS # Accesses configuration values like macro percentages.
+from energy_equations import calculate_patient_bmr, mifflin_st_jeor # Registry of BMR equations
+from condition_rules import compose_profile, patient_conditions # Combines a patient's conditions into one profile
+
+# Nutrients limited by the micronutrient guidelines, and the guideline each limit is read from
+LIMIT_NUTRIENTS = ("sugar", "saturated_fat", "sodium")
+GUIDELINE_NAMES = {"sugar": "Added Sugars", "saturated_fat": "Saturated Fat", "sodium": "Sodium"}
+KCAL_PER_GRAM = {"sugar": 4, "saturated_fat": 9}
+
+MG_PER_DAY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*mg/day")
+PERCENT_OF_CALORIES_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*of total calories")
 
 def calculate_bmi(weight_kg, height_cm):
     # Calculates Body Mass Index (BMI).
@@ -23,17 +35,14 @@ def classify_bmi(bmi):
 
 def calculate_bmr(age, sex, weight_kg, height_cm):
     # Calculates Basal Metabolic Rate (BMR) using the Mifflin-St Jeor equation.
-    if sex == 'M':
-        bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + 5
-    else:
-        bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) - 161
-    return bmr
+    # Plans use calculate_patient_bmr, which picks the equation configured for the patient.
+    return mifflin_st_jeor(age, sex, weight_kg, height_cm)
 
 def calculate_tdee(bmr, activity_factor):
     # Calculates Total Daily Energy Expenditure (TDEE)
     return bmr * activity_factor
 
-def get_macro_recommendations(calories, macro_percentages, weight_kg=None):
+def get_macro_recommendations(calories, macro_percentages, weight_kg=None, protein_g_per_kg=None):
     # Calculates the recommended daily intake for protein, carbohydrates, and fats in grams
     CALORIES_PER_GRAM = {
         "protein": 4,
@@ -41,23 +50,98 @@ def get_macro_recommendations(calories, macro_percentages, weight_kg=None):
         "fat": 9
     }
 
-    protein_g = (calories * macro_percentages["protein"]) / CALORIES_PER_GRAM["protein"]
-    carb_g = (calories * macro_percentages["carb"]) / CALORIES_PER_GRAM["carb"]
-    fat_g = (calories * macro_percentages["fat"]) / CALORIES_PER_GRAM["fat"]
+    if protein_g_per_kg is None or weight_kg is None:
+        protein_pct = macro_percentages["protein"]
+        carb_pct = macro_percentages["carb"]
+        fat_pct = macro_percentages["fat"]
+    else:
+        # Protein set in g/kg body weight (capped by any protein share that also applies); carbohydrates
+        # keep their share where it still fits and fat takes the calories left
+        protein_g = protein_g_per_kg * weight_kg
+        if macro_percentages.get("protein") is not None:
+            protein_g = min(protein_g, calories * macro_percentages["protein"] / CALORIES_PER_GRAM["protein"])
+        protein_pct = protein_g * CALORIES_PER_GRAM["protein"] / calories
+        carb_pct = min(macro_percentages["carb"], max(0.0, 1 - protein_pct))
+        fat_pct = max(0.0, 1 - protein_pct - carb_pct)
+
+    protein_g = (calories * protein_pct) / CALORIES_PER_GRAM["protein"]
+    carb_g = (calories * carb_pct) / CALORIES_PER_GRAM["carb"]
+    fat_g = (calories * fat_pct) / CALORIES_PER_GRAM["fat"]
 
-    # Protein calculation could be further refined based on g/kg body weight for specific cases
     return {
         "protein_g": protein_g,
         "carb_g": carb_g,
         "fat_g": fat_g,
-        "protein_pct": macro_percentages["protein"],
-        "carb_pct": macro_percentages["carb"],
-        "fat_pct": macro_percentages["fat"]
+        "protein_pct": protein_pct,
+        "carb_pct": carb_pct,
+        "fat_pct": fat_pct
     }
 
-def get_micronutrient_guidelines(medical_condition):
+def get_micronutrient_guidelines(medical_condition, medical_conditions=None):
     # Access the micronutrient_guidelines from the loaded SETTINGS
+    if medical_conditions:
+        # Several conditions: their guidelines combined, most restrictive first
+        return compose_profile(tuple(medical_conditions)).micronutrient_guidelines
     all_guidelines = SETTINGS.get("micronutrient_guidelines", {})
     
     # Return specific guidelines if available, otherwise fall back to general
-    return all_guidelines.get(medical_condition, all_guidelines.get("general", {}))
\ No newline at end of file
+    return all_guidelines.get(medical_condition, all_guidelines.get("general", {}))
+
+def get_nutrient_limits(guidelines, calories, strict_limit_pct=None):
+    # Daily limits (g, or mg for sodium) read from a condition's micronutrient guideline texts,
+    # e.g. "<2300 mg/day" or "<7% of total calories"; "Minimize strictly" uses strict_limit_pct.
+    # Nutrients without a readable limit are unlimited (inf).
+    if strict_limit_pct is None:
+        strict_limit_pct = SETTINGS.get("meal_planner", {}).get("strict_limit_pct", 5)
+    limits = {}
+    for key in LIMIT_NUTRIENTS:
+        text = str(guidelines.get(GUIDELINE_NAMES[key], ""))
+        mg_per_day = MG_PER_DAY_PATTERN.search(text)
+        percent = PERCENT_OF_CALORIES_PATTERN.search(text)
+        if key == "sodium" and mg_per_day:
+            limits[key] = float(mg_per_day.group(1))
+        elif key in KCAL_PER_GRAM and (percent or "minimize" in text.lower()):
+            pct = float(percent.group(1)) if percent else strict_limit_pct
+            limits[key] = calories * pct / 100 / KCAL_PER_GRAM[key]
+        else:
+            limits[key] = float("inf")
+    return limits
+
+def calculate_adjusted_tdee(tdee, weight_goal, sex):
+    # Applies the configured calorie deficit/surplus for the weight goal; returns (adjusted TDEE,
+    # whether a weight-loss target was raised to the minimum calorie intake)
+    if weight_goal == "loss":
+        adjusted_tdee = tdee - SETTINGS["calorie_adjustments"]["weight_loss_deficit_kcal"]
+
+        # Enforce a minimum calorie intake for safety, based on gender
+        min_cal = SETTINGS["min_calories"]["female"] if sex == "F" else SETTINGS["min_calories"]["male"]
+        return max(adjusted_tdee, min_cal), adjusted_tdee < min_cal
+    elif weight_goal == "gain":
+        return tdee + SETTINGS["calorie_adjustments"]["weight_gain_surplus_kcal"], False
+    return tdee, False
+
+def build_nutrition_plan(patient_data):
+    # Runs the full calculation pipeline on validated patient data and returns the results dictionary
+    weight_kg = patient_data["weight_kg"]
+    height_cm = patient_data["height_cm"]
+    sex = patient_data["sex"]
+
+    bmi = calculate_bmi(weight_kg, height_cm)
+    bmr, bmr_equation = calculate_patient_bmr(patient_data)
+    tdee = calculate_tdee(bmr, patient_data["activity_factor"])
+    adjusted_tdee, at_minimum = calculate_adjusted_tdee(tdee, patient_data["weight_goal"], sex)
+
+    # Macronutrient and micronutrient rules of all the patient's conditions combined (cached per condition set)
+    profile = compose_profile(patient_conditions(patient_data))
+
+    return {
+        "bmi": bmi,
+        "bmi_classification": classify_bmi(bmi),
+        "bmr": bmr,
+        "bmr_equation": bmr_equation,
+        "tdee": tdee,
+        "adjusted_tdee": adjusted_tdee,
+        "at_minimum": at_minimum,
+        "macros": get_macro_recommendations(adjusted_tdee, profile.macro_percentages, weight_kg, profile.protein_g_per_kg),
+        "micronutrient_guidelines": profile.micronutrient_guidelines
+    }
@@ -0,0 +1,242 @@
+# cohort_analytics.py
+
+import json
+import os
+from collections import namedtuple
+from datetime import date
+from operator import itemgetter
+
+import numpy as np
+
+from config_manager import SETTINGS # Supplies the column store directory, age bands, calorie bins and chunk size
+
+# Dimensions plans can be grouped by; age bands are applied at query time, so changing them needs no resync
+DIMENSIONS = ("medical_condition", "sex", "age_band", "bmi_classification")
+CATEGORY_COLUMNS = ("medical_condition", "sex", "bmi_classification")
+
+# Column files of the snapshot: name -> (NumPy type, SQL expression over the plans table).
+# Missing numbers are stored as -1 and the plan is left out of the analytics; "day" counts days since DAY_ORIGIN.
+COLUMNS = {
+    "medical_condition": (np.uint8, "medical_condition"),
+    "sex": (np.uint8, "sex"),
+    "bmi_classification": (np.uint8, "bmi_classification"),
+    "age": (np.int16, "IFNULL(age, -1)"),
+    "day": (np.int32, "created_at"),
+    "bmi": (np.float32, "IFNULL(bmi, -1)"),
+    "target": (np.float32, "IFNULL(adjusted_tdee, -1)")
+}
+MANIFEST = "manifest.json"
+DAY_ORIGIN = date(2000, 1, 1)
+
+# Per-cell sums kept in the cube: plan count, then the sums behind each mean and standard deviation
+CUBE_SUMS = ("plans", "bmi", "bmi_sq", "target", "target_sq")
+
+# Dense aggregate of the plans: each array in `sums` has one axis per dimension (in DIMENSIONS order)
+# plus a last axis of calorie-target bins of `bin_kcal` each, starting at 0 kcal
+CohortCube = namedtuple("CohortCube", ("labels", "sums", "bin_kcal"))
+
+def _options():
+    options = SETTINGS.get("cohort", {})
+    return {
+        "columns_dir": options.get("columns_dir", "cohort_store"),
+        "age_bands": list(options.get("age_bands", [18, 30, 45, 60, 75])),
+        "calorie_bin_kcal": options.get("calorie_bin_kcal", 50),
+        "max_calories": options.get("max_calories", 6000),
+        "chunk_plans": options.get("chunk_plans", 1000000)
+    }
+
+def age_band_labels(edges):
+    # [18, 30, 45] -> ["<18", "18-29", "30-44", "45+"]
+    if not edges:
+        return ["all"]
+    return [f"<{edges[0]}"] + [f"{low}-{high - 1}" for low, high in zip(edges, edges[1:])] + [f"{edges[-1]}+"]
+
+def _read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {"max_id": 0, "rows": 0, "labels": {column: [] for column in CATEGORY_COLUMNS}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def sync_plan_columns(store, directory=None, batch_size=100000):
+    # Appends the plans stored since the last sync to the column snapshot (one raw file per column),
+    # so only new plans are ever read from SQLite. The manifest is written last: a sync interrupted
+    # halfway leaves extra bytes that the next sync truncates. Returns the number of plans added.
+    directory = directory or _options()["columns_dir"]
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory)
+    lookups = {column: {label: code for code, label in enumerate(manifest["labels"][column])} for column in CATEGORY_COLUMNS}
+
+    files = {}
+    for name, (dtype, _) in COLUMNS.items():
+        f = open(os.path.join(directory, f"{name}.bin"), "ab")
+        f.truncate(manifest["rows"] * np.dtype(dtype).itemsize)
+        files[name] = f
+
+    cursor = store.connection.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"SELECT id, {', '.join(sql for _, sql in COLUMNS.values())} FROM plans WHERE id > ? ORDER BY id",
+        (manifest["max_id"],)
+    )
+    added = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            # Transposed one column at a time: zip(*rows) over a million rows is several times slower
+            columns = [list(map(itemgetter(i), rows)) for i in range(len(COLUMNS) + 1)]
+            for (name, (dtype, _)), values in zip(COLUMNS.items(), columns[1:]):
+                if name == "day":
+                    # Dates are parsed by NumPy rather than SQLite's julianday(), which costs more than the fetch
+                    days = np.array(values, dtype="U10").astype("datetime64[D]") - np.datetime64(DAY_ORIGIN)
+                    array = days.astype(dtype)
+                elif name in lookups:
+                    # Each distinct label is coded once; rows are then mapped through the dict in C
+                    lookup = lookups[name]
+                    for label in set(values) - lookup.keys():
+                        lookup[label] = len(lookup)
+                    array = np.fromiter(map(lookup.__getitem__, values), dtype=dtype, count=len(values))
+                else:
+                    array = np.array(values, dtype=dtype)
+                files[name].write(array.tobytes())
+            added += len(rows)
+            manifest["max_id"] = columns[0][-1]
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest["rows"] += added
+    manifest["labels"] = {column: [str(label) for label in lookup] for column, lookup in lookups.items()}
+    with open(os.path.join(directory, MANIFEST + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(directory, MANIFEST + ".tmp"), os.path.join(directory, MANIFEST))
+    return added
+
+def load_cohort_cube(directory=None, since=None, until=None, chunk_plans=None):
+    # Folds the column snapshot into a CohortCube, reading the memory-mapped columns `chunk_plans`
+    # rows at a time so memory stays bounded by the chunk and cube size, not the number of plans.
+    # `since`/`until` (YYYY-MM-DD) restrict the plans by creation date.
+    options = _options()
+    directory = directory or options["columns_dir"]
+    chunk_plans = chunk_plans or options["chunk_plans"]
+    bin_kcal = options["calorie_bin_kcal"]
+    edges = np.array(options["age_bands"])
+    manifest = _read_manifest(directory)
+    labels = {
+        "medical_condition": manifest["labels"]["medical_condition"],
+        "sex": manifest["labels"]["sex"],
+        "age_band": age_band_labels(options["age_bands"]),
+        "bmi_classification": manifest["labels"]["bmi_classification"]
+    }
+    shape = tuple(len(labels[dimension]) for dimension in DIMENSIONS) + (int(options["max_calories"] // bin_kcal) + 1,)
+    sums = {name: np.zeros(int(np.prod(shape))) for name in CUBE_SUMS}
+
+    rows = manifest["rows"]
+    columns = {
+        name: np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,)) if rows else np.zeros(0, dtype=dtype)
+        for name, (dtype, _) in COLUMNS.items()
+    }
+    first_day = (date.fromisoformat(since) - DAY_ORIGIN).days if since else None
+    last_day = (date.fromisoformat(until) - DAY_ORIGIN).days if until else None
+
+    for start in range(0, rows, chunk_plans):
+        chunk = {name: column[start:start + chunk_plans] for name, column in columns.items()}
+        keep = (chunk["age"] >= 0) & (chunk["bmi"] >= 0) & (chunk["target"] >= 0)
+        if first_day is not None:
+            keep &= chunk["day"] >= first_day
+        if last_day is not None:
+            keep &= chunk["day"] <= last_day
+        bmi = chunk["bmi"][keep].astype(np.float64)
+        target = chunk["target"][keep].astype(np.float64)
+        cells = np.ravel_multi_index((
+            chunk["medical_condition"][keep], chunk["sex"][keep],
+            np.digitize(chunk["age"][keep], edges), chunk["bmi_classification"][keep],
+            np.minimum(target // bin_kcal, shape[-1] - 1).astype(np.intp)
+        ), shape)
+        for name, weights in (("plans", None), ("bmi", bmi), ("bmi_sq", bmi * bmi), ("target", target), ("target_sq", target * target)):
+            sums[name] += np.bincount(cells, weights=weights, minlength=len(sums[name]))
+
+    return CohortCube(labels, {name: values.reshape(shape) for name, values in sums.items()}, bin_kcal)
+
+def group_by(cube, dimensions=(), percentiles=(10, 50, 90)):
+    # One row per non-empty combination of `dimensions` (largest group first): the plan count and
+    # share, mean and standard deviation of BMI and target calories, and target percentiles
+    # (to the calorie bin width). Every group comes from one sum over the other axes of the cube.
+    other_axes = tuple(i for i, dimension in enumerate(DIMENSIONS) if dimension not in dimensions)
+    order = [DIMENSIONS.index(dimension) for dimension in dimensions]
+    grouped = {}
+    for name, values in cube.sums.items():
+        values = values.sum(axis=other_axes) # Axes left: the grouped dimensions (in DIMENSIONS order) and the bins
+        values = np.moveaxis(values, np.argsort(np.argsort(order)), range(len(order))) if order else values
+        grouped[name] = values.reshape(-1, values.shape[-1])
+    histogram = grouped["plans"]
+    totals = {name: values.sum(axis=1) for name, values in grouped.items()}
+    plans = totals["plans"]
+    total_plans = plans.sum()
+    present = np.flatnonzero(plans)
+    if not len(present):
+        return []
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats = {}
+        for name in ("bmi", "target"):
+            mean = totals[name] / plans
+            stats[f"{name}_mean"] = mean
+            stats[f"{name}_std"] = np.sqrt(np.maximum(totals[f"{name}_sq"] / plans - mean ** 2, 0))
+        cumulative = np.cumsum(histogram, axis=1)
+        for q in percentiles:
+            stats[f"target_p{q}"] = (np.argmax(cumulative >= plans[:, None] * q / 100, axis=1) + 0.5) * cube.bin_kcal
+
+    shape = tuple(len(cube.labels[dimension]) for dimension in dimensions)
+    rows = []
+    for g in present[np.argsort(-plans[present], kind="stable")].tolist():
+        indices = np.unravel_index(g, shape) if shape else ()
+        row = {dimension: cube.labels[dimension][i] for dimension, i in zip(dimensions, indices)}
+        row["plans"] = int(plans[g])
+        row["share"] = float(plans[g] / total_plans)
+        row.update({name: round(float(values[g]), 1) for name, values in stats.items()})
+        rows.append(row)
+    return rows
+
+def calorie_histogram(cube, **filters):
+    # Plan counts per calorie-target bin, optionally restricted to dimension labels
+    # (e.g. medical_condition="diabetes"). Returns [(bin start kcal, plans)] for non-empty bins.
+    counts = cube.sums["plans"]
+    for axis, dimension in enumerate(DIMENSIONS):
+        if dimension in filters:
+            labels = cube.labels[dimension]
+            if filters[dimension] not in labels:
+                return []
+            counts = np.take(counts, [labels.index(filters[dimension])], axis=axis)
+    counts = counts.reshape(-1, counts.shape[-1]).sum(axis=0)
+    return [(int(i * cube.bin_kcal), int(counts[i])) for i in np.flatnonzero(counts).tolist()]
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from plan_store import PlanStore
+
+    parser = argparse.ArgumentParser(description="Summarise all stored plans by condition, sex, age band and BMI class.")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    parser.add_argument("--columns", help="Column snapshot directory (defaults to the one in settings.json)")
+    parser.add_argument("--by", nargs="*", choices=DIMENSIONS, default=["medical_condition"], help="Dimensions to group by")
+    parser.add_argument("--since", help="Only plans created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Only plans created on or before this date")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    started = time.perf_counter()
+    added = sync_plan_columns(store, args.columns)
+    store.close()
+    synced = time.perf_counter()
+    cube = load_cohort_cube(args.columns, args.since, args.until)
+    loaded = time.perf_counter()
+    rows = group_by(cube, args.by)
+    print(f"Synced {added} new plans in {synced - started:.1f} s; aggregated {int(cube.sums['plans'].sum())} plans "
+          f"in {loaded - synced:.2f} s; grouped in {time.perf_counter() - loaded:.3f} s.")
+    for row in rows:
+        group = " / ".join(str(row[dimension]) for dimension in args.by) or "All plans"
+        print(f"{group:40s} {row['plans']:9d} ({row['share']:6.1%})  BMI {row['bmi_mean']:5.1f} ± {row['bmi_std']:4.1f}  "
+              f"target {row['target_mean']:6.0f} kcal (p10 {row['target_p10']:.0f}, p50 {row['target_p50']:.0f}, p90 {row['target_p90']:.0f})")
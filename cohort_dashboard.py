@@ -0,0 +1,77 @@
+# cohort_dashboard.py
+
+import streamlit as st
+
+from cohort_analytics import DIMENSIONS, calorie_histogram, group_by, load_cohort_cube, sync_plan_columns
+
+DIMENSION_LABELS = {
+    "medical_condition": "Condition",
+    "sex": "Sex",
+    "age_band": "Age band",
+    "bmi_classification": "BMI class"
+}
+
+
+@st.cache_data(ttl=300, show_spinner="Aggregating stored plans...")
+def get_cohort_cube(since, until):
+    """Brings the column snapshot up to date with the plan database and folds it into a cube."""
+    # Cached for five minutes per date range; every grouping on the page is then a sum over the cube
+    from plan_store import PlanStore
+    store = PlanStore()
+    try:
+        sync_plan_columns(store)
+    finally:
+        store.close()
+    return load_cohort_cube(since=since, until=until)
+
+
+def show_cohort_analytics():
+    st.header("Cohort Analytics")
+    st.write("Distributions of BMI classes, conditions and calorie targets across all stored plans.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        since = st.date_input("From", value=None, key="cohort_since")
+    with col2:
+        until = st.date_input("To", value=None, key="cohort_until")
+    cube = get_cohort_cube(since.isoformat() if since else None, until.isoformat() if until else None)
+
+    overall = group_by(cube)
+    if not overall:
+        st.info("No stored plans were found.")
+        return
+    overall = overall[0]
+    cols = st.columns(3)
+    cols[0].metric("Plans", f"{overall['plans']:,}")
+    cols[1].metric("Mean BMI", f"{overall['bmi_mean']:.1f}")
+    cols[2].metric("Median target", f"{overall['target_p50']:.0f} kcal")
+
+    dimensions = st.multiselect(
+        "Group by", DIMENSIONS, default=["medical_condition"], format_func=DIMENSION_LABELS.get, key="cohort_by"
+    )
+    rows = group_by(cube, dimensions)
+    if dimensions:
+        st.subheader("Plans per group")
+        st.bar_chart({
+            "group": [" / ".join(str(row[dimension]) for dimension in dimensions) for row in rows],
+            "plans": [row["plans"] for row in rows]
+        }, x="group", y="plans")
+    st.dataframe(
+        [
+            {
+                **{DIMENSION_LABELS[dimension]: row[dimension] for dimension in dimensions},
+                "Plans": row["plans"], "Share": f"{row['share']:.1%}",
+                "BMI": row["bmi_mean"], "BMI SD": row["bmi_std"],
+                "Target (kcal)": row["target_mean"], "Target SD": row["target_std"],
+                "P10": row["target_p10"], "Median": row["target_p50"], "P90": row["target_p90"]
+            }
+            for row in rows
+        ],
+        hide_index=True
+    )
+
+    st.subheader("Calorie targets")
+    condition = st.selectbox("Condition", ["All"] + cube.labels["medical_condition"], key="cohort_condition")
+    histogram = calorie_histogram(cube, **({} if condition == "All" else {"medical_condition": condition}))
+    if histogram:
+        st.bar_chart({"kcal": [start for start, _ in histogram], "plans": [count for _, count in histogram]}, x="kcal", y="plans")
@@ -0,0 +1,88 @@
+# condition_rules.py
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from config_manager import SETTINGS # Supplies the per-condition macros, guidelines, g/kg protein and precedence
+
+# Numbers given in mg/day or % of calories in a guideline text, e.g. "<2000 mg/day" or "<7% of total calories"
+LIMIT_VALUE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:mg/day|%)")
+
+# The rules a set of conditions composes into. conditions is the set in precedence order ("general" only
+# when alone) and primary the first of them. macro_percentages holds the most restrictive protein share
+# among the conditions that set protein as a share (None if all set it in g/kg) and the lowest carbohydrate
+# share, with fat taking the rest; protein_g_per_kg is the lowest g/kg among the conditions that set one.
+ConditionProfile = namedtuple("ConditionProfile", (
+    "conditions", "primary", "macro_percentages", "protein_g_per_kg", "micronutrient_guidelines"
+))
+
+def patient_conditions(patient_data):
+    # All of a patient's conditions as a tuple: `medical_conditions` if given, else their one `medical_condition`
+    return tuple(patient_data.get("medical_conditions") or (patient_data.get("medical_condition") or "general",))
+
+def _limit_value(text):
+    # How strict a limit guideline is, as a sort key (lower is stricter): its lowest stated limit, so
+    # "<2300 mg/day (aim for <1500 mg/day)" counts as 1500; on equal limits the text stating more of them
+    # wins, keeping its extra advice. "Minimize" is strictest, unreadable texts least strict.
+    text = str(text)
+    if "minimi" in text.lower():
+        return (0.0, 0)
+    values = [float(value) for value in LIMIT_VALUE_PATTERN.findall(text)]
+    return (min(values), -len(values)) if values else (float("inf"), 0)
+
+def order_conditions(conditions):
+    # Removes duplicates and "general" (when other conditions are present) and sorts by the configured
+    # precedence; conditions missing from the precedence list follow in the order given
+    precedence = SETTINGS.get("condition_rules", {}).get("precedence", [])
+    unique = list(dict.fromkeys(conditions))
+    if len(unique) > 1:
+        unique = [condition for condition in unique if condition != "general"] or ["general"]
+    rank = {condition: i for i, condition in enumerate(precedence)}
+    return tuple(sorted(unique, key=lambda condition: rank.get(condition, len(precedence))))
+
+def compose_profile(conditions):
+    # The ConditionProfile for a tuple of condition keys. Cached per condition tuple and settings
+    # generation, so batch runs compose each combination once and SETTINGS.reload() starts afresh.
+    return _compose_profile(conditions, SETTINGS.generation)
+
+@lru_cache(maxsize=None)
+def _compose_profile(conditions, generation):
+    # Per nutrient, the most restrictive rule wins: the lowest protein, carbohydrate share and limit
+    # (e.g. sodium mg/day); other guidelines come from the condition with the highest precedence.
+    rules = SETTINGS.get("condition_rules", {})
+    all_macros = SETTINGS["macro_percentages"]
+    all_guidelines = SETTINGS.get("micronutrient_guidelines", {})
+    protein_g_per_kg = rules.get("protein_g_per_kg", {})
+    limit_guidelines = set(rules.get("limit_guidelines", ()))
+
+    ordered = order_conditions(conditions)
+    macros = [all_macros.get(condition, all_macros["general"]) for condition in ordered]
+    if len(ordered) == 1:
+        macro_percentages = dict(macros[0])
+    else:
+        macro_percentages = {"carb": min(split["carb"] for split in macros)}
+        shares = [split["protein"] for condition, split in zip(ordered, macros) if condition not in protein_g_per_kg]
+        macro_percentages["protein"] = min(shares) if shares else None
+        macro_percentages["fat"] = round(max(0.0, 1 - macro_percentages["carb"] - (macro_percentages["protein"] or 0)), 6)
+    if any(condition in protein_g_per_kg for condition in ordered):
+        if all(condition in protein_g_per_kg for condition in ordered):
+            macro_percentages["protein"] = None
+        g_per_kg = min(protein_g_per_kg[condition] for condition in ordered if condition in protein_g_per_kg)
+    else:
+        g_per_kg = None
+
+    # Guidelines in order of first appearance; `(strictness, precedence)` picks each nutrient's winner
+    guidelines = {}
+    best = {}
+    for rank, condition in enumerate(ordered):
+        for nutrient, text in all_guidelines.get(condition, all_guidelines.get("general", {})).items():
+            key = (_limit_value(text) if nutrient in limit_guidelines else (0.0, 0), rank)
+            if nutrient not in best or key < best[nutrient]:
+                best[nutrient] = key
+                guidelines[nutrient] = text
+    return ConditionProfile(ordered, ordered[0], macro_percentages, g_per_kg, guidelines)
+
+def profile_for(patient_data):
+    # The composed profile for a patient's conditions
+    return compose_profile(patient_conditions(patient_data))
@@ -2,6 +2,7 @@
 
 import json 
 import os 
+from collections.abc import Mapping
 
 # Specifies the location of the configuration file
 CONFIG_FILE_PATH = 'settings.json'
@@ -63,7 +64,81 @@ def get_default_settings():
         "file_name": "app.log",
         "file_level": "INFO",
         "console_level": "WARNING"
-    }
+    },
+
+    "database": {
+        "file_name": "nutrition.db"
+    },
+
+    "api": {
+        "host": "127.0.0.1",
+        "port": 8000,
+        "batch_processes": None
+    },
+
+    "metrics": {
+        "file_name": None,
+        "write_interval_s": 15
+    },
+
+    "food_wiki": {
+        "catalogue_dir": "food_wiki_store"
+    },
+
+    "meal_planner": {
+        "portion_grams": [50, 100, 150, 200],
+        "max_items": 10,
+        "max_item_energy_share": 0.25,
+        "candidate_pool": 2000,
+        "limit_penalty": 100,
+        "strict_limit_pct": 5,
+        "meal_shares": {"Breakfast": 0.25, "Lunch": 0.35, "Dinner": 0.3, "Snacks": 0.1}
+    },
+
+    "substitutions": {
+        "condition_nutrients": {
+            "general": [],
+            "diabetes": ["sugar"],
+            "renal_disease": ["sodium", "potassium"],
+            "hypertension": ["sodium"],
+            "heart_disease": ["saturated_fat", "sodium"]
+        },
+        "top_k": 5
+    },
+
+    "cohort": {
+        "columns_dir": "cohort_store",
+        "age_bands": [18, 30, 45, 60, 75],
+        "calorie_bin_kcal": 50,
+        "max_calories": 6000,
+        "chunk_plans": 1000000
+    },
+
+    "scenarios": {
+        "max_scenarios": 10000,
+        "chunk_cells": 2000000
+    },
+
+    "projection": {
+        "weeks": 52,
+        "kcal_per_kg": 7700,
+        "in_reports": False
+    },
+
+    "energy_equations": {
+        "default": "mifflin_st_jeor",
+        "paediatric": None,
+        "paediatric_under_age": 18,
+        "by_condition": {}
+    },
+
+    "condition_rules": {
+        "precedence": ["renal_disease", "diabetes", "heart_disease", "hypertension", "general"],
+        "protein_g_per_kg": {"renal_disease": 0.6},
+        "limit_guidelines": ["Sodium", "Added Sugars", "Saturated Fat"]
+    },
+
+    "tag_rules": []
 }
 
 def load_settings():
@@ -108,5 +183,32 @@ def save_settings(settings_to_save):
     except Exception as e:
         print(f"Error: Could not save settings to {CONFIG_FILE_PATH}: {e}")
 
-# Load settings when this module is imported
-SETTINGS = load_settings()
\ No newline at end of file
+class LazySettings(Mapping):
+    # Read-only view of the settings that loads 'settings.json' on first access instead of at import,
+    # so importing a module that uses SETTINGS never touches the disk
+    def __init__(self, loader=load_settings):
+        self._loader = loader
+        self._settings = None
+        self.generation = 0 # Bumped by reload(); caches of values derived from the settings are keyed on it
+
+    def _loaded(self):
+        if self._settings is None:
+            self._settings = self._loader()
+        return self._settings
+
+    def __getitem__(self, key):
+        return self._loaded()[key]
+
+    def __iter__(self):
+        return iter(self._loaded())
+
+    def __len__(self):
+        return len(self._loaded())
+
+    def reload(self):
+        # Re-reads 'settings.json' on the next access
+        self._settings = None
+        self.generation += 1
+
+# Settings are loaded the first time a value is read
+SETTINGS = LazySettings()
\ No newline at end of file
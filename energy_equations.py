@@ -0,0 +1,224 @@
+# energy_equations.py
+
+from collections import namedtuple
+from functools import lru_cache
+
+from config_manager import SETTINGS # Supplies the default, paediatric and per-condition equation choices
+
+# Every equation is linear in weight, height, age and lean body mass, with coefficients that depend on
+# sex and (for Schofield) an age band. The scalar forms below spell each equation out; the batch form,
+# bmr_array, looks the coefficients up in COEFFICIENTS per row. Bands split at these ages (upper bound excluded).
+AGE_BAND_EDGES = (3, 10, 18, 30, 60)
+AGE_BANDS = len(AGE_BAND_EDGES) + 1
+
+# Order of the coefficients in each COEFFICIENTS row: bmr = intercept + weight * kg + height * cm + age * years + lean * lean kg
+COEFFICIENT_TERMS = ("intercept", "weight_kg", "height_cm", "age", "lean_mass_kg")
+
+def mifflin_st_jeor(age, sex, weight_kg, height_cm, body_fat_pct=None):
+    if sex == 'M':
+        return (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + 5
+    return (10 * weight_kg) + (6.25 * height_cm) - (5 * age) - 161
+
+def harris_benedict(age, sex, weight_kg, height_cm, body_fat_pct=None):
+    # Roza and Shizgal's 1984 revision
+    if sex == 'M':
+        return 88.362 + (13.397 * weight_kg) + (4.799 * height_cm) - (5.677 * age)
+    return 447.593 + (9.247 * weight_kg) + (3.098 * height_cm) - (4.330 * age)
+
+def katch_mcardle(age, sex, weight_kg, height_cm, body_fat_pct=None):
+    # Lean body mass only, so it needs the body fat percentage
+    if body_fat_pct is None:
+        raise ValueError("The Katch-McArdle equation needs the body fat percentage.")
+    return 370 + 21.6 * weight_kg * (1 - body_fat_pct / 100)
+
+def schofield(age, sex, weight_kg, height_cm, body_fat_pct=None):
+    # WHO/FAO/UNU (1985) weight-only equations by age band
+    if sex == 'M':
+        if age < 3:
+            return 59.512 * weight_kg - 30.4
+        if age < 10:
+            return 22.706 * weight_kg + 504.3
+        if age < 18:
+            return 17.686 * weight_kg + 658.2
+        if age < 30:
+            return 15.057 * weight_kg + 692.2
+        if age < 60:
+            return 11.472 * weight_kg + 873.1
+        return 11.711 * weight_kg + 587.7
+    if age < 3:
+        return 58.317 * weight_kg - 31.1
+    if age < 10:
+        return 20.315 * weight_kg + 485.9
+    if age < 18:
+        return 13.384 * weight_kg + 692.6
+    if age < 30:
+        return 14.818 * weight_kg + 486.6
+    if age < 60:
+        return 8.126 * weight_kg + 845.6
+    return 9.082 * weight_kg + 658.5
+
+def schofield_paediatric(age, sex, weight_kg, height_cm, body_fat_pct=None):
+    # Schofield's weight-and-height equations for children (height in metres); the 10-18 band also
+    # covers anyone older who selects it explicitly
+    height_m = height_cm / 100
+    if sex == 'M':
+        if age < 3:
+            return 0.167 * weight_kg + 1517.4 * height_m - 617.6
+        if age < 10:
+            return 19.59 * weight_kg + 130.3 * height_m + 414.9
+        return 16.25 * weight_kg + 137.2 * height_m + 515.5
+    if age < 3:
+        return 16.252 * weight_kg + 1023.2 * height_m - 413.5
+    if age < 10:
+        return 16.969 * weight_kg + 161.8 * height_m + 371.2
+    return 8.365 * weight_kg + 465 * height_m + 200
+
+EnergyEquation = namedtuple("EnergyEquation", ("label", "scalar", "needs_body_fat"))
+
+# Registry of the available equations; the order fixes each equation's code in the batch path
+EQUATIONS = {
+    "mifflin_st_jeor": EnergyEquation("Mifflin-St Jeor", mifflin_st_jeor, False),
+    "harris_benedict": EnergyEquation("Harris-Benedict (revised)", harris_benedict, False),
+    "katch_mcardle": EnergyEquation("Katch-McArdle", katch_mcardle, True),
+    "schofield": EnergyEquation("Schofield", schofield, False),
+    "schofield_paediatric": EnergyEquation("Schofield (paediatric, weight and height)", schofield_paediatric, False)
+}
+EQUATION_CODES = {name: code for code, name in enumerate(EQUATIONS)}
+
+# Batch form of each equation: per sex, one coefficient row per age band (or one row for all bands)
+COEFFICIENTS = {
+    "mifflin_st_jeor": {
+        "F": ((-161, 10, 6.25, -5, 0),),
+        "M": ((5, 10, 6.25, -5, 0),)
+    },
+    "harris_benedict": {
+        "F": ((447.593, 9.247, 3.098, -4.330, 0),),
+        "M": ((88.362, 13.397, 4.799, -5.677, 0),)
+    },
+    "katch_mcardle": {
+        "F": ((370, 0, 0, 0, 21.6),),
+        "M": ((370, 0, 0, 0, 21.6),)
+    },
+    "schofield": {
+        "F": (
+            (-31.1, 58.317, 0, 0, 0), (485.9, 20.315, 0, 0, 0), (692.6, 13.384, 0, 0, 0),
+            (486.6, 14.818, 0, 0, 0), (845.6, 8.126, 0, 0, 0), (658.5, 9.082, 0, 0, 0)
+        ),
+        "M": (
+            (-30.4, 59.512, 0, 0, 0), (504.3, 22.706, 0, 0, 0), (658.2, 17.686, 0, 0, 0),
+            (692.2, 15.057, 0, 0, 0), (873.1, 11.472, 0, 0, 0), (587.7, 11.711, 0, 0, 0)
+        )
+    },
+    "schofield_paediatric": {
+        "F": ((-413.5, 16.252, 10.232, 0, 0), (371.2, 16.969, 1.618, 0, 0)) + ((200, 8.365, 4.65, 0, 0),) * 4,
+        "M": ((-617.6, 0.167, 15.174, 0, 0), (414.9, 19.59, 1.303, 0, 0)) + ((515.5, 16.25, 1.372, 0, 0),) * 4
+    }
+}
+
+def select_equation(patient_data):
+    # Name of the equation for a patient: their own `bmr_equation` if given, else the paediatric equation
+    # for children when one is configured (unset by default), else the one configured for their condition,
+    # else the default. A configured equation that needs body fat falls back to the default when the
+    # patient has none recorded.
+    choice = patient_data.get("bmr_equation")
+    if choice:
+        return choice
+    settings = SETTINGS.get("energy_equations", {})
+    default = settings.get("default", "mifflin_st_jeor")
+    paediatric = settings.get("paediatric")
+    if paediatric and patient_data["age"] < settings.get("paediatric_under_age", 18):
+        choice = paediatric
+    else:
+        choice = settings.get("by_condition", {}).get(patient_data.get("medical_condition"), default)
+    if EQUATIONS[choice].needs_body_fat and patient_data.get("body_fat_pct") is None:
+        return default
+    return choice
+
+def calculate_patient_bmr(patient_data):
+    # BMR of one patient with their selected equation; returns (bmr, equation name)
+    name = select_equation(patient_data)
+    bmr = EQUATIONS[name].scalar(
+        patient_data["age"], patient_data["sex"], patient_data["weight_kg"], patient_data["height_cm"],
+        patient_data.get("body_fat_pct")
+    )
+    return bmr, name
+
+@lru_cache(maxsize=None)
+def coefficient_table():
+    # COEFFICIENTS as one (equations x 2 sexes x age bands, terms) array, row (code * 2 + male) * AGE_BANDS + band
+    import numpy as np
+    rows = []
+    for name in EQUATIONS:
+        for sex in ("F", "M"):
+            bands = COEFFICIENTS[name][sex]
+            rows.extend(bands if len(bands) == AGE_BANDS else bands * AGE_BANDS)
+    return np.array(rows, dtype=np.float64)
+
+def bmr_array(equation, age, male, weight_kg, height_cm, body_fat_pct=None):
+    # BMR of many patients at once, each with their own equation (an array of EQUATION_CODES, or one code).
+    # Each row's coefficients are gathered from the table and applied in one expression, so mixing
+    # equations costs the same as using one. Rows needing body fat without it come out NaN.
+    import numpy as np
+    age = np.asarray(age, dtype=np.float64)
+    weight_kg = np.asarray(weight_kg, dtype=np.float64)
+    band = np.searchsorted(AGE_BAND_EDGES, age, side="right")
+    row = (np.asarray(equation, dtype=np.intp) * 2 + np.asarray(male, dtype=np.intp)) * AGE_BANDS + band
+    intercept, per_kg, per_cm, per_year, per_lean_kg = coefficient_table()[row].T
+    bmr = intercept + per_kg * weight_kg + per_cm * np.asarray(height_cm, dtype=np.float64) + per_year * age
+    if body_fat_pct is None:
+        lean_term = np.where(per_lean_kg != 0, np.nan, 0)
+    else:
+        lean_kg = weight_kg * (1 - np.asarray(body_fat_pct, dtype=np.float64) / 100)
+        lean_term = np.where(per_lean_kg != 0, per_lean_kg * lean_kg, 0)
+    return bmr + lean_term
+
+def equation_codes(patients):
+    # EQUATION_CODES of select_equation for a list of patient_data dictionaries
+    import numpy as np
+    return np.array([EQUATION_CODES[select_equation(patient)] for patient in patients], dtype=np.int8)
+
+if __name__ == "__main__":
+    # Agreement check between the scalar and batch forms of every equation, then a mixed batch timing
+    import time
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    count = 20000
+    age = rng.integers(1, 100, count)
+    male = rng.random(count) < 0.5
+    weight_kg = rng.uniform(8, 200, count)
+    height_cm = rng.uniform(60, 210, count)
+    body_fat_pct = rng.uniform(5, 50, count)
+    codes = rng.integers(0, len(EQUATIONS), count)
+
+    failures = 0
+    for name, equation in EQUATIONS.items():
+        batch = bmr_array(EQUATION_CODES[name], age, male, weight_kg, height_cm, body_fat_pct)
+        scalar = np.array([
+            equation.scalar(int(a), "M" if m else "F", float(w), float(h), float(f))
+            for a, m, w, h, f in zip(age, male, weight_kg, height_cm, body_fat_pct)
+        ])
+        error = np.abs(batch - scalar).max()
+        failures += error > 1e-6
+        print(f"{name:22s} max |batch - scalar| = {error:.2e} kcal")
+
+    mixed = bmr_array(codes, age, male, weight_kg, height_cm, body_fat_pct)
+    expected = np.array([
+        EQUATIONS[list(EQUATIONS)[c]].scalar(int(a), "M" if m else "F", float(w), float(h), float(f))
+        for c, a, m, w, h, f in zip(codes, age, male, weight_kg, height_cm, body_fat_pct)
+    ])
+    error = np.abs(mixed - expected).max()
+    failures += error > 1e-6
+    print(f"{'mixed batch':22s} max |batch - scalar| = {error:.2e} kcal")
+
+    missing = bmr_array(EQUATION_CODES["katch_mcardle"], age[:3], male[:3], weight_kg[:3], height_cm[:3])
+    failures += not np.isnan(missing).all()
+
+    repeat = 50
+    large = [np.tile(values, repeat) for values in (codes, age, male, weight_kg, height_cm, body_fat_pct)]
+    started = time.perf_counter()
+    bmr_array(*large)
+    print(f"Mixed batch of {count * repeat} patients in {time.perf_counter() - started:.3f} s.")
+    if failures:
+        raise SystemExit(f"{failures} checks failed.")
+    print("All equations agree.")
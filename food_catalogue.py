@@ -0,0 +1,582 @@
+# food_catalogue.py
+
+import json
+import mmap
+import operator
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+# Maps each canonical nutrient onto the exact column header used by each category's sheet.
+# Energy, protein and carbohydrate are not in the original workbook and are appended after its columns.
+NUTRIENT_COLUMNS = {
+    "Food": {
+        "calories_serving": "Calories/Serving",
+        "fat": "Fat (g/100g)",
+        "sugar": "Sugar (g/100mg)",
+        "saturated_fat": "Saturated fat (g/100mg)",
+        "sodium": "Sodium (mg/100mg)",
+        "dietary_fibre": "Dietary Fibre (g/100g)",
+        "calcium": "Calcium (mg/100mg)",
+        "potassium": "Potassium (mg/100g)",
+        "wholegrain": "% Wholegrain",
+        "energy": "Energy (kcal/100g)",
+        "protein": "Protein (g/100g)",
+        "carbohydrate": "Carbohydrate (g/100g)"
+    },
+    "Beverage": {
+        "calories_serving": "Calories/Serving",
+        "fat": "Fat (g/100g)",
+        "sugar": "Sugar (g/100ml)",
+        "saturated_fat": "Saturated fat (g/100ml)",
+        "sodium": "Sodium (mg/100ml)",
+        "dietary_fibre": "Dietary Fibre (g/100g)",
+        "calcium": "Calcium (mg/100ml)",
+        "potassium": "Potassium (mg/100g)",
+        "wholegrain": "% Wholegrain",
+        "energy": "Energy (kcal/100ml)",
+        "protein": "Protein (g/100ml)",
+        "carbohydrate": "Carbohydrate (g/100ml)"
+    }
+}
+
+# Every canonical nutrient key, in sheet order
+NUTRIENT_KEYS = tuple(dict.fromkeys(key for columns in NUTRIENT_COLUMNS.values() for key in columns))
+
+EXAMPLE_COLUMNS = ("Example 1", "Example 2", "Example 3")
+
+# Nutrient cells are thresholds such as "≤ 5", "≥ 20" or "100". Each is stored as a comparator code
+# plus a float32 value: code 0 is an empty cell, code 1 the sheet's "-" (not applicable) and the
+# last code a plain number. Cells that would not print back exactly are kept as text instead.
+COMPARATORS = (None, "-", "≤", "≥", "<", ">", "")
+COMPARATOR_CODES = {comparator: code for code, comparator in enumerate(COMPARATORS) if comparator}
+THRESHOLD_PATTERN = re.compile(r"^(≤|≥|<|>)?\s*(\d+(?:\.\d+)?)$")
+
+# Range predicates for nutrient queries, e.g. ("sugar", "<", 5); "≤" and "≥" are accepted as aliases
+RANGE_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq}
+OPERATOR_ALIASES = {"≤": "<=", "≥": ">=", "==": "="}
+PREDICATE_PATTERN = re.compile(r"^\s*([A-Za-z_]+)\s*(<=|>=|==|≤|≥|<|>|=)\s*(\d+(?:\.\d+)?)\s*$")
+
+# On-disk store: a manifest plus one raw file per column, memory-mapped read-only when opened
+STORE_MANIFEST = "manifest.json"
+STORE_FORMAT_VERSION = 2
+
+def _is_blank(value):
+    # Empty workbook cells arrive from pandas as NaN (a float that is not equal to itself)
+    return value is None or (isinstance(value, float) and value != value)
+
+def _format_threshold(code, value):
+    comparator = COMPARATORS[code]
+    return f"{comparator} {value:g}" if comparator else f"{value:g}"
+
+def parse_predicate(text):
+    # "sugar<5" -> ("sugar", "<", 5.0); raises ValueError with a message fit for the user
+    match = PREDICATE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Could not read the nutrient filter '{text}' (expected e.g. sugar<5 or dietary_fibre>=6).")
+    key, op, bound = match.groups()
+    key = key.lower()
+    if key not in NUTRIENT_KEYS:
+        raise ValueError(f"Unknown nutrient '{key}'. Choose from: {', '.join(NUTRIENT_KEYS)}.")
+    return key, OPERATOR_ALIASES.get(op, op), float(bound)
+
+def _code_array(codes, distinct):
+    # Smallest unsigned array type that can hold codes into a pool of `distinct` values
+    typecode = "B" if distinct <= 2 ** 8 else "H" if distinct <= 2 ** 16 else "I"
+    return array(typecode, codes)
+
+def _save_array(directory, name, buffer):
+    # Writes a column's raw bytes; returns its manifest entry. A new file replaces the old one,
+    # so processes that still have the previous store mapped keep reading a consistent copy.
+    path = os.path.join(directory, f"{name}.bin")
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(buffer)
+    os.replace(f"{path}.tmp", path)
+    return {"file": f"{name}.bin", "type": getattr(buffer, "typecode", None) or getattr(buffer, "format", "B")}
+
+def _open_array(directory, entry):
+    # Maps a column file read-only and views it as its element type without copying it.
+    # Mappings of the same file share their pages across every process that opens the store.
+    with open(os.path.join(directory, entry["file"]), "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0: # mmap cannot map an empty file
+            return b"" if entry["type"] == "bytes" else memoryview(b"").cast(entry["type"])
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return data if entry["type"] == "bytes" else memoryview(data).cast(entry["type"])
+
+class StringPool:
+    # Interns repeated strings (Type, Tag ID lists) so each distinct value is stored once; code 0 is blank
+    __slots__ = ("values", "codes")
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    @classmethod
+    def from_values(cls, values):
+        # Rebuilds a pool saved as its list of values (code order)
+        pool = cls()
+        for value in values[1:]:
+            pool.add(value)
+        return pool
+
+    def add(self, value):
+        if _is_blank(value):
+            return 0
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def nbytes(self):
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(value) for value in self.values)
+
+class PackedStrings:
+    # Mostly-unique strings (item names, image files) stored as one UTF-8 buffer plus an offset per entry.
+    # An empty slice reads back as None (a blank cell).
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [b"" if _is_blank(value) else str(value).encode("utf-8") for value in strings]
+        data = b"".join(encoded)
+        offsets = array("I" if len(data) < 2 ** 32 else "Q", [0])
+        offsets.extend(accumulate(len(value) for value in encoded))
+        return cls(data, offsets)
+
+    def __getitem__(self, index):
+        # `data` may be bytes or a read-only mmap; slicing either returns bytes
+        value = self.data[self.offsets[index]:self.offsets[index + 1]]
+        return value.decode("utf-8") if value else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def nbytes(self):
+        return len(self.data) + len(self.offsets) * self.offsets.itemsize
+
+    def save(self, directory, name):
+        data = _save_array(directory, f"{name}.data", self.data)
+        data["type"] = "bytes"
+        return {"data": data, "offsets": _save_array(directory, f"{name}.offsets", self.offsets)}
+
+    @classmethod
+    def open(cls, directory, entry):
+        return cls(_open_array(directory, entry["data"]), _open_array(directory, entry["offsets"]))
+
+class NutrientColumn:
+    # One nutrient of one category: comparator codes (uint8) and threshold values (float32), plus a
+    # range index: the rows holding a number, sorted by that number
+    __slots__ = ("key", "header", "codes", "values", "order", "texts", "text_codes")
+
+    def __init__(self, key, header, codes, values, order=None, texts=None, text_codes=None):
+        self.key = key
+        self.header = header
+        self.codes = codes
+        self.values = values
+        if order is None:
+            order = array("I", sorted((row for row, code in enumerate(codes) if code > 1), key=values.__getitem__))
+        self.order = order
+        # Cells that are not simple thresholds keep their text: a pool of distinct texts plus a
+        # per-row code into it (0 = none). Both are None when every cell is a threshold.
+        self.texts = texts
+        self.text_codes = text_codes
+
+    @classmethod
+    def from_cells(cls, key, header, cells, parsed_cells):
+        # `parsed_cells` memoises cell text -> (code, value, text) across columns; workbook cells repeat a lot
+        blank = (0, float("nan"), None)
+        parsed_rows = []
+        for cell in cells:
+            if _is_blank(cell):
+                parsed_rows.append(blank)
+                continue
+            parsed = parsed_cells.get(cell)
+            if parsed is None:
+                parsed = parsed_cells[cell] = cls._parse_cell(cell)
+            parsed_rows.append(parsed)
+
+        codes = array("B", [parsed[0] for parsed in parsed_rows])
+        values = array("f", [parsed[1] for parsed in parsed_rows])
+        if all(parsed[2] is None for parsed in parsed_rows):
+            return cls(key, header, codes, values)
+        texts = StringPool()
+        text_codes = [texts.add(parsed[2]) for parsed in parsed_rows]
+        text_codes = _code_array(text_codes, len(texts.values))
+        return cls(key, header, codes, values, texts=texts, text_codes=text_codes)
+
+    @staticmethod
+    def _parse_cell(cell):
+        text = str(cell).strip()
+        if text == "-":
+            return 1, float("nan"), None
+        match = THRESHOLD_PATTERN.match(text)
+        if match:
+            code = COMPARATOR_CODES[match.group(1)] if match.group(1) else len(COMPARATORS) - 1
+            value = array("f", [float(match.group(2))])[0] # Rounded as it will be stored
+            if _format_threshold(code, value) == text:
+                return code, value, None
+        # Anything else (extra wording, unusual formatting) is kept as text
+        return 1, float("nan"), str(cell)
+
+    def display(self, row):
+        # The cell as written in the workbook
+        if self.text_codes is not None and self.text_codes[row]:
+            return self.texts.values[self.text_codes[row]]
+        code = self.codes[row]
+        if code <= 1:
+            return COMPARATORS[code]
+        return _format_threshold(code, self.values[row])
+
+    def threshold(self, row):
+        # (comparator, value) for a threshold cell, or None for blank, "-" and free-text cells
+        code = self.codes[row]
+        if code <= 1:
+            return None
+        return COMPARATORS[code], self.values[row]
+
+    def range_bounds(self, op, bound):
+        # Slice of `order` whose values satisfy `value <op> bound`, found by binary search
+        value = self.values.__getitem__
+        if op == "<":
+            return 0, bisect_left(self.order, bound, key=value)
+        if op == "<=":
+            return 0, bisect_right(self.order, bound, key=value)
+        if op == ">":
+            return bisect_right(self.order, bound, key=value), len(self.order)
+        if op == ">=":
+            return bisect_left(self.order, bound, key=value), len(self.order)
+        return bisect_left(self.order, bound, key=value), bisect_right(self.order, bound, key=value)
+
+    def matches(self, row, op, bound):
+        return self.codes[row] > 1 and RANGE_OPERATORS[op](self.values[row], bound)
+
+    def nbytes(self):
+        size = (
+            len(self.codes) * self.codes.itemsize + len(self.values) * self.values.itemsize
+            + len(self.order) * self.order.itemsize
+        )
+        if self.texts is not None:
+            size += self.texts.nbytes() + len(self.text_codes) * self.text_codes.itemsize
+        return size
+
+    def save(self, directory, name):
+        entry = {
+            "key": self.key,
+            "header": self.header,
+            "codes": _save_array(directory, f"{name}.codes", self.codes),
+            "values": _save_array(directory, f"{name}.values", self.values),
+            "order": _save_array(directory, f"{name}.order", self.order)
+        }
+        if self.texts is not None:
+            entry["texts"] = self.texts.values # A handful of distinct texts, kept in the manifest
+            entry["text_codes"] = _save_array(directory, f"{name}.text_codes", self.text_codes)
+        return entry
+
+    @classmethod
+    def open(cls, directory, entry):
+        columns = [_open_array(directory, entry[name]) for name in ("codes", "values", "order")]
+        if "texts" not in entry:
+            return cls(entry["key"], entry["header"], *columns)
+        return cls(
+            entry["key"], entry["header"], *columns,
+            StringPool.from_values(entry["texts"]), _open_array(directory, entry["text_codes"])
+        )
+
+class CategoryTable:
+    # All items of one category (Food or Beverage), holding only that category's nutrient columns
+    __slots__ = ("category", "start", "names", "types", "tags", "examples", "nutrients", "by_header")
+
+    def __init__(self, category, start, names, types, tags, examples, nutrients):
+        self.category = category
+        self.start = start # Catalogue index of this table's first item
+        self.names = names
+        self.types = types
+        self.tags = tags
+        self.examples = examples
+        self.nutrients = nutrients # Canonical nutrient key -> NutrientColumn
+        self.by_header = {column.header: column for column in nutrients.values()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def nbytes(self):
+        return (
+            self.names.nbytes() + len(self.types) * self.types.itemsize + len(self.tags) * self.tags.itemsize
+            + sum(examples.nbytes() for examples in self.examples)
+            + sum(column.nbytes() for column in self.nutrients.values())
+        )
+
+    def save(self, directory, name):
+        return {
+            "category": self.category,
+            "start": self.start,
+            "names": self.names.save(directory, f"{name}.names"),
+            "types": _save_array(directory, f"{name}.types", self.types),
+            "tags": _save_array(directory, f"{name}.tags", self.tags),
+            "examples": [examples.save(directory, f"{name}.example{i + 1}") for i, examples in enumerate(self.examples)],
+            "nutrients": [column.save(directory, f"{name}.{key}") for key, column in self.nutrients.items()]
+        }
+
+    @classmethod
+    def open(cls, directory, entry):
+        return cls(
+            entry["category"], entry["start"],
+            PackedStrings.open(directory, entry["names"]),
+            _open_array(directory, entry["types"]),
+            _open_array(directory, entry["tags"]),
+            tuple(PackedStrings.open(directory, examples) for examples in entry["examples"]),
+            {column["key"]: NutrientColumn.open(directory, column) for column in entry["nutrients"]}
+        )
+
+class FoodItem:
+    # Lightweight view of one catalogue row; values are read from the columns on access
+    __slots__ = ("catalogue", "table", "row")
+
+    def __init__(self, catalogue, table, row):
+        self.catalogue = catalogue
+        self.table = table
+        self.row = row
+
+    @property
+    def index(self):
+        return self.table.start + self.row
+
+    @property
+    def item(self):
+        return self.table.names[self.row]
+
+    @property
+    def type(self):
+        return self.catalogue.types.values[self.table.types[self.row]]
+
+    @property
+    def category_key(self):
+        return self.table.category
+
+    @property
+    def tag_ids(self):
+        tags = self.catalogue.tags.values[self.table.tags[self.row]]
+        return [tag_id.strip() for tag_id in tags.split(",") if tag_id.strip()] if tags else []
+
+    @property
+    def examples(self):
+        return [examples[self.row] for examples in self.table.examples]
+
+    def nutrient(self, key):
+        # The threshold for a canonical nutrient key, e.g. item.nutrient("sugar") -> ("≤", 5.0)
+        column = self.table.nutrients.get(key)
+        return column.threshold(self.row) if column else None
+
+    def nutrients(self):
+        # Sheet header -> cell text for this item's category
+        return {header: column.display(self.row) for header, column in self.table.by_header.items()}
+
+    def get(self, field, default=None):
+        # Row-style access by workbook column name, so pages written against DataFrame rows keep working
+        if field == "Item":
+            value = self.item
+        elif field == "Type":
+            value = self.type
+        elif field == "Category_Key":
+            value = self.table.category
+        elif field == "Tag ID":
+            value = self.catalogue.tags.values[self.table.tags[self.row]]
+        elif field in EXAMPLE_COLUMNS:
+            value = self.table.examples[EXAMPLE_COLUMNS.index(field)][self.row]
+        elif field in self.table.by_header:
+            value = self.table.by_header[field].display(self.row)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        return self.get(field)
+
+    def to_dict(self):
+        # JSON-ready record with the same keys as a workbook row
+        record = {"Category_Key": self.table.category, "Type": self.type, "Item": self.item}
+        record.update(self.nutrients())
+        record["Tag ID"] = self.get("Tag ID")
+        record.update(zip(EXAMPLE_COLUMNS, self.examples))
+        return record
+
+class FoodCatalogue:
+    # Immutable, column-oriented Food Wiki: one CategoryTable per category, Type and Tag ID strings
+    # interned in shared pools, and a packed lower-case search text for substring search
+    __slots__ = ("tables", "types", "tags", "starts", "search_text", "search_offsets")
+
+    def __init__(self, tables, types, tags, search=None):
+        self.tables = tables
+        self.types = types
+        self.tags = tags
+        self.starts = [table.start for table in tables]
+
+        # "item\ntype\0" per item; a search is a find over one buffer
+        if search is None:
+            search = PackedStrings.from_strings(
+                f"{table.names[row] or ''}\n{types.values[table.types[row]] or ''}\0".lower()
+                for table in tables for row in range(len(table))
+            )
+        self.search_text = search.data
+        self.search_offsets = search.offsets
+
+    @classmethod
+    def from_dataframe(cls, all_items):
+        # Builds the catalogue from the table returned by food_data.load_food_wiki
+        types, tags = StringPool(), StringPool()
+        parsed_cells = {}
+        tables = []
+        start = 0
+        for category, columns in NUTRIENT_COLUMNS.items():
+            rows = all_items[all_items["Category_Key"] == category]
+            if rows.empty:
+                continue
+            nutrients = {
+                key: NutrientColumn.from_cells(key, header, rows[header].tolist(), parsed_cells)
+                for key, header in columns.items() if header in rows.columns
+            }
+            tables.append(CategoryTable(
+                category, start,
+                PackedStrings.from_strings(rows["Item"].tolist()),
+                [types.add(value) for value in rows["Type"].tolist()],
+                [tags.add(value) for value in rows["Tag ID"].tolist()],
+                tuple(
+                    PackedStrings.from_strings(rows[column].tolist() if column in rows.columns else [None] * len(rows))
+                    for column in EXAMPLE_COLUMNS
+                ),
+                nutrients
+            ))
+            start += len(rows)
+
+        # Pool codes are narrowed once every distinct Type and Tag ID value is known
+        for table in tables:
+            table.types = _code_array(table.types, len(types.values))
+            table.tags = _code_array(table.tags, len(tags.values))
+        return cls(tables, types, tags)
+
+    def save(self, directory):
+        # Writes the catalogue as a store that open() maps without parsing or copying the columns.
+        # The manifest is written last, so a store is only readable once all of its columns are.
+        os.makedirs(directory, exist_ok=True)
+        search = PackedStrings(self.search_text, self.search_offsets)
+        manifest = {
+            "format_version": STORE_FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "items": len(self),
+            "types": self.types.values,
+            "tags": self.tags.values,
+            "search": search.save(directory, "search"),
+            "tables": [table.save(directory, f"table{i}") for i, table in enumerate(self.tables)]
+        }
+        manifest_path = os.path.join(directory, STORE_MANIFEST)
+        with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    @classmethod
+    def open(cls, directory):
+        # Opens a saved store in milliseconds whatever its size: columns are memory-mapped read-only
+        # and paged in by the OS as they are read
+        with open(os.path.join(directory, STORE_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != STORE_FORMAT_VERSION or manifest.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Catalogue store '{directory}' was written by an incompatible version or platform.")
+        return cls(
+            [CategoryTable.open(directory, table) for table in manifest["tables"]],
+            StringPool.from_values(manifest["types"]),
+            StringPool.from_values(manifest["tags"]),
+            PackedStrings.open(directory, manifest["search"])
+        )
+
+    def __len__(self):
+        return len(self.search_offsets) - 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        table = self.tables[bisect_right(self.starts, index) - 1]
+        return FoodItem(self, table, index - table.start)
+
+    def __iter__(self):
+        for table in self.tables:
+            for row in range(len(table)):
+                yield FoodItem(self, table, row)
+
+    def items(self, indices):
+        return [self[index] for index in indices]
+
+    def search(self, query):
+        # Indices of items whose name or type contains `query` (case-insensitive), in catalogue order
+        if not query:
+            return range(len(self))
+        needle = query.lower().encode("utf-8")
+        matches = []
+        position = self.search_text.find(needle)
+        while position != -1:
+            index = bisect_right(self.search_offsets, position) - 1
+            matches.append(index)
+            position = self.search_text.find(needle, self.search_offsets[index + 1])
+        return matches
+
+    def filter(self, predicates, category=None):
+        # Indices of items matching every (nutrient, operator, bound) predicate, in catalogue order.
+        # Each table starts from the range index of its most selective predicate and checks only those
+        # rows against the others, so a selective query never scans the table. Items whose category
+        # has no column for a nutrient, or whose cell holds no number, do not match.
+        checked = []
+        for key, op, bound in predicates:
+            op = OPERATOR_ALIASES.get(op, op)
+            if op not in RANGE_OPERATORS:
+                raise ValueError(f"Unknown operator '{op}'.")
+            checked.append((key, op, array("f", [bound])[0])) # Compared at the stored float32 precision
+
+        matches = []
+        for table in self.tables:
+            if category and table.category != category:
+                continue
+            columns = [(table.nutrients.get(key), op, bound) for key, op, bound in checked]
+            if not all(column for column, _, _ in columns):
+                continue
+            if not columns:
+                matches.extend(range(table.start, table.start + len(table)))
+                continue
+
+            ranges = sorted(
+                ((column.range_bounds(op, bound), column, op, bound) for column, op, bound in columns),
+                key=lambda entry: entry[0][1] - entry[0][0]
+            )
+            (low, high), column, _, _ = ranges[0]
+            others = [(column, op, bound) for _, column, op, bound in ranges[1:]]
+            rows = sorted(
+                row for row in column.order[low:high]
+                if all(other.matches(row, op, bound) for other, op, bound in others)
+            )
+            matches.extend(table.start + row for row in rows)
+        return matches
+
+    def query(self, text="", predicates=(), category=None):
+        # Text search narrowed by nutrient predicates and/or a category (Food, Beverage)
+        if not predicates and not category:
+            return self.search(text)
+        matches = self.filter(predicates, category)
+        if text:
+            needle = text.lower().encode("utf-8")
+            offsets = self.search_offsets
+            matches = [index for index in matches if needle in self.search_text[offsets[index]:offsets[index + 1]]]
+        return matches
+
+    def nbytes(self):
+        # Approximate memory held by the catalogue's columns and pools
+        return (
+            sum(table.nbytes() for table in self.tables) + self.types.nbytes() + self.tags.nbytes()
+            + len(self.search_text) + len(self.search_offsets) * self.search_offsets.itemsize
+        )
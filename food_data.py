@@ -0,0 +1,114 @@
+# food_data.py
+
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+from config_manager import SETTINGS # Supplies the catalogue store directory
+from food_catalogue import FoodCatalogue, STORE_MANIFEST
+from logger_config import app_logger
+from metrics import LOAD_DATA_SECONDS
+
+# Food Wiki workbook and the sheets it must contain
+EXCEL_FILE = "Food Wiki.xlsx"
+FOOD_SHEET = "Food"
+BEVERAGES_SHEET = "Beverages"
+TAGLINE_SHEET = "Tagline"
+
+# Saved next to the catalogue columns in the store directory
+TAGLINES_FILE = "taglines.json"
+
+# Everything the Food Wiki page needs, built once per process and shared read-only by every session:
+# the compact item catalogue and Tag ID -> tagline details
+SharedFoodData = namedtuple("SharedFoodData", ("catalogue", "taglines"))
+
+def load_food_wiki(excel_file=EXCEL_FILE):
+    # Reads the Food and Beverages sheets into one table (tagged with Category_Key) plus the Tagline lookup.
+    # Kept free of Streamlit so the API and batch tools can share it; errors are left to the caller.
+    import pandas as pd # Only needed when the workbook is read; opening a saved store does not use it
+
+    with LOAD_DATA_SECONDS.time():
+        food_df = pd.read_excel(excel_file, sheet_name=FOOD_SHEET)
+        beverages_df = pd.read_excel(excel_file, sheet_name=BEVERAGES_SHEET)
+        tagline_df = pd.read_excel(excel_file, sheet_name=TAGLINE_SHEET)
+
+    # Prepare the Tagline lookup table
+    tagline_lookup = tagline_df.set_index('Tag ID')
+
+    # Set Category_Key to match the image folder names (Food, Beverage)
+    food_df['Category_Key'] = 'Food'
+    beverages_df['Category_Key'] = 'Beverage'
+
+    all_items = pd.concat([food_df, beverages_df], ignore_index=True)
+    return all_items, tagline_lookup
+
+def _freeze_taglines(taglines):
+    return MappingProxyType({str(tag_id): MappingProxyType(details) for tag_id, details in taglines.items()})
+
+def _build_shared(all_items, tagline_lookup):
+    # The DataFrame is only used to build the compact catalogue and is then released
+    return SharedFoodData(
+        FoodCatalogue.from_dataframe(all_items),
+        _freeze_taglines(tagline_lookup.to_dict(orient="index"))
+    )
+
+def store_is_current(store_dir, excel_file=EXCEL_FILE):
+    # A store is used when it is complete and not older than the workbook (or there is no workbook,
+    # e.g. a store imported from a national food composition database)
+    manifest_path = os.path.join(store_dir, STORE_MANIFEST)
+    if not os.path.exists(manifest_path) or not os.path.exists(os.path.join(store_dir, TAGLINES_FILE)):
+        return False
+    return not os.path.exists(excel_file) or os.path.getmtime(manifest_path) >= os.path.getmtime(excel_file)
+
+def open_food_store(store_dir):
+    # Maps a saved store: instant regardless of its size, and its pages are shared by every process reading it
+    with LOAD_DATA_SECONDS.time():
+        catalogue = FoodCatalogue.open(store_dir)
+        with open(os.path.join(store_dir, TAGLINES_FILE), encoding="utf-8") as f:
+            taglines = json.load(f)
+    return SharedFoodData(catalogue, _freeze_taglines(taglines))
+
+def save_food_store(shared, store_dir):
+    # Writes the catalogue columns and the tagline lookup; the manifest is written last
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, TAGLINES_FILE), "w", encoding="utf-8") as f:
+        json.dump({tag_id: dict(details) for tag_id, details in shared.taglines.items()}, f, ensure_ascii=False, default=str)
+    shared.catalogue.save(store_dir)
+
+def build_shared_food_data(excel_file=EXCEL_FILE, store_dir=None):
+    # Returns the read-only structures shared across Streamlit sessions and API requests.
+    # Opens the memory-mapped store when it is up to date; otherwise reads the workbook, builds the
+    # compact catalogue and refreshes the store for the next start.
+    store_dir = store_dir or SETTINGS.get("food_wiki", {}).get("catalogue_dir")
+    if store_dir and store_is_current(store_dir, excel_file):
+        try:
+            return open_food_store(store_dir)
+        except (OSError, ValueError, KeyError) as e:
+            app_logger.warning(f"Could not open the catalogue store '{store_dir}', rebuilding it: {e}")
+
+    shared = _build_shared(*load_food_wiki(excel_file))
+    if store_dir:
+        try:
+            save_food_store(shared, store_dir)
+        except OSError as e:
+            app_logger.warning(f"Could not save the catalogue store '{store_dir}': {e}")
+    return shared
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+    parser = argparse.ArgumentParser(description="Build the memory-mapped Food Wiki catalogue store.")
+    parser.add_argument("--excel", default=EXCEL_FILE, help="Workbook supplying the items and taglines")
+    parser.add_argument("--items-csv", nargs="*", default=[],
+                        help="Import items from CSV files (workbook headers plus Category_Key) instead of the workbook sheets")
+    parser.add_argument("--out", help="Store directory (defaults to the one in settings.json)")
+    args = parser.parse_args()
+
+    store_dir = args.out or SETTINGS.get("food_wiki", {}).get("catalogue_dir") or "food_wiki_store"
+    all_items, tagline_lookup = load_food_wiki(args.excel)
+    if args.items_csv:
+        all_items = pd.concat([pd.read_csv(path) for path in args.items_csv], ignore_index=True)
+    shared = _build_shared(all_items, tagline_lookup)
+    save_food_store(shared, store_dir)
+    print(f"Saved {len(shared.catalogue)} items ({shared.catalogue.nbytes() / 1e6:.1f} MB of columns) to {store_dir}.")
@@ -1,51 +1,62 @@
 # food_wiki.py
 import streamlit as st
-import pandas as pd
 from pathlib import Path
-from PIL import Image
 
-# --- Configuration (Updated to read from Excel file) ---
-EXCEL_FILE = "Food Wiki.xlsx"
-FOOD_SHEET = "Food"
-BEVERAGES_SHEET = "Beverages"
-TAGLINE_SHEET = "Tagline"
+from food_catalogue import NUTRIENT_KEYS
+from config_manager import SETTINGS
+from food_data import EXCEL_FILE, FOOD_SHEET, BEVERAGES_SHEET, TAGLINE_SHEET, build_shared_food_data
+from metrics import CACHE_REQUESTS, WIKI_SEARCHES, SEARCH_SECONDS
 
 BASE_IMAGE_FOLDER = Path(__file__).parent / "images" 
 
 
-@st.cache
+@st.cache_resource(show_spinner="Loading the Food Wiki...")
+def get_shared_data():
+    """Builds the catalogue, tagline lookup and search index once per server process."""
+    # Shared by every session without hashing or copying, so each extra user only adds widget state.
+    # Only runs when the cache misses; errors are not cached, so a fixed workbook is picked up on the next rerun.
+    CACHE_REQUESTS.inc(labels=("food_wiki", "miss"))
+    return build_shared_food_data()
+
+
+@st.cache_resource(show_spinner="Indexing nutrient profiles...")
+def get_substitution_index():
+    """Builds the nearest-neighbour index over the shared catalogue once per server process."""
+    from substitutions import SubstitutionIndex # NumPy is only loaded once alternatives are asked for
+    return SubstitutionIndex(get_shared_data().catalogue)
+
+
 def load_data():
-    """Loads data from the Excel file with three sheets."""
+    """Returns the shared Food Wiki data, or None (after showing the error) if it cannot be loaded."""
     try:
-        # Load from Excel file sheets
-        food_df = pd.read_excel(EXCEL_FILE, sheet_name=FOOD_SHEET)
-        beverages_df = pd.read_excel(EXCEL_FILE, sheet_name=BEVERAGES_SHEET)
-        tagline_df = pd.read_excel(EXCEL_FILE, sheet_name=TAGLINE_SHEET)
-        
-        # Prepare the Tagline lookup table
-        tagline_lookup = tagline_df.set_index('Tag ID')
-        
-        # Set Category_Key to match your exact image folder names (Food, Beverage)
-        food_df['Category_Key'] = 'Food'
-        beverages_df['Category_Key'] = 'Beverage' 
-        
-        all_items = pd.concat([food_df, beverages_df], ignore_index=True)
-        
-        return all_items, tagline_lookup
+        return get_shared_data()
     
     except FileNotFoundError as e:
         st.error(f"Error: Excel file '{EXCEL_FILE}' was not found. Please ensure it's in the same directory as this script.")
-        return pd.DataFrame(), pd.DataFrame()
+        return None
     except ValueError as e:
         st.error(f"Error: Sheet not found in Excel file. Check that sheets are named '{FOOD_SHEET}', '{BEVERAGES_SHEET}', and '{TAGLINE_SHEET}'. Error: {e}")
-        return pd.DataFrame(), pd.DataFrame()
+        return None
     except KeyError as e:
         st.error(f"Error: A required column or index was missing: {e}. Check your data columns (expecting 'Tag ID', 'Item', 'Type').")
-        return pd.DataFrame(), pd.DataFrame()
+        return None
+
+
+@st.cache_resource(ttl=60, show_spinner=False)
+def get_image_folder_summary():
+    """Lists the image subfolders and their file counts, refreshed at most once a minute."""
+    # Walking the folders on every rerun is wasted work; the listing is only shown in the debug panel
+    if not BASE_IMAGE_FOLDER.exists():
+        return None
+    return tuple(
+        (subfolder.name, sum(1 for _ in subfolder.iterdir()))
+        for subfolder in BASE_IMAGE_FOLDER.iterdir() if subfolder.is_dir()
+    )
 
 
 def get_example_image_path(row, image_filename):
     """Constructs the full path for a product example image using the Category_Key (Food/Beverage)."""
+    import pandas as pd
     if pd.isna(image_filename):
         return None
     
@@ -53,12 +64,61 @@ def get_example_image_path(row, image_filename):
     return BASE_IMAGE_FOLDER / category / image_filename
 
 
+def show_nutrient_filters():
+    """Nutrient range filters, e.g. beverages with sugar < 5 and sodium < 50; returns (category, predicates)."""
+    with st.expander("Filter by nutrients"):
+        category = st.radio("Category", ("All", "Food", "Beverage"), horizontal=True, key="wiki_category")
+        keys = st.multiselect(
+            "Nutrients", NUTRIENT_KEYS, key="wiki_nutrients",
+            format_func=lambda key: key.replace("_", " ").capitalize()
+        )
+        st.caption("Values are per 100 g for foods and per 100 ml for beverages, as in each sheet's headers.")
+
+        predicates = []
+        for key in keys:
+            label = key.replace("_", " ").capitalize()
+            op_col, value_col = st.columns([1, 2])
+            with op_col:
+                op = st.selectbox(label, ("<", "<=", ">=", ">", "="), key=f"wiki_op_{key}")
+            with value_col:
+                bound = st.number_input(f"{label} value", min_value=0.0, value=0.0, step=1.0, key=f"wiki_value_{key}")
+            predicates.append((key, op, bound))
+    return (None if category == "All" else category), predicates
+
+
+def show_substitutes(catalogue, row, condition):
+    """Lists the nearest items of the same Type that are no worse for the condition's nutrients."""
+    settings = SETTINGS.get("substitutions", {})
+    substitutes = get_substitution_index().substitutes(row.index, condition, settings.get("top_k", 5))
+    label = condition.replace("_", " ")
+    if settings.get("condition_nutrients", {}).get(condition):
+        title = f"Healthier alternatives for {label} ({len(substitutes)})"
+        empty = "No item of the same type is better on this condition's nutrients, or this item does not list them."
+    else:
+        title = f"Similar items ({len(substitutes)})" # No nutrients to judge "healthier" by for this condition
+        empty = "No other item of the same type has a different nutrient profile."
+    with st.expander(title):
+        if not substitutes:
+            st.write(empty)
+        for index, distance in substitutes:
+            substitute = catalogue[index]
+            st.write(f"**{substitute.item}** (profile distance {distance:.2f})")
+            st.caption(", ".join(f"{header}: {value}" for header, value in substitute.nutrients().items() if value not in (None, "-")))
+
+
 def show_food_wiki():
-    
-    all_items, TAGLINE_LOOKUP = load_data()
+    # Imported here so loading the page module does not pull in pandas and Pillow before they are needed
+    import pandas as pd
+    from PIL import Image
 
-    if all_items.empty and TAGLINE_LOOKUP.empty:
+    misses = CACHE_REQUESTS.value(("food_wiki", "miss"))
+    shared = load_data()
+    if CACHE_REQUESTS.value(("food_wiki", "miss")) == misses:
+        CACHE_REQUESTS.inc(labels=("food_wiki", "hit"))
+
+    if shared is None:
         return
+    catalogue, TAGLINE_LOOKUP = shared.catalogue, shared.taglines
 
     st.title("Food Wiki POC 🧪")
     st.write("Search for an item or category to view its labels and product examples.")
@@ -66,30 +126,32 @@ def show_food_wiki():
     # Debug info (remove this later)
     with st.expander("🔍 Debug Info - Click to see file paths"):
         st.write(f"Base image folder: `{BASE_IMAGE_FOLDER}`")
-        st.write(f"Folder exists: {BASE_IMAGE_FOLDER.exists()}")
-        if BASE_IMAGE_FOLDER.exists():
+        folder_summary = get_image_folder_summary()
+        st.write(f"Folder exists: {folder_summary is not None}")
+        if folder_summary is not None:
             st.write("Subfolders found:")
-            for subfolder in BASE_IMAGE_FOLDER.iterdir():
-                if subfolder.is_dir():
-                    st.write(f"  - `{subfolder.name}/` ({len(list(subfolder.glob('*')))} files)")
-        st.write(f"Total items loaded: {len(all_items)}")
+            for subfolder_name, file_count in folder_summary:
+                st.write(f"  - `{subfolder_name}/` ({file_count} files)")
+        st.write(f"Total items loaded: {len(catalogue)}")
 
     query = st.text_input("Search food or category:")
+    category, predicates = show_nutrient_filters()
+    condition = st.selectbox(
+        "Suggest healthier alternatives for:", ["None"] + list(SETTINGS["macro_percentages"]),
+        format_func=lambda key: key.replace("_", " ").capitalize(), key="wiki_condition"
+    )
 
-    if query:
-        filtered = all_items[
-            all_items['Item'].astype(str).str.contains(query, case=False, na=False) |
-            all_items['Type'].astype(str).str.contains(query, case=False, na=False)
-        ]
-    else:
-        filtered = all_items
+    if query or predicates or category:
+        WIKI_SEARCHES.inc(labels=("streamlit",))
+    with SEARCH_SECONDS.time():
+        filtered = catalogue.items(catalogue.query(query, predicates, category))
 
-    if filtered.empty:
+    if not filtered:
         st.error("No results found. Try a different search term.")
         return
 
-    # Display list of results
-    for idx, row in filtered.iterrows():
+    # Display list of results; each row is a FoodItem view reading straight from the catalogue columns
+    for row in filtered:
         item_type = row.get('Type') if pd.notna(row.get('Type')) else 'N/A'
         st.subheader(f"{row['Item']} ({item_type})")
         
@@ -102,34 +164,31 @@ def show_food_wiki():
             st.write(f"Example 3: {row.get('Example 3')}") 
         
         # --- 1. Display Tagline(s) and Icon(s) ---
-        tag_ids_str = row.get('Tag ID')
-        if pd.notna(tag_ids_str):
-            # Split by comma and strip whitespace
-            tag_ids = [tid.strip() for tid in str(tag_ids_str).split(',') if tid.strip()]
+        # Tag IDs come already split on commas and stripped of whitespace
+        tag_ids = row.tag_ids
+        if tag_ids:
+            st.write("**Health Labels:**")
+            cols = st.columns(len(tag_ids))
             
-            if tag_ids:
-                st.write("**Health Labels:**")
-                cols = st.columns(len(tag_ids))
-                
-                for i, tag_id in enumerate(tag_ids):
-                    # Convert tag_id to string to match index
-                    tag_id_str = str(tag_id)
-                    if tag_id_str in TAGLINE_LOOKUP.index.astype(str):
-                        tag_details = TAGLINE_LOOKUP.loc[tag_id_str]
-                        tagline = tag_details['Tagline']
-                        
-                        # Tagline images are in the 'Signs' subfolder
-                        tagline_image_file = BASE_IMAGE_FOLDER / "Signs" / tag_details['Tagline Image']
-                        
-                        with cols[i]:
-                            if tagline_image_file.exists():
-                                try:
-                                    img = Image.open(tagline_image_file)
-                                    st.image(img, caption=tagline, width=70)
-                                except Exception as e:
-                                    st.error(f"Error: {e}")
-                            else:
-                                st.markdown(f"**[{tagline}]** ❌")
+            for i, tag_id in enumerate(tag_ids):
+                # Convert tag_id to string to match index
+                tag_id_str = str(tag_id)
+                if tag_id_str in TAGLINE_LOOKUP:
+                    tag_details = TAGLINE_LOOKUP[tag_id_str]
+                    tagline = tag_details['Tagline']
+                    
+                    # Tagline images are in the 'Signs' subfolder
+                    tagline_image_file = BASE_IMAGE_FOLDER / "Signs" / tag_details['Tagline Image']
+                    
+                    with cols[i]:
+                        if tagline_image_file.exists():
+                            try:
+                                img = Image.open(tagline_image_file)
+                                st.image(img, caption=tagline, width=70)
+                            except Exception as e:
+                                st.error(f"Error: {e}")
+                        else:
+                            st.markdown(f"**[{tagline}]** ❌")
 
 
         # --- 2. Display 3 Product Examples in a collapsible section ---
@@ -157,6 +216,10 @@ def show_food_wiki():
                     else:
                         st.write(f"No example")
 
+        # --- 3. Healthier alternatives of the same Type for the chosen condition ---
+        if condition != "None":
+            show_substitutes(catalogue, row, condition)
+
         # Display other nutrition info
         item_category = row.get('Category_Key')
         
@@ -10,9 +10,13 @@ import io
 from config_manager import SETTINGS # Accesses predefined application settings
 from logger_config import app_logger # Used for logging events and errors within the app
 
-from calculations import calculate_bmr, calculate_tdee, get_macro_recommendations, calculate_bmi, classify_bmi, get_micronutrient_guidelines
+from calculations import build_nutrition_plan # Runs the full BMI/BMR/TDEE/macro pipeline
+from plan_pipeline import IncrementalPlanner # Re-runs only the calculation stages affected by an input change
+from report_renderer import write_report # Renders plans to text/HTML/JSON/PDF independently of the GUI
+from metrics import PLANS_COMPUTED, CALCULATION_SECONDS, MetricsFileWriter # Operational counters and latencies
 from gui.input_panel import InputPanel # Manages the user input fields
 from gui.results_panel import ResultsPanel # Displays the calculated nutrition plan
+from gui.worker import BackgroundWorker, TaskCancelled # Runs calculations and I/O off the Tkinter thread
 
 class NutritionApp:
     def __init__(self, master):
@@ -42,6 +46,7 @@ class NutritionApp:
         # Configure columns within this frame to distribute buttons evenly
         self.button_frame.grid_columnconfigure(0, weight=1)
         self.button_frame.grid_columnconfigure(1, weight=1)
+        self.button_frame.grid_columnconfigure(2, weight=1)
 
         # Setup 'Save Plan' button, linked to the `save_results` method
         self.save_button = ttk.Button(self.button_frame, text="Save Plan", command=self.save_results)
@@ -51,130 +56,249 @@ class NutritionApp:
         self.clear_button = ttk.Button(self.button_frame, text="Clear Results", command=self.clear_results)
         self.clear_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
 
+        # Setup 'Patient History' button, linked to the `show_history` method
+        self.history_button = ttk.Button(self.button_frame, text="Patient History", command=self.show_history)
+        self.history_button.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+
+        # Busy indicator and 'Cancel' button, only shown while background work is running
+        self.busy_bar = ttk.Progressbar(self.button_frame, mode="indeterminate", length=200)
+        self.cancel_button = ttk.Button(self.button_frame, text="Cancel", command=self.cancel_work)
+
+        # Calculations, saves and database access run on a worker thread so the window never freezes
+        self.worker = BackgroundWorker(master, on_busy_change=self.set_busy)
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Live preview: results follow the inputs as they are typed, recalculating only what changed
+        self.planner = IncrementalPlanner()
+        self.input_panel.enable_live_preview(self.preview_plan)
+
         # Store the last calculated data
         self.last_patient_data = None
         self.last_calculated_results = None
 
+        # The live preview's latest inputs and results, kept apart so 'Save Plan' only saves calculated plans
+        self.preview_patient_data = None
+        self.preview_calculated_results = None
+
+        # The plan database is opened on first use so start-up does not touch the disk
+        self.plan_store = None
+
+        # Snapshot the metrics to a file for monitoring, only when metrics.file_name is set (off by default)
+        metrics_settings = SETTINGS.get("metrics", {})
+        self.metrics_writer = None
+        if metrics_settings.get("file_name"):
+            self.metrics_writer = MetricsFileWriter(
+                metrics_settings["file_name"], metrics_settings.get("write_interval_s", 15)
+            ).start()
+
+    def get_plan_store(self):
+        # Returns the shared PlanStore, opening the database the first time it is needed.
+        # Only the single worker thread uses it, which keeps SQLite access serialised.
+        if self.plan_store is None:
+            from plan_store import PlanStore # Local SQLite store; sqlite3 is only imported once it is needed
+            self.plan_store = PlanStore()
+        return self.plan_store
+
+    def set_busy(self, busy):
+        # Shows or hides the busy indicator; called on the Tk thread by the BackgroundWorker
+        if busy:
+            self.busy_bar.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+            self.cancel_button.grid(row=1, column=2, padx=5, pady=5, sticky="ew")
+            self.busy_bar.start(15)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.grid_forget()
+            self.cancel_button.grid_forget()
+
+    def cancel_work(self):
+        # Cancels any running calculation, save or history lookup
+        self.worker.cancel()
+        app_logger.info("Background work cancelled by user.")
+
+    def on_close(self):
+        # Stops background work before the window is destroyed
+        self.worker.shutdown()
+        if self.metrics_writer:
+            self.metrics_writer.stop()
+        self.master.destroy()
+
+    def preview_plan(self):
+        # Called (debounced) by the InputPanel whenever an input changes
+        is_valid, patient_data, error_message = self.input_panel.validate_and_get_numeric_inputs()
+        if not is_valid:
+            self.input_panel.set_status(error_message)
+            return
+        self.input_panel.set_status("Preview updates as you type. Click 'Calculate' to record the plan.")
+
+        with CALCULATION_SECONDS.time(labels=("preview",)):
+            calculated_results, changed_stages = self.planner.update(patient_data)
+        if not changed_stages and patient_data == self.preview_patient_data:
+            return
+
+        self.preview_patient_data = patient_data
+        self.preview_calculated_results = calculated_results
+        self.results_panel.display_plan(patient_data, calculated_results)
+        app_logger.debug(f"Live preview updated stages: {', '.join(changed_stages) or 'display only'}")
+
     def calculate_plan(self):
         # This method handles the primary application flow: input validation, calculation, and display
         app_logger.info("Calculation initiated by user.")
-        try:
-            # Delegate input validation and numeric conversion to the InputPanel
-            is_valid, patient_data, error_message = self.input_panel.validate_and_get_numeric_inputs()
-
-            if not is_valid:
-                # If validation fails, display an error message and halt the calculation
-                messagebox.showerror("Input Error", error_message)
-                app_logger.warning(f"Calculation aborted due to invalid input: {error_message}")
-                return
-            
-            # Extract validated numerical data for calculations
-            age = patient_data["age"]
-            sex = patient_data["sex"]
-            weight_kg = patient_data["weight_kg"]
-            height_cm = patient_data["height_cm"]
-            activity_factor = patient_data["activity_factor"]
-            medical_condition = patient_data["medical_condition"]
-            weight_goal = patient_data["weight_goal"]
-            diabetes_subtype = patient_data["diabetes_subtype"]
-
-            # Perform sequential nutrition calculations
-            bmi = calculate_bmi(weight_kg, height_cm)
-            bmi_classification = classify_bmi(bmi)
-            bmr = calculate_bmr(age, sex, weight_kg, height_cm)
-            tdee = calculate_tdee(bmr, activity_factor)
-
-            # Adjust TDEE based on the user's weight goal
-            adjusted_tdee = tdee
-            if weight_goal == "loss":
-                adjusted_tdee -= SETTINGS["calorie_adjustments"]["weight_loss_deficit_kcal"]
-
-                # Enforce a minimum calorie intake for safety, based on gender
-                min_cal = SETTINGS["min_calories"]["female"] if sex == "F" else SETTINGS["min_calories"]["male"]
-                
-                if adjusted_tdee < min_cal:
-                    adjusted_tdee = min_cal
-                    app_logger.info(f"Adjusted TDEE capped at minimum for {sex}: {min_cal} kcal.")
-                else:
-                    app_logger.info(f"Adjusted TDEE for weight loss: {adjusted_tdee} kcal.")
-            elif weight_goal == "gain":
-                adjusted_tdee += SETTINGS["calorie_adjustments"]["weight_gain_surplus_kcal"]
-
-            # Retrieve macronutrient percentages, defaulting to 'general' if no specific condition applies
-            macro_percentages = SETTINGS["macro_percentages"].get(medical_condition, SETTINGS["macro_percentages"]["general"])
-
-            # Calculate macronutrient grams based on adjusted TDEE and percentages
-            macros = get_macro_recommendations(adjusted_tdee, macro_percentages, weight_kg)
-
-            # Fetch micronutrient guidelines relevant to the specified medical condition
-            micronutrient_guidelines = get_micronutrient_guidelines(medical_condition)
-
-            # Consolidate all calculated results into a single dictionary for easy handling and display
-            calculated_results = {
-                "bmi": bmi,
-                "bmi_classification": bmi_classification,
-                "bmr": bmr,
-                "tdee": tdee,
-                "adjusted_tdee": adjusted_tdee,
-                "macros": macros,
-                "micronutrient_guidelines": micronutrient_guidelines
-            }
-
-            # Store the patient data and calculated results for potential saving
-            self.last_patient_data = patient_data
-            self.last_calculated_results = calculated_results
-
-            # Display the results via the ResultsPanel, separating display logic
-            self.results_panel.display_plan(patient_data, calculated_results)
-            app_logger.info("Nutrition plan successfully calculated and displayed.")
-
-        except Exception as e:
-            # Catch any unexpected errors during calculation and provide user feedback
-            messagebox.showerror("Error", f"An unexpected error occurred during calculation: {e}")
-            app_logger.critical(f"Unexpected error during calculation: {e}", exc_info=True)
+
+        # Delegate input validation and numeric conversion to the InputPanel (reads Tk variables, so stays on this thread)
+        is_valid, patient_data, error_message = self.input_panel.validate_and_get_numeric_inputs()
+
+        if not is_valid:
+            # If validation fails, display an error message and halt the calculation
+            messagebox.showerror("Input Error", error_message)
+            app_logger.warning(f"Calculation aborted due to invalid input: {error_message}")
+            return
+
+        # A newer calculation supersedes any that is still running
+        self.worker.cancel("calculate")
+        self.worker.submit(
+            "calculate", self._compute_plan, patient_data,
+            on_success=self._show_calculated_plan,
+            on_error=self._calculation_failed,
+            pass_task=True
+        )
+
+    def _compute_plan(self, task, patient_data):
+        # Runs on the worker thread: performs the calculations and records the plan for the patient
+        with CALCULATION_SECONDS.time(labels=("gui",)):
+            calculated_results = build_nutrition_plan(patient_data)
+        PLANS_COMPUTED.inc(labels=("gui",))
+
+        if patient_data["weight_goal"] == "loss":
+            if calculated_results["at_minimum"]:
+                app_logger.info(f"Adjusted TDEE capped at minimum for {patient_data['sex']}: {calculated_results['adjusted_tdee']} kcal.")
+            else:
+                app_logger.info(f"Adjusted TDEE for weight loss: {calculated_results['adjusted_tdee']} kcal.")
+
+        # A cancelled (or superseded) calculation must not record its plan
+        if task.cancelled:
+            raise TaskCancelled()
+
+        # Record the plan against the patient so it can be retrieved later
+        if patient_data["patient_id"]:
+            self.get_plan_store().add_plan(patient_data["patient_id"], patient_data, calculated_results)
+            app_logger.info(f"Nutrition plan stored for patient: {patient_data['patient_id']}")
+
+        return patient_data, calculated_results
+
+    def _show_calculated_plan(self, plan):
+        patient_data, calculated_results = plan
+
+        # Store the patient data and calculated results for potential saving
+        self.last_patient_data = patient_data
+        self.last_calculated_results = calculated_results
+
+        # Display the results via the ResultsPanel, separating display logic
+        self.results_panel.display_plan(patient_data, calculated_results)
+        app_logger.info("Nutrition plan successfully calculated and displayed.")
+
+    def _calculation_failed(self, e):
+        # Catch any unexpected errors during calculation and provide user feedback
+        messagebox.showerror("Error", f"An unexpected error occurred during calculation: {e}")
+        app_logger.critical(f"Unexpected error during calculation: {e}", exc_info=e)
 
     def save_results(self):
-        # Handles saving the currently displayed nutrition plan to a text file
+        # Handles saving the currently displayed nutrition plan as a text, HTML, PDF or JSON report
         if self.last_patient_data is None or self.last_calculated_results is None:
             messagebox.showwarning("No Plan to Save", "Please calculate a nutrition plan first before saving.")
             return
 
-        # Prompt the user to select a file path for saving
+        # Prompt the user to select a file path for saving; the extension picks the report format
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            filetypes=[
+                ("Text files", "*.txt"),
+                ("HTML files", "*.html"),
+                ("PDF files", "*.pdf"),
+                ("JSON files", "*.json"),
+                ("All files", "*.*")
+            ],
             title="Save Nutrition Plan"
         )
 
-        if file_path:
-            # Temporarily redirect standard output to capture the text generated by display_plan
-            report_content = self.results_panel.get_content()
-            
-            if not report_content.strip(): # Add a check for empty content
-                messagebox.showwarning("Empty Plan", "The results panel is empty. Please calculate a plan before saving.")
-                app_logger.warning("Attempted to save an empty nutrition plan.")
-                return
-
-            try:
-                # Write the captured content to the chosen file
-                with open(file_path, 'w') as f:
-                    f.write(report_content)
-                messagebox.showinfo("Save Successful", f"Nutrition plan saved successfully to:\n{file_path}")
-                app_logger.info(f"Nutrition plan saved to: {file_path}")
-            except IOError as e:
-                # Handle file system errors during saving
-                messagebox.showerror("Save Error", f"Error saving file: {e}")
-                app_logger.error(f"File saving error: {file_path}: {e}")
-            except Exception as e:
-                # Catch any other unexpected errors during the save process
-                messagebox.showerror("Save Error", f"An unexpected error occurred during save: {e}")
-                app_logger.critical(f"Unexpected error during save: {e}", exc_info=True)
-        else:
+        if not file_path:
             app_logger.info("Save operation cancelled by user.")
+            return
+
+        # The report is rendered from the stored plan data (not the widget text) on the worker thread
+        self.worker.submit(
+            "save", self._write_report, file_path, self.last_patient_data, self.last_calculated_results,
+            on_success=self._save_succeeded,
+            on_error=lambda e: self._save_failed(file_path, e),
+            pass_task=True
+        )
+
+    def _write_report(self, task, file_path, patient_data, calculated_results):
+        # Runs on the worker thread: renders the plan in the format matching the file extension and writes it,
+        # unless the save was cancelled while it waited for the worker
+        if task.cancelled:
+            raise TaskCancelled()
+        write_report(file_path, patient_data, calculated_results)
+        return file_path
+
+    def _save_succeeded(self, file_path):
+        messagebox.showinfo("Save Successful", f"Nutrition plan saved successfully to:\n{file_path}")
+        app_logger.info(f"Nutrition plan saved to: {file_path}")
+
+    def _save_failed(self, file_path, e):
+        if isinstance(e, IOError):
+            # Handle file system errors during saving
+            messagebox.showerror("Save Error", f"Error saving file: {e}")
+            app_logger.error(f"File saving error: {file_path}: {e}")
+        else:
+            # Catch any other unexpected errors during the save process
+            messagebox.showerror("Save Error", f"An unexpected error occurred during save: {e}")
+            app_logger.critical(f"Unexpected error during save: {e}", exc_info=e)
+
+    def show_history(self):
+        # Opens the stored plan history for the patient ID currently entered
+        patient_id = self.input_panel.patient_id_var.get().strip()
+        if not patient_id:
+            messagebox.showwarning("No Patient ID", "Please enter a Patient ID to view their plan history.")
+            return
+
+        self.worker.submit(
+            "history", self._load_history, patient_id,
+            on_success=lambda result: self._show_history_window(patient_id, *result),
+            on_error=lambda e: self._history_failed(patient_id, e)
+        )
+
+    def _load_history(self, patient_id):
+        # Runs on the worker thread, which also owns the database connection.
+        # The progress chart reads the weekly rollups rather than aggregating the raw plans.
+        store = self.get_plan_store()
+        progress = {period: store.get_progress(patient_id, period) for period in ("week", "all")}
+        return store.get_patient_history(patient_id), progress
+
+    def _show_history_window(self, patient_id, history, progress):
+        if not history:
+            messagebox.showinfo("No History", f"No stored plans were found for patient '{patient_id}'.")
+            return
+
+        from gui.history_window import HistoryWindow # Lists a patient's previously stored plans
+        HistoryWindow(self.master, patient_id, history, progress, on_select=self.show_stored_plan)
+        app_logger.info(f"Loaded {len(history)} stored plans for patient: {patient_id}")
+
+    def _history_failed(self, patient_id, e):
+        messagebox.showerror("History Error", f"Could not load plan history: {e}")
+        app_logger.error(f"Failed to load history for patient {patient_id}: {e}", exc_info=e)
+
+    def show_stored_plan(self, patient_data, calculated_results):
+        # Displays a plan picked from the history window, making it the current plan for saving
+        self.last_patient_data = patient_data
+        self.last_calculated_results = calculated_results
+        self.results_panel.display_plan(patient_data, calculated_results)
 
     def clear_results(self):
         # Resets the results display and clears any stored calculation data
         self.results_panel.clear_results()
+        self.planner.reset()
         self.last_patient_data = None
         self.last_calculated_results = None
+        self.preview_patient_data = None
+        self.preview_calculated_results = None
         app_logger.info("Results display and stored data cleared.")
\ No newline at end of file
@@ -0,0 +1,63 @@
+# history_window.py
+
+import tkinter as tk
+from tkinter import ttk
+
+from plan_store import plan_from_row # Rebuilds a stored plan so it can be shown in the ResultsPanel
+
+class HistoryWindow(tk.Toplevel):
+    # Columns shown for each stored plan: (heading, plan field, display format)
+    COLUMNS = (
+        ("Date", "created_at", "{}"),
+        ("Weight (kg)", "weight_kg", "{:.1f}"),
+        ("BMI", "bmi", "{:.1f}"),
+        ("TDEE (kcal)", "tdee", "{:.0f}"),
+        ("Target (kcal)", "adjusted_tdee", "{:.0f}"),
+        ("Condition", "medical_condition_description", "{}"),
+        ("Goal", "weight_goal_description", "{}")
+    )
+
+    def __init__(self, parent, patient_id, history, progress=None, on_select=None):
+        # Lists a patient's stored plans; double-clicking a row hands that plan to `on_select`.
+        # `progress` ({"week": [...], "all": [...]} from PlanStore.get_progress) adds a Progress tab.
+        super().__init__(parent)
+        self.title(f"Plan History - {patient_id}")
+        self.geometry("800x400")
+        self.history = history
+        self.on_select = on_select
+
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill=tk.BOTH, expand=True)
+        plans_tab = ttk.Frame(notebook)
+        notebook.add(plans_tab, text="Plans")
+
+        self.tree = ttk.Treeview(plans_tab, columns=[field for _, field, _ in self.COLUMNS], show="headings")
+        for heading, field, _ in self.COLUMNS:
+            self.tree.heading(field, text=heading)
+            self.tree.column(field, width=100, anchor="center")
+        self.tree.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+
+        scroll = ttk.Scrollbar(plans_tab, command=self.tree.yview)
+        scroll.grid(row=0, column=1, sticky="ns")
+        self.tree.config(yscrollcommand=scroll.set)
+        plans_tab.grid_rowconfigure(0, weight=1)
+        plans_tab.grid_columnconfigure(0, weight=1)
+
+        if progress and progress.get("week"):
+            from gui.progress_chart import ProgressChart # Weekly means drawn from the precomputed rollups
+            overall = progress.get("all")
+            notebook.add(ProgressChart(notebook, progress["week"], overall[0] if overall else None), text="Progress")
+
+        # Newest plans first, with the row index as the item id for lookups on double-click
+        for index in range(len(history) - 1, -1, -1):
+            plan = history[index]
+            values = [fmt.format(plan[field]) if plan[field] is not None else "" for _, field, fmt in self.COLUMNS]
+            self.tree.insert("", tk.END, iid=str(index), values=values)
+
+        self.tree.bind("<Double-1>", self._show_selected_plan)
+
+    def _show_selected_plan(self, event):
+        selected = self.tree.focus()
+        if selected and self.on_select:
+            patient_data, calculated_results = plan_from_row(self.history[int(selected)])
+            self.on_select(patient_data, calculated_results)
@@ -3,6 +3,8 @@
 import tkinter as tk
 from tkinter import ttk
 from config_manager import SETTINGS # Used for potential future validation ranges or default values
+from patient_validation import validate_energy_inputs, validate_goal_weight, validate_numeric_inputs # Range checks shared with the API
+from energy_equations import EQUATIONS # BMR equations the user can choose from
 
 class InputPanel(ttk.LabelFrame):
     def __init__(self, parent, app_instance_reference):
@@ -16,6 +18,7 @@ class InputPanel(ttk.LabelFrame):
         self.grid_columnconfigure(1, weight=2) 
 
         # Initialise Tkinter variables (StringVar, etc.) to hold input values
+        self.patient_id_var = tk.StringVar(value="")
         self.age_str_var = tk.StringVar(value="")
         self.sex_var = tk.StringVar(value="M")
         self.weight_kg_str_var = tk.StringVar(value="")
@@ -23,6 +26,9 @@ class InputPanel(ttk.LabelFrame):
         self.activity_level_var = tk.StringVar()
         self.medical_condition_var = tk.StringVar()
         self.weight_goal_var = tk.StringVar()
+        self.goal_weight_str_var = tk.StringVar(value="")
+        self.bmr_equation_var = tk.StringVar()
+        self.body_fat_str_var = tk.StringVar(value="")
         self.diabetes_subtype_var = tk.StringVar()
 
         # Define specific options for dropdowns
@@ -41,11 +47,17 @@ class InputPanel(ttk.LabelFrame):
             "Hypertension": "hypertension",
             "Heart Disease": "heart_disease"
         }
+        # Conditions the patient has besides the main one; their rules are combined with it
+        self.other_condition_vars = {
+            description: tk.BooleanVar(value=False) for description in self.medical_conditions if description != "None"
+        }
         self.weight_goals = {
             "Maintain Weight": "maintenance",
             "Lose Weight": "loss",
             "Gain Weight": "gain"
         }
+        # "Automatic" leaves the choice to settings.json (paediatric, per condition or default)
+        self.bmr_equations = {"Automatic": None, **{equation.label: name for name, equation in EQUATIONS.items()}}
 
         # Call a helper method to build and place all the input widgets
         self._create_widgets()
@@ -55,21 +67,32 @@ class InputPanel(ttk.LabelFrame):
         self.medical_condition_var.set(list(self.medical_conditions.keys())[0])
         self.weight_goal_var.set(list(self.weight_goals.keys())[0])
         self.diabetes_subtype_var.set(self.diabetes_subtypes[0])
+        self.bmr_equation_var.set(list(self.bmr_equations.keys())[0])
 
         # Configure dynamic visibility for the diabetes subtype field
         self.medical_condition_var.trace_add("write", self.medical_condition_fields)
+        for var in self.other_condition_vars.values():
+            var.trace_add("write", self.medical_condition_fields)
 
         # Call it once at initialisation to set the correct initial state
         self.medical_condition_fields()
 
+        # Live preview state: the callback to run and the pending debounce timer
+        self.live_preview_callback = None
+        self.live_preview_delay_ms = 300
+        self.live_preview_job = None
+
     def _create_widgets(self):
         # This method systematically creates and places each input field and its label.
-        ttk.Label(self, text="Age (years):").grid(row=0, column=0, sticky="w", padx=5, pady=2)
-        ttk.Entry(self, textvariable=self.age_str_var).grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+        ttk.Label(self, text="Patient ID (optional):").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        ttk.Entry(self, textvariable=self.patient_id_var).grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+
+        ttk.Label(self, text="Age (years):").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        ttk.Entry(self, textvariable=self.age_str_var).grid(row=1, column=1, sticky="ew", padx=5, pady=2)
 
-        ttk.Label(self, text="Sex:").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        ttk.Label(self, text="Sex:").grid(row=2, column=0, sticky="w", padx=5, pady=2)
         self.sex_radio_container = ttk.Frame(self)
-        self.sex_radio_container.grid(row=1, column=1, sticky="w", padx=5, pady=2) 
+        self.sex_radio_container.grid(row=2, column=1, sticky="w", padx=5, pady=2) 
         self.sex_radio_container.grid_columnconfigure(0, weight=1)
         self.sex_radio_container.grid_columnconfigure(1, weight=1)
         ttk.Radiobutton(self.sex_radio_container, text="Male", variable=self.sex_var, value="M") \
@@ -77,23 +100,29 @@ class InputPanel(ttk.LabelFrame):
         ttk.Radiobutton(self.sex_radio_container, text="Female", variable=self.sex_var, value="F") \
             .grid(row=0, column=1, sticky="w")
 
-        ttk.Label(self, text="Weight (kg):").grid(row=2, column=0, sticky="w", padx=5, pady=2)
-        ttk.Entry(self, textvariable=self.weight_kg_str_var).grid(row=2, column=1, sticky="ew", padx=5, pady=2)
+        ttk.Label(self, text="Weight (kg):").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        ttk.Entry(self, textvariable=self.weight_kg_str_var).grid(row=3, column=1, sticky="ew", padx=5, pady=2)
 
-        ttk.Label(self, text="Height (cm):").grid(row=3, column=0, sticky="w", padx=5, pady=2)
-        ttk.Entry(self, textvariable=self.height_cm_str_var).grid(row=3, column=1, sticky="ew", padx=5, pady=2)
+        ttk.Label(self, text="Height (cm):").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        ttk.Entry(self, textvariable=self.height_cm_str_var).grid(row=4, column=1, sticky="ew", padx=5, pady=2)
 
-        ttk.Label(self, text="Activity Level:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        ttk.Label(self, text="Activity Level:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
         self.activity_level_menu = ttk.OptionMenu(
             self, self.activity_level_var, "", *list(self.activity_levels.keys())
         )
-        self.activity_level_menu.grid(row=4, column=1, sticky="ew", padx=5, pady=2)
+        self.activity_level_menu.grid(row=5, column=1, sticky="ew", padx=5, pady=2)
 
-        ttk.Label(self, text="Medical Condition:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+        ttk.Label(self, text="Medical Condition:").grid(row=6, column=0, sticky="w", padx=5, pady=2)
         self.medical_condition_menu = ttk.OptionMenu(
             self, self.medical_condition_var, "", *list(self.medical_conditions.keys())
         )
-        self.medical_condition_menu.grid(row=5, column=1, sticky="ew", padx=5, pady=2)
+        self.medical_condition_menu.grid(row=6, column=1, sticky="ew", padx=5, pady=2)
+
+        self.other_conditions_label = ttk.Label(self, text="Other Conditions:")
+        self.other_conditions_frame = ttk.Frame(self)
+        for i, (description, var) in enumerate(self.other_condition_vars.items()):
+            ttk.Checkbutton(self.other_conditions_frame, text=description, variable=var) \
+                .grid(row=i // 2, column=i % 2, sticky="w", padx=(0, 10))
 
         # Initialise widgets for Diabetes Subtype and Weight Goal.
         self.diabetes_subtype_label = ttk.Label(self, text="Diabetes Subtype:")
@@ -104,6 +133,14 @@ class InputPanel(ttk.LabelFrame):
         self.weight_goal_menu = ttk.OptionMenu(
             self, self.weight_goal_var, "", *list(self.weight_goals.keys())
         )
+        self.goal_weight_label = ttk.Label(self, text="Goal Weight (kg, optional):")
+        self.goal_weight_entry = ttk.Entry(self, textvariable=self.goal_weight_str_var)
+        self.bmr_equation_label = ttk.Label(self, text="BMR Equation:")
+        self.bmr_equation_menu = ttk.OptionMenu(
+            self, self.bmr_equation_var, "", *list(self.bmr_equations.keys())
+        )
+        self.body_fat_label = ttk.Label(self, text="Body Fat (%, optional):")
+        self.body_fat_entry = ttk.Entry(self, textvariable=self.body_fat_str_var)
 
         self.instruction_label = ttk.Label(self, text="Fill in all fields and click 'Calculate'.")
         self.calculate_button = None # Placeholder as the actual button is passed from app.py.
@@ -113,12 +150,24 @@ class InputPanel(ttk.LabelFrame):
         self.calculate_button = button
         self.medical_condition_fields()
 
+    def selected_conditions(self):
+        # The main condition followed by any other ticked conditions, as (keys, descriptions); "None" only when nothing else is ticked
+        descriptions = [self.medical_condition_var.get()] + [
+            description for description, var in self.other_condition_vars.items()
+            if var.get() and description != self.medical_condition_var.get()
+        ]
+        if len(descriptions) > 1:
+            descriptions = [description for description in descriptions if description != "None"]
+        return [self.medical_conditions.get(description, "general") for description in descriptions], descriptions
+
     def medical_condition_fields(self, *args):
-        # Dynamically adjusts the layout based on the selected medical condition.
-        selected_medical_condition = self.medical_condition_var.get()
-        current_row = 6
+        # Dynamically adjusts the layout based on the selected medical conditions.
+        conditions, _ = self.selected_conditions()
+        self.other_conditions_label.grid(row=7, column=0, sticky="nw", padx=5, pady=2)
+        self.other_conditions_frame.grid(row=7, column=1, sticky="w", padx=5, pady=2)
+        current_row = 8
 
-        if self.medical_conditions.get(selected_medical_condition) == "diabetes":
+        if "diabetes" in conditions:
             self.diabetes_subtype_label.grid(row=current_row, column=0, sticky="w", padx=5, pady=2)
             self.diabetes_subtype_menu.grid(row=current_row, column=1, sticky="ew", padx=5, pady=2)
             current_row += 1
@@ -131,6 +180,15 @@ class InputPanel(ttk.LabelFrame):
         self.weight_goal_label.grid(row=current_row, column=0, sticky="w", padx=5, pady=2)
         self.weight_goal_menu.grid(row=current_row, column=1, sticky="ew", padx=5, pady=2)
         current_row += 1
+        self.goal_weight_label.grid(row=current_row, column=0, sticky="w", padx=5, pady=2)
+        self.goal_weight_entry.grid(row=current_row, column=1, sticky="ew", padx=5, pady=2)
+        current_row += 1
+        self.bmr_equation_label.grid(row=current_row, column=0, sticky="w", padx=5, pady=2)
+        self.bmr_equation_menu.grid(row=current_row, column=1, sticky="ew", padx=5, pady=2)
+        current_row += 1
+        self.body_fat_label.grid(row=current_row, column=0, sticky="w", padx=5, pady=2)
+        self.body_fat_entry.grid(row=current_row, column=1, sticky="ew", padx=5, pady=2)
+        current_row += 1
 
         self.instruction_label.grid(row=current_row, column=0, columnspan=2, pady=10)
         current_row += 1
@@ -138,60 +196,70 @@ class InputPanel(ttk.LabelFrame):
         if self.calculate_button:
             self.calculate_button.grid(row=current_row, column=0, columnspan=2, pady=10)
 
+    def enable_live_preview(self, callback, delay_ms=300):
+        # Calls `callback` once typing pauses for `delay_ms`, whenever any input changes
+        self.live_preview_callback = callback
+        self.live_preview_delay_ms = delay_ms
+        for var in (
+            self.age_str_var, self.sex_var, self.weight_kg_str_var, self.height_cm_str_var,
+            self.activity_level_var, self.medical_condition_var, self.weight_goal_var,
+            self.diabetes_subtype_var, self.goal_weight_str_var, self.bmr_equation_var, self.body_fat_str_var,
+            *self.other_condition_vars.values()
+        ):
+            var.trace_add("write", self._schedule_live_preview)
+
+    def _schedule_live_preview(self, *args):
+        # Debounces keystrokes: each change restarts the timer, so only the final value is calculated
+        if self.live_preview_job is not None:
+            self.after_cancel(self.live_preview_job)
+        self.live_preview_job = self.after(self.live_preview_delay_ms, self._run_live_preview)
+
+    def _run_live_preview(self):
+        self.live_preview_job = None
+        if self.live_preview_callback:
+            self.live_preview_callback()
+
+    def set_status(self, message):
+        # Shows a hint (e.g. a validation message during live preview) in place of the instructions
+        self.instruction_label.config(text=message)
+
     def validate_and_get_numeric_inputs(self):
         # Retrieves raw string inputs, validates them for correctness and reasonable ranges,
-        age_str = self.age_str_var.get()
-        weight_kg_str = self.weight_kg_str_var.get()
-        height_cm_str = self.height_cm_str_var.get()
-        parsed_data = {}
-
-        # Individual validation for each numeric input
-        if not age_str:
-            return False, None, "Age cannot be empty."
-        try:
-            age = int(age_str)
-            if not (1 <= age <= 120):
-                return False, None, "Please enter a realistic age between 1 and 120 years."
-            parsed_data["age"] = age
-        except ValueError:
-            return False, None, "Please enter a valid number for Age."
-
-        if not weight_kg_str:
-            return False, None, "Weight cannot be empty."
-        try:
-            weight_kg = float(weight_kg_str)
-            if not (20 <= weight_kg <= 300):
-                return False, None, "Please enter a realistic weight between 20 and 300 kg."
-            parsed_data["weight_kg"] = weight_kg
-        except ValueError:
-            return False, None, "Please enter a valid number for Weight."
-
-        if not height_cm_str:
-            return False, None, "Height cannot be empty."
-        try:
-            height_cm = float(height_cm_str)
-            if not (50 <= height_cm <= 250):
-                return False, None, "Please enter a realistic height between 50 and 250 cm."
-            parsed_data["height_cm"] = height_cm
-        except ValueError:
-            return False, None, "Please enter a valid number for Height."
-            
+        # and returns (is_valid, patient_data, error_message)
+        is_valid, parsed_data, error_message = validate_numeric_inputs({
+            "age": self.age_str_var.get(),
+            "weight_kg": self.weight_kg_str_var.get(),
+            "height_cm": self.height_cm_str_var.get()
+        })
+        if not is_valid:
+            return False, None, error_message
+        is_valid, parsed_data["goal_weight_kg"], error_message = validate_goal_weight(self.goal_weight_str_var.get().strip())
+        if not is_valid:
+            return False, None, error_message
+        is_valid, energy_inputs, error_message = validate_energy_inputs(
+            self.bmr_equations.get(self.bmr_equation_var.get()), self.body_fat_str_var.get().strip()
+        )
+        if not is_valid:
+            return False, None, error_message
+        parsed_data.update(energy_inputs)
+
         # Collect and store non-numeric inputs directly
+        parsed_data["patient_id"] = self.patient_id_var.get().strip()
         parsed_data["sex"] = self.sex_var.get()
         parsed_data["activity_factor"] = self.activity_levels.get(self.activity_level_var.get())
         parsed_data["activity_level_description"] = self.activity_level_var.get()
         
-        selected_medical_desc = self.medical_condition_var.get()
-        medical_condition_key = self.medical_conditions.get(selected_medical_desc, "general")
-        parsed_data["medical_condition"] = medical_condition_key
-        parsed_data["medical_condition_description"] = selected_medical_desc
+        conditions, descriptions = self.selected_conditions()
+        parsed_data["medical_condition"] = conditions[0]
+        parsed_data["medical_conditions"] = conditions if len(conditions) > 1 else None
+        parsed_data["medical_condition_description"] = " + ".join(descriptions)
 
         selected_weight_goal_desc = self.weight_goal_var.get()
         weight_goal_key = self.weight_goals.get(selected_weight_goal_desc, "maintenance")
         parsed_data["weight_goal"] = weight_goal_key
         parsed_data["weight_goal_description"] = selected_weight_goal_desc
 
-        if medical_condition_key == "diabetes":
+        if "diabetes" in conditions:
             parsed_data["diabetes_subtype"] = self.diabetes_subtype_var.get()
         else:
             parsed_data["diabetes_subtype"] = "N/A" # Default to N/A if not relevant
@@ -201,26 +269,30 @@ class InputPanel(ttk.LabelFrame):
     def get_all_inputs(self):
         # A helper method to retrieve all current input values directly as a dictionary
         selected_activity_desc = self.activity_level_var.get()
-        selected_medical_desc = self.medical_condition_var.get()
         selected_weight_goal_desc = self.weight_goal_var.get()
 
-        medical_condition_key = self.medical_conditions.get(selected_medical_desc, "general")
+        conditions, descriptions = self.selected_conditions()
         weight_goal_key = self.weight_goals.get(selected_weight_goal_desc, "maintenance")
 
         inputs = {
+            "patient_id": self.patient_id_var.get().strip(),
             "age_str": self.age_str_var.get(),
             "sex": self.sex_var.get(),
             "weight_kg_str": self.weight_kg_str_var.get(),
             "height_cm_str": self.height_cm_str_var.get(),
             "activity_factor": self.activity_levels.get(selected_activity_desc),
             "activity_level_description": selected_activity_desc,
-            "medical_condition": medical_condition_key,
-            "medical_condition_description": selected_medical_desc,
+            "medical_condition": conditions[0],
+            "medical_conditions": conditions if len(conditions) > 1 else None,
+            "medical_condition_description": " + ".join(descriptions),
             "weight_goal": weight_goal_key,
-            "weight_goal_description": selected_weight_goal_desc
+            "weight_goal_description": selected_weight_goal_desc,
+            "goal_weight_kg_str": self.goal_weight_str_var.get(),
+            "bmr_equation": self.bmr_equations.get(self.bmr_equation_var.get()),
+            "body_fat_pct_str": self.body_fat_str_var.get()
         }
 
-        if medical_condition_key == "diabetes":
+        if "diabetes" in conditions:
             inputs["diabetes_subtype"] = self.diabetes_subtype_var.get()
         else:
             inputs["diabetes_subtype"] = "N/A"
@@ -0,0 +1,76 @@
+# progress_chart.py
+
+import tkinter as tk
+from tkinter import ttk
+
+from plan_store import PROGRESS_METRICS # Metrics kept in the progress rollups
+
+class ProgressChart(ttk.Frame):
+    # Line chart of a patient's weekly or monthly means, drawn on a Canvas (no plotting library needed)
+    METRIC_LABELS = {
+        "weight_kg": "Weight (kg)",
+        "bmi": "BMI",
+        "tdee": "TDEE (kcal)",
+        "adjusted_tdee": "Target (kcal)"
+    }
+    MARGIN = 50
+
+    def __init__(self, parent, progress, overall=None):
+        # `progress` holds PlanStore.get_progress summaries, oldest first; `overall` the "all" summary
+        super().__init__(parent)
+        self.progress = progress
+        self.overall = overall
+
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(controls, text="Show:").pack(side=tk.LEFT)
+        self.metric_var = tk.StringVar(value=self.METRIC_LABELS[PROGRESS_METRICS[0]])
+        metric_box = ttk.Combobox(
+            controls, textvariable=self.metric_var, state="readonly",
+            values=[self.METRIC_LABELS[metric] for metric in PROGRESS_METRICS]
+        )
+        metric_box.pack(side=tk.LEFT, padx=5)
+        metric_box.bind("<<ComboboxSelected>>", lambda event: self.redraw())
+        self.trend_label = ttk.Label(controls)
+        self.trend_label.pack(side=tk.LEFT, padx=10)
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+
+    def selected_metric(self):
+        label = self.metric_var.get()
+        return next(metric for metric, text in self.METRIC_LABELS.items() if text == label)
+
+    def redraw(self):
+        # Scales the series to the current canvas size and draws axes, the line and its end labels
+        metric = self.selected_metric()
+        self.canvas.delete("all")
+        points = [(row["period_key"], row[metric]) for row in self.progress if row[metric] is not None]
+        if self.overall and self.overall[f"{metric}_per_week"] is not None:
+            self.trend_label.config(text=f"Trend: {self.overall[f'{metric}_per_week']:+.2f} per week over {self.overall['plans']} plans")
+        else:
+            self.trend_label.config(text="")
+        if not points:
+            return
+
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        left, top, right, bottom = self.MARGIN, self.MARGIN // 2, width - self.MARGIN // 2, height - self.MARGIN
+        low = min(value for _, value in points)
+        high = max(value for _, value in points)
+        span = (high - low) or 1
+        step = (right - left) / max(len(points) - 1, 1)
+        coords = [
+            (left + i * step, bottom - (value - low) / span * (bottom - top))
+            for i, (_, value) in enumerate(points)
+        ]
+
+        self.canvas.create_line(left, top, left, bottom, right, bottom, fill="gray")
+        self.canvas.create_text(left - 5, top, text=f"{high:.1f}", anchor="e")
+        self.canvas.create_text(left - 5, bottom, text=f"{low:.1f}", anchor="e")
+        self.canvas.create_text(left, bottom + 5, text=points[0][0], anchor="nw")
+        self.canvas.create_text(right, bottom + 5, text=points[-1][0], anchor="ne")
+        if len(coords) > 1:
+            self.canvas.create_line(*[value for point in coords for value in point], fill="steelblue", width=2)
+        for x, y in coords:
+            self.canvas.create_oval(x - 2, y - 2, x + 2, y + 2, fill="steelblue", outline="")
@@ -0,0 +1,98 @@
+# worker.py
+
+import queue
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+class TaskCancelled(Exception):
+    # Raised by work that saw its task cancelled before an irreversible step (a database write, a file save)
+    pass
+
+class BackgroundTask:
+    # Handle for one piece of work submitted to the BackgroundWorker
+    def __init__(self, name, future, on_success, on_error):
+        self.name = name
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        # Stops the task if it has not started; otherwise its result is discarded when it finishes
+        self.cancelled = True
+        self.future.cancel()
+
+class BackgroundWorker:
+    def __init__(self, master, on_busy_change=None, max_workers=1, poll_interval_ms=15):
+        # Runs calculations and file/database I/O off the Tkinter thread.
+        # A single worker keeps tasks (and SQLite writes) in submission order.
+        self.master = master
+        self.on_busy_change = on_busy_change
+        self.poll_interval_ms = poll_interval_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nutrition-worker")
+        self.pending = set()
+        self.finished = queue.Queue() # Completed tasks, handed from worker threads to the Tk thread
+        self.poll_job = None
+
+    def submit(self, name, fn, *args, on_success=None, on_error=None, pass_task=False):
+        # Queues `fn(*args)`; `on_success(result)` or `on_error(exception)` later run on the Tk thread.
+        # With pass_task, fn is called as fn(task, *args) so it can check `task.cancelled` (the
+        # cancellation token) and raise TaskCancelled before doing anything that cannot be undone.
+        task = BackgroundTask(name, None, on_success, on_error)
+        task.future = self.executor.submit(fn, task, *args) if pass_task else self.executor.submit(fn, *args)
+        self.pending.add(task)
+
+        # Only a thread-safe queue put happens off the Tk thread; widgets are never touched there
+        task.future.add_done_callback(lambda _: self.finished.put(task))
+
+        if len(self.pending) == 1 and self.on_busy_change:
+            self.on_busy_change(True)
+        if self.poll_job is None:
+            self.poll_job = self.master.after(self.poll_interval_ms, self._poll)
+        return task
+
+    def cancel(self, name=None):
+        # Cancels all pending tasks, or only those with the given name
+        for task in list(self.pending):
+            if name is None or task.name == name:
+                task.cancel()
+
+    def is_busy(self, name=None):
+        return any(name is None or task.name == name for task in self.pending)
+
+    def _poll(self):
+        # Delivers finished tasks to their callbacks in small batches so each Tk frame stays short
+        self.poll_job = None
+        for _ in range(10):
+            try:
+                task = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(task)
+            self._deliver(task)
+
+        if self.pending or not self.finished.empty():
+            self.poll_job = self.master.after(self.poll_interval_ms, self._poll)
+        elif self.on_busy_change:
+            self.on_busy_change(False)
+
+    def _deliver(self, task):
+        if task.cancelled:
+            return
+        try:
+            result = task.future.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            if task.on_error:
+                task.on_error(e)
+            return
+        if task.on_success:
+            task.on_success(result)
+
+    def shutdown(self):
+        # Cancels outstanding work and stops the worker threads without blocking the window from closing
+        self.cancel()
+        if self.poll_job is not None:
+            self.master.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+# intake_log.py
+
+import sqlite3
+from datetime import date, datetime
+
+from config_manager import SETTINGS # Supplies the database file name
+from calculations import get_nutrient_limits
+
+# Nutrients tracked for every entry, as consumed (g, kcal for energy, mg for sodium)
+INTAKE_NUTRIENTS = ("energy", "protein", "carbohydrate", "fat", "sugar", "saturated_fat", "sodium")
+
+# Rollup periods and how a day maps onto each period's key
+PERIODS = {
+    "day": lambda day: day.isoformat(),
+    "week": lambda day: "{0}-W{1:02d}".format(*day.isocalendar()),
+    "month": lambda day: day.strftime("%Y-%m")
+}
+
+NUTRIENT_COLUMNS_SQL = ", ".join(f"{key} REAL NOT NULL DEFAULT 0" for key in INTAKE_NUTRIENTS)
+
+# Entries are never updated or deleted: removing one appends a reversal that negates it (voids = its id).
+# The rollups hold the running totals of every (patient, period), updated in the same transaction.
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS intake_entries (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    logged_at TEXT NOT NULL,
+    day TEXT NOT NULL,
+    item_index INTEGER,
+    item TEXT NOT NULL,
+    grams REAL NOT NULL,
+    {NUTRIENT_COLUMNS_SQL},
+    voids INTEGER REFERENCES intake_entries(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_intake_patient_day ON intake_entries (patient_id, day);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_intake_voids ON intake_entries (voids) WHERE voids IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS intake_rollups (
+    patient_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_key TEXT NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    {NUTRIENT_COLUMNS_SQL},
+    PRIMARY KEY (patient_id, period, period_key)
+);
+"""
+
+ENTRY_COLUMNS = ("patient_id", "logged_at", "day", "item_index", "item", "grams") + INTAKE_NUTRIENTS + ("voids",)
+
+INSERT_ENTRY_SQL = f"INSERT INTO intake_entries ({', '.join(ENTRY_COLUMNS)}) VALUES ({', '.join('?' * len(ENTRY_COLUMNS))})"
+
+# Adds one entry's amounts (negative for a reversal) to a rollup row: O(1) whatever the history length
+UPSERT_ROLLUP_SQL = f"""
+INSERT INTO intake_rollups (patient_id, period, period_key, entries, {', '.join(INTAKE_NUTRIENTS)})
+VALUES (?, ?, ?, ?, {', '.join('?' * len(INTAKE_NUTRIENTS))})
+ON CONFLICT(patient_id, period, period_key) DO UPDATE SET
+    entries = entries + excluded.entries,
+    {', '.join(f"{key} = {key} + excluded.{key}" for key in INTAKE_NUTRIENTS)}
+"""
+
+ROLLUPS_SQL = f"""
+SELECT period_key, entries, {', '.join(INTAKE_NUTRIENTS)} FROM intake_rollups
+WHERE patient_id = ? AND period = ? AND period_key >= ? AND period_key <= ?
+ORDER BY period_key
+"""
+
+# Entries of a day that are still in effect: neither reversals nor reversed
+ACTIVE_ENTRIES_SQL = f"""
+SELECT id, {', '.join(ENTRY_COLUMNS[1:-1])} FROM intake_entries AS entry
+WHERE patient_id = ? AND day = ? AND voids IS NULL
+  AND NOT EXISTS (SELECT 1 FROM intake_entries AS reversal WHERE reversal.voids = entry.id)
+ORDER BY logged_at, id
+"""
+
+def nutrients_for_item(food_item, grams):
+    # Amounts in a portion of a catalogue item, from its per-100 g (or 100 ml) values.
+    # Nutrients the item has no number for are left out so the caller can ask for them.
+    nutrients = {}
+    for key in INTAKE_NUTRIENTS:
+        threshold = food_item.nutrient(key)
+        if threshold is not None:
+            nutrients[key] = threshold[1] * grams / 100
+    return nutrients
+
+def compare_to_plan(totals, calculated_results):
+    # Consumed amount against the plan for each nutrient: energy and macros against their targets,
+    # sugar, saturated fat and sodium against the limits read from the condition's guidelines
+    calories = calculated_results["adjusted_tdee"]
+    macros = calculated_results["macros"]
+    targets = {"energy": calories, "protein": macros["protein_g"], "carbohydrate": macros["carb_g"], "fat": macros["fat_g"]}
+    limits = get_nutrient_limits(calculated_results.get("micronutrient_guidelines", {}), calories)
+
+    comparison = {}
+    for key in INTAKE_NUTRIENTS:
+        goal = targets.get(key, limits.get(key))
+        if goal == float("inf"):
+            goal = None
+        consumed = totals.get(key, 0)
+        comparison[key] = {
+            "consumed": consumed,
+            "goal": goal,
+            "kind": "target" if key in targets else "limit",
+            "remaining": None if goal is None else goal - consumed,
+            "fraction": None if not goal else consumed / goal
+        }
+    return comparison
+
+class IntakeLog:
+    def __init__(self, db_path=None):
+        # Opens (creating if needed) the intake tables in the same local database as the plans
+        self.db_path = db_path or SETTINGS.get("database", {}).get("file_name", "nutrition.db")
+        self.connection = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def add_entry(self, patient_id, item, grams, nutrients, item_index=None, logged_at=None):
+        # Records a portion eaten; `nutrients` holds the amounts in the portion (missing keys count as 0).
+        # Returns the entry id.
+        logged_at = logged_at or datetime.now()
+        amounts = tuple(float(nutrients.get(key) or 0) for key in INTAKE_NUTRIENTS)
+        row = (str(patient_id), logged_at.isoformat(timespec="seconds"), logged_at.date().isoformat(),
+               item_index, item, float(grams)) + amounts + (None,)
+        with self.connection:
+            cursor = self.connection.execute(INSERT_ENTRY_SQL, row)
+            self._add_to_rollups(str(patient_id), logged_at.date(), 1, amounts)
+        return cursor.lastrowid
+
+    def remove_entry(self, entry_id):
+        # Appends a reversal of an entry (same day, negated amounts) and takes it off the rollups.
+        # Raises ValueError for unknown, reversal or already removed entries.
+        with self.connection:
+            entry = self.connection.execute("SELECT * FROM intake_entries WHERE id = ?", (entry_id,)).fetchone()
+            if entry is None or entry["voids"] is not None:
+                raise ValueError(f"Intake entry {entry_id} does not exist or cannot be removed.")
+            amounts = tuple(-entry[key] for key in INTAKE_NUTRIENTS)
+            row = (entry["patient_id"], datetime.now().isoformat(timespec="seconds"), entry["day"],
+                   entry["item_index"], entry["item"], -entry["grams"]) + amounts + (entry_id,)
+            try:
+                cursor = self.connection.execute(INSERT_ENTRY_SQL, row)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Intake entry {entry_id} has already been removed.")
+            self._add_to_rollups(entry["patient_id"], date.fromisoformat(entry["day"]), -1, amounts)
+        return cursor.lastrowid
+
+    def _add_to_rollups(self, patient_id, day, entries, amounts):
+        self.connection.executemany(
+            UPSERT_ROLLUP_SQL,
+            [(patient_id, period, period_key(day), entries) + amounts for period, period_key in PERIODS.items()]
+        )
+
+    def totals(self, patient_id, day=None, period="day"):
+        # Running totals for the period containing `day` (default today), read from its rollup row
+        key = PERIODS[period](day or date.today())
+        rows = self.rollups(patient_id, period, key, key)
+        return rows[0] if rows else {"period_key": key, "entries": 0, **dict.fromkeys(INTAKE_NUTRIENTS, 0.0)}
+
+    def rollups(self, patient_id, period="day", since="", until="9999"):
+        # Precomputed totals per day, ISO week ("2026-W07") or month ("2026-02"), oldest first
+        rows = self.connection.execute(ROLLUPS_SQL, (str(patient_id), period, since, until)).fetchall()
+        return [dict(row) for row in rows]
+
+    def entries(self, patient_id, day=None):
+        # The day's entries still in effect, in the order they were logged
+        day = (day or date.today()).isoformat()
+        return [dict(row) for row in self.connection.execute(ACTIVE_ENTRIES_SQL, (str(patient_id), day))]
+
+    def close(self):
+        self.connection.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Show a patient's logged intake totals.")
+    parser.add_argument("patient_id")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    parser.add_argument("--period", choices=PERIODS, default="day")
+    args = parser.parse_args()
+
+    log = IntakeLog(args.db)
+    for rollup in log.rollups(args.patient_id, args.period):
+        print(f"{rollup['period_key']}  {rollup['entries']:3d} entries  {rollup['energy']:7.0f} kcal  "
+              f"protein {rollup['protein']:5.0f} g  carbs {rollup['carbohydrate']:5.0f} g  fat {rollup['fat']:5.0f} g  "
+              f"sugar {rollup['sugar']:5.0f} g  sodium {rollup['sodium']:6.0f} mg")
+    log.close()
@@ -0,0 +1,133 @@
+# intake_tracker.py
+
+from datetime import date, datetime, time
+
+import streamlit as st
+
+from food_wiki import load_data
+from intake_log import INTAKE_NUTRIENTS, IntakeLog, compare_to_plan, nutrients_for_item
+
+NUTRIENT_UNITS = {"energy": "kcal", "sodium": "mg"}
+
+
+@st.cache_resource(show_spinner=False)
+def get_intake_log():
+    """Opens the intake log once per server process; every session shares the connection."""
+    return IntakeLog()
+
+
+@st.cache_resource(show_spinner=False)
+def get_plan_store():
+    """Opens the plan database once per server process, to look up each patient's latest plan."""
+    from plan_store import PlanStore
+    return PlanStore()
+
+
+def get_latest_plan(patient_id):
+    """Returns the calculated results of the patient's most recent stored plan, or None."""
+    from plan_store import plan_from_row
+    history = get_plan_store().get_patient_history(patient_id)
+    return plan_from_row(history[-1])[1] if history else None
+
+
+def label(key):
+    return f"{key.replace('_', ' ').capitalize()} ({NUTRIENT_UNITS.get(key, 'g')})"
+
+
+def show_add_entry(log, patient_id, day):
+    """Search the catalogue for an item and log a portion of it."""
+    shared = load_data()
+    if shared is None:
+        return
+    catalogue = shared.catalogue
+
+    query = st.text_input("Search food or drink:", key="intake_query")
+    if not query:
+        return
+    matches = catalogue.query(query)[:50]
+    if not matches:
+        st.error("No results found. Try a different search term.")
+        return
+
+    # Options are catalogue indices: widget values must be plain data, not views onto the columns
+    index = st.selectbox("Item", matches, format_func=lambda index: f"{catalogue[index].item} ({catalogue[index].type or 'N/A'})", key="intake_item")
+    food_item = catalogue[index]
+    grams = st.number_input("Portion (g or ml)", min_value=1.0, max_value=5000.0, value=100.0, step=10.0, key="intake_grams")
+    nutrients = nutrients_for_item(food_item, grams)
+
+    # The Food Wiki does not give every nutrient for every item; missing amounts can be typed in
+    missing = [key for key in INTAKE_NUTRIENTS if key not in nutrients]
+    if missing:
+        st.caption("No catalogue value for some nutrients; enter the amounts in this portion if known.")
+        cols = st.columns(min(len(missing), 4))
+        for i, key in enumerate(missing):
+            with cols[i % len(cols)]:
+                nutrients[key] = st.number_input(label(key), min_value=0.0, value=0.0, key=f"intake_manual_{key}")
+
+    if st.button("Add to log", key="intake_add"):
+        log.add_entry(patient_id, food_item.item, grams, nutrients, item_index=food_item.index,
+                      logged_at=None if day == date.today() else datetime.combine(day, time(12)))
+        st.success(f"Logged {grams:g} g of {food_item.item}.")
+
+
+def show_day_totals(log, patient_id, day):
+    """Running totals of the day against the patient's latest plan."""
+    totals = log.totals(patient_id, day)
+    calculated_results = get_latest_plan(patient_id)
+    if calculated_results is None:
+        st.info("No stored plan for this patient; totals are shown without targets.")
+        for key in INTAKE_NUTRIENTS:
+            st.write(f"**{label(key)}:** {totals[key]:.1f}")
+        return
+
+    for key, status in compare_to_plan(totals, calculated_results).items():
+        if status["goal"] is None:
+            st.write(f"**{label(key)}:** {status['consumed']:.1f} (no limit)")
+            continue
+        word = "target" if status["kind"] == "target" else "limit"
+        over = status["kind"] == "limit" and status["consumed"] > status["goal"]
+        st.write(f"**{label(key)}:** {status['consumed']:.1f} of {status['goal']:.1f} {word}" + (" ⚠️ over the limit" if over else ""))
+        st.progress(min(max(status["fraction"], 0.0), 1.0))
+
+
+def show_intake_log():
+    st.header("Intake Log")
+    log = get_intake_log()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        patient_id = st.text_input("Patient ID", key="intake_patient").strip()
+    with col2:
+        day = st.date_input("Day", value=date.today(), key="intake_day")
+    if not patient_id:
+        st.info("Enter a patient ID to log and review their intake.")
+        return
+
+    with st.expander("Add an item", expanded=True):
+        show_add_entry(log, patient_id, day)
+
+    st.subheader("Logged items")
+    entries = log.entries(patient_id, day)
+    if not entries:
+        st.write("Nothing logged for this day yet.")
+    for entry in entries:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.write(f"{entry['logged_at'][11:16]}  **{entry['item']}**, {entry['grams']:g} g ({entry['energy']:.0f} kcal)")
+        with col2:
+            if st.button("Remove", key=f"intake_remove_{entry['id']}"):
+                log.remove_entry(entry["id"])
+                st.rerun()
+
+    st.subheader("Day totals")
+    show_day_totals(log, patient_id, day)
+
+    # Weekly and monthly totals come straight from the rollup rows
+    for period in ("week", "month"):
+        rollups = log.rollups(patient_id, period)
+        if rollups:
+            st.subheader(f"{period.capitalize()}ly totals")
+            st.dataframe(
+                [{"period": row["period_key"], "entries": row["entries"], **{label(key): round(row[key], 1) for key in INTAKE_NUTRIENTS}} for row in rollups],
+                hide_index=True
+            )
@@ -0,0 +1,287 @@
+# label_parser.py
+
+import re
+
+from food_catalogue import NUTRIENT_COLUMNS # Exact sheet header of every nutrient, per category
+
+# Sheet each Food Wiki category lives on, matching the names used by food_wiki.py
+CATEGORY_SHEETS = {
+    "Food": "Food",
+    "Beverage": "Beverages"
+}
+
+# Value written for a nutrient the label does not declare, matching the "-" used in Food Wiki.xlsx
+MISSING_VALUE = "-"
+
+# Full column order of each sheet, so parsed rows can be appended as-is
+SHEET_COLUMNS = {
+    category: ["Type", "Item"]
+    + [columns[key] for key in (
+        "calories_serving", "fat", "sugar", "saturated_fat", "sodium",
+        "dietary_fibre", "calcium", "potassium", "wholegrain"
+    )]
+    + ["Tag ID", "Example 1", "Example 2", "Example 3"]
+    + [columns[key] for key in ("energy", "protein", "carbohydrate")]
+    for category, columns in NUTRIENT_COLUMNS.items()
+}
+
+# Unit each nutrient is normalised to before it is written to the sheet
+TARGET_UNITS = {
+    "energy": "kcal",
+    "fat": "g",
+    "saturated_fat": "g",
+    "carbohydrate": "g",
+    "sugar": "g",
+    "dietary_fibre": "g",
+    "protein": "g",
+    "sodium": "mg",
+    "calcium": "mg",
+    "potassium": "mg",
+    "wholegrain": "%"
+}
+
+# Multipliers to grams (mass) or kilocalories (energy)
+UNIT_SCALE = {
+    "g": 1.0,
+    "mg": 0.001,
+    "mcg": 0.000001,
+    "kcal": 1.0,
+    "kj": 1 / 4.184,
+    "%": 1.0
+}
+UNIT_ALIASES = {"µg": "mcg", "μg": "mcg", "ug": "mcg", "cal": "kcal", "kcals": "kcal"}
+
+# Sodium is 40% of salt by mass, so 1 g of salt carries 400 mg of sodium
+SALT_TO_SODIUM_MG = 400.0
+
+# --- Precompiled patterns (compiled once at import so each label is a single pass over its lines) ---
+
+# Recognises the nutrient named at the start of a line. More specific names come first so that
+# "Saturated Fat" is not read as "Fat" and "Total Sugars" is not read as "Carbohydrate".
+NUTRIENT_PATTERN = re.compile(
+    r"""^[\s\-–•*·>]*(?:of\s+which|incl(?:uding|udes|\.)?|\(?-?\s*)?\s*(?:
+        (?P<saturated_fat>sat(?:urated|urates|\.)?\s*(?:fat(?:ty\s+acids)?|fat)?)(?![a-z])
+      | (?P<trans_fat>trans\s*fat)
+      | (?P<fat>(?:total\s+)?fat(?:s)?)(?![a-z])
+      | (?P<sugar>(?:total\s+)?sugars?)(?![a-z])
+      | (?P<dietary_fibre>(?:dietary\s+|total\s+)?fib(?:re|er)s?)(?![a-z])
+      | (?P<carbohydrate>(?:total\s+)?carbohydrates?|carbs)(?![a-z])
+      | (?P<protein>proteins?)(?![a-z])
+      | (?P<energy>energy|calories)(?![a-z])
+      | (?P<sodium>sodium)(?![a-z])
+      | (?P<salt>salt)(?![a-z])
+      | (?P<calcium>calcium)(?![a-z])
+      | (?P<potassium>potassium)(?![a-z])
+      | (?P<wholegrain>whole\s*-?\s*grains?)(?![a-z])
+    )""",
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Tokenises a quantity such as "12.5 g", "1,676kJ", "<0.5mg" or "25%"
+QUANTITY_PATTERN = re.compile(
+    r"(?:<|less\s+than\s+)?(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>kcals?|kj|mg|mcg|µg|μg|ug|g|%|cal)?(?![a-z])",
+    re.IGNORECASE
+)
+
+# A unit printed once beside the nutrient name, e.g. "Sodium (mg)   150   500"
+NAME_UNIT_PATTERN = re.compile(r"^\s*\(\s*(?P<unit>kcal|kj|mg|mcg|µg|μg|ug|g)\s*\)", re.IGNORECASE)
+
+THOUSANDS_PATTERN = re.compile(r"^\d{1,3},\d{3}$")
+
+# Declared zero amounts that carry no digits
+ZERO_PATTERN = re.compile(r"\b(?:nil|trace|none|n/?d)\b", re.IGNORECASE)
+
+# Finds the first gram/ml amount on the serving-size line, e.g. "Serving size: 1 cup (240 ml)"
+SERVING_SIZE_PATTERN = re.compile(
+    r"serving\s*size[^\n]*?(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>g|ml|l)\b",
+    re.IGNORECASE
+)
+
+# Column headers such as "Per Serving   Per 100 g" or "per 100ml | per serve"
+COLUMN_HEADER_PATTERN = re.compile(
+    r"per\s*(?P<per100>100\s*(?P<unit>g|ml))|(?P<serving>per\s*serv(?:ing|e)s?\b)",
+    re.IGNORECASE
+)
+
+def _to_float(number_str):
+    # "1,676" is a thousands separator, while OCR and European labels use "1,5" as a decimal comma
+    if THOUSANDS_PATTERN.match(number_str):
+        return float(number_str.replace(",", ""))
+    return float(number_str.replace(",", "."))
+
+def _convert(value, unit, target):
+    # Converts a parsed quantity to the target unit, or returns None if the units are incompatible
+    unit = UNIT_ALIASES.get(unit, unit)
+    if unit is None:
+        return value
+    if (unit == "%") != (target == "%"):
+        return None
+    if target in ("kcal", "%"):
+        return value * UNIT_SCALE[unit] if unit in ("kcal", "kj", "%") else None
+    if unit in ("kcal", "kj"):
+        return None
+    return value * UNIT_SCALE[unit] / UNIT_SCALE[target]
+
+def _read_column_layout(line):
+    # Returns the column order ("serving"/"100") declared in a header line, along with the per-100 base unit
+    layout = []
+    base_unit = None
+    for match in COLUMN_HEADER_PATTERN.finditer(line):
+        # Skip "%DI per serve" style columns; their values are filtered out as percentages
+        if "%" in line[max(0, match.start() - 8):match.start()]:
+            continue
+        if match.group("per100"):
+            layout.append("100")
+            base_unit = match.group("unit").lower()
+        else:
+            layout.append("serving")
+    return layout, base_unit
+
+def _read_quantities(remainder, nutrient):
+    # Tokenises every quantity on the line and keeps those that make sense for the nutrient
+    quantities = []
+    default_unit = None
+    name_unit = NAME_UNIT_PATTERN.match(remainder)
+    if name_unit:
+        default_unit = name_unit.group("unit").lower()
+        remainder = remainder[name_unit.end():]
+
+    for match in QUANTITY_PATTERN.finditer(remainder):
+        unit = match.group("unit")
+        unit = unit.lower() if unit else default_unit
+        quantities.append((_to_float(match.group("number")), unit))
+
+    if not quantities and ZERO_PATTERN.search(remainder):
+        return [(0.0, None)]
+
+    if nutrient == "energy":
+        # Labels often print "1676 kJ / 400 kcal"; prefer kcal figures when both are present
+        kcal_values = [q for q in quantities if UNIT_ALIASES.get(q[1], q[1]) == "kcal"]
+        return kcal_values or [q for q in quantities if q[1] != "%"]
+    if nutrient == "wholegrain":
+        return quantities
+    # Any "%" on other lines is a daily-intake column, not an amount
+    return [q for q in quantities if q[1] != "%"]
+
+def parse_label_nutrients(text):
+    # Tokenises raw label text and returns nutrient amounts per 100 g/ml, in the units of TARGET_UNITS.
+    # Also reports the serving size and whether the label is for a liquid (ml) so rows can be categorised.
+    per_100 = {}
+    per_serving = {}
+    serving_size = None
+    base_unit = None
+    layout = []
+
+    serving_match = SERVING_SIZE_PATTERN.search(text)
+    if serving_match:
+        serving_size = _to_float(serving_match.group("number"))
+        unit = serving_match.group("unit").lower()
+        if unit == "l":
+            serving_size *= 1000
+            unit = "ml"
+        base_unit = unit
+
+    for line in text.splitlines():
+        match = NUTRIENT_PATTERN.match(line)
+        if match is None or match.lastgroup == "trans_fat":
+            header_layout, header_unit = _read_column_layout(line)
+            if header_layout:
+                layout = header_layout
+                base_unit = header_unit or base_unit
+            continue
+
+        nutrient = match.lastgroup
+        remainder = line[match.end():]
+        target_nutrient = "sodium" if nutrient == "salt" else nutrient
+
+        # A sodium line always wins over a derived salt figure
+        if nutrient == "salt" and "sodium" in per_100:
+            continue
+
+        quantities = _read_quantities(remainder, target_nutrient)
+        if not quantities:
+            continue
+
+        for column, (value, unit) in zip(layout or [None], quantities):
+            if nutrient == "salt":
+                converted = _convert(value, unit or "g", "g")
+                converted = None if converted is None else converted * SALT_TO_SODIUM_MG
+            else:
+                converted = _convert(value, unit, TARGET_UNITS[target_nutrient])
+            if converted is None:
+                continue
+
+            if column == "serving":
+                per_serving[target_nutrient] = converted
+            elif column == "100":
+                per_100[target_nutrient] = converted
+            elif serving_size:
+                # Without a header, a label with a serving size is read as per-serving
+                per_serving[target_nutrient] = converted
+            else:
+                per_100[target_nutrient] = converted
+
+            # When no header was found, only the first quantity on the line is meaningful
+            if not layout:
+                break
+
+    # Scale per-serving amounts to per-100 for nutrients the label only declares per serving
+    if serving_size:
+        for nutrient, value in per_serving.items():
+            if nutrient not in per_100 and nutrient != "wholegrain":
+                per_100[nutrient] = value * 100.0 / serving_size
+        if "energy" in per_serving:
+            per_100["calories_serving"] = per_serving["energy"]
+        elif "energy" in per_100:
+            per_100["calories_serving"] = per_100["energy"] * serving_size / 100.0
+    if "wholegrain" in per_serving and "wholegrain" not in per_100:
+        per_100["wholegrain"] = per_serving["wholegrain"]
+
+    return {
+        "nutrients": per_100,
+        "serving_size": serving_size,
+        "base_unit": base_unit
+    }
+
+def parse_label(text, category=None, item=None, item_type=None, tag_ids=None):
+    # Parses one label into a row keyed by the Food Wiki sheet columns of its category.
+    # The category is inferred from the label (ml => Beverage) unless given explicitly.
+    parsed = parse_label_nutrients(text)
+    if category is None:
+        category = "Beverage" if parsed["base_unit"] == "ml" else "Food"
+    if category not in NUTRIENT_COLUMNS:
+        raise ValueError(f"Unknown Food Wiki category '{category}'. Expected one of: {', '.join(NUTRIENT_COLUMNS)}.")
+
+    row = dict.fromkeys(SHEET_COLUMNS[category], MISSING_VALUE)
+    row["Type"] = item_type if item_type else MISSING_VALUE
+    row["Item"] = item if item else MISSING_VALUE
+    row["Tag ID"] = tag_ids if tag_ids else MISSING_VALUE
+
+    columns = NUTRIENT_COLUMNS[category]
+    for nutrient, value in parsed["nutrients"].items():
+        row[columns[nutrient]] = round(value, 2)
+
+    # Matches the Category_Key load_data() adds, so rows can also go straight into the cached DataFrame
+    row["Category_Key"] = category
+    return row
+
+def parse_labels(texts, category=None):
+    # Parses many labels in one call; each entry is label text or an (item, text) pair
+    rows = []
+    for entry in texts:
+        if isinstance(entry, tuple):
+            item, text = entry
+            rows.append(parse_label(text, category=category, item=item))
+        else:
+            rows.append(parse_label(entry, category=category))
+    return rows
+
+def sheet_rows(rows):
+    # Groups parsed rows by destination sheet as value lists in sheet column order (e.g. for worksheet.append)
+    grouped = {sheet: [] for sheet in CATEGORY_SHEETS.values()}
+    for row in rows:
+        category = row["Category_Key"]
+        grouped[CATEGORY_SHEETS[category]].append(
+            [row.get(column, MISSING_VALUE) for column in SHEET_COLUMNS[category]]
+        )
+    return grouped
@@ -1,15 +1,27 @@
 # logger_config.py
 
+import atexit
 import logging 
-import os 
 from config_manager import SETTINGS # Imports logging-specific configuration from settings.json
 
-# Global logger instance used throughout the application
-app_logger = None
+# Global logger instance used throughout the application. It exists from import, but has no
+# handlers (and opens no files) until an entry point calls `setup_logging`.
+app_logger = logging.getLogger(__name__)
+
+# Background listener that performs the actual file/console writes
+log_listener = None
 
 def setup_logging():
     # Configures the main application logger
-    global app_logger
+    global log_listener
+
+    # Prevent adding duplicate handlers if the function is called multiple times
+    if log_listener is not None:
+        return
+
+    # Only needed once logging is configured; importing it costs noticeable start-up time
+    import logging.handlers
+    import queue
 
     log_settings = SETTINGS.get("logging", {}) # Get logging-specific settings
     log_file_name = log_settings.get("file_name", "app.log")
@@ -27,28 +39,27 @@ def setup_logging():
     file_level = LEVELS.get(file_level_str, logging.INFO)
     console_level = LEVELS.get(console_level_str, logging.WARNING)
 
-    # Get the main logger instance
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.DEBUG)
+    app_logger.setLevel(logging.DEBUG)
 
-    # Prevent adding duplicate handlers if the function is called multiple times
-    if not logger.handlers:
-        # File Handler: Directs logs to a specified file
-        file_handler = logging.FileHandler(log_file_name)
-        file_handler.setLevel(file_level) 
-        file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-
-        # Console Handler: Directs logs to the standard output (terminal)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(console_level)
-        console_formatter = logging.Formatter('%(levelname)s: %(message)s')
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
-    
-    # Assign the configured logger to the global `app_logger` for easy access throughout the application
-    app_logger = logger
-
-# Call `setup_logging` automatically when this module is imported
-setup_logging()
\ No newline at end of file
+    # File Handler: Directs logs to a specified file, opened when the first record is written
+    file_handler = logging.FileHandler(log_file_name, delay=True)
+    file_handler.setLevel(file_level) 
+    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(file_formatter)
+
+    # Console Handler: Directs logs to the standard output (terminal)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_formatter = logging.Formatter('%(levelname)s: %(message)s')
+    console_handler.setFormatter(console_formatter)
+
+    # Callers (including the Tkinter thread) only enqueue records; a listener thread does the writing
+    log_queue = queue.SimpleQueue()
+    app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    log_listener.start()
+
+    # Flush any queued records when the application exits
+    atexit.register(log_listener.stop)
@@ -0,0 +1,181 @@
+# meal_planner.py
+
+from collections import namedtuple
+
+import numpy as np
+
+from config_manager import SETTINGS # Supplies portion sizes, meal shares and the limit penalty
+from calculations import LIMIT_NUTRIENTS, get_nutrient_limits
+
+# Columns of the nutrient matrix, per 100 g (or 100 ml). The first four are targets, the rest limits.
+TARGET_NUTRIENTS = ("energy", "protein", "carbohydrate", "fat")
+MATRIX_NUTRIENTS = TARGET_NUTRIENTS + LIMIT_NUTRIENTS
+
+# Plan keys matching each target
+MACRO_KEYS = {"protein": "protein_g", "carbohydrate": "carb_g", "fat": "fat_g"}
+
+# Items with energy and macro data, as row-aligned catalogue indices and a float32 (items, nutrients) matrix.
+# Limit nutrients an item does not declare count as zero.
+NutrientMatrix = namedtuple("NutrientMatrix", ("indices", "values"))
+
+def build_nutrient_matrix(catalogue):
+    # Built once per catalogue and reused for every plan; columns are read in place with np.frombuffer
+    indices, blocks = [], []
+    for table in catalogue.tables:
+        if any(key not in table.nutrients for key in TARGET_NUTRIENTS):
+            continue
+        usable = np.ones(len(table), dtype=bool)
+        block = np.zeros((len(table), len(MATRIX_NUTRIENTS)), dtype=np.float32)
+        for i, key in enumerate(MATRIX_NUTRIENTS):
+            column = table.nutrients.get(key)
+            if column is None:
+                continue
+            has_value = np.frombuffer(column.codes, dtype=np.uint8) > 1
+            if key in TARGET_NUTRIENTS:
+                usable &= has_value
+            block[:, i] = np.where(has_value, np.frombuffer(column.values, dtype=np.float32), 0)
+        rows = np.flatnonzero(usable)
+        indices.append(rows + table.start)
+        blocks.append(block[rows])
+    if not blocks:
+        return NutrientMatrix(np.zeros(0, dtype=np.int64), np.zeros((0, len(MATRIX_NUTRIENTS)), dtype=np.float32))
+    return NutrientMatrix(np.concatenate(indices), np.concatenate(blocks))
+
+def _score(totals, targets, limits, limit_penalty):
+    # Squared relative distance from the targets plus a penalty for every limit exceeded.
+    # `totals` has the nutrients on its last axis, so whole candidate grids are scored at once.
+    target_error = ((totals[..., :len(targets)] - targets) / targets) ** 2
+    excess = np.maximum(totals[..., len(targets):] - limits, 0) / np.where(np.isinf(limits), 1, limits)
+    return target_error.sum(axis=-1) + limit_penalty * (excess ** 2).sum(axis=-1)
+
+def _shortlist(values, targets, pool_size):
+    # Rows of the nutrient matrix worth searching for these targets, found in one pass over it
+    if len(values) <= pool_size:
+        return np.arange(len(values))
+    energy = np.maximum(values[:, 0], 1e-6)
+    shares = values[:, 1:4] * np.array([4, 4, 9], dtype=np.float32) / energy[:, None] # Energy share per macro
+    target_shares = targets[1:4] * np.array([4, 4, 9], dtype=np.float32) / targets[0]
+    distance = np.abs(shares - target_shares).sum(axis=1)
+    rows = [np.argpartition(distance, pool_size // 2)[:pool_size // 2]]
+    for i in range(3):
+        rows.append(np.argpartition(-shares[:, i], pool_size // 6)[:pool_size // 6])
+    return np.unique(np.concatenate(rows))
+
+def plan_day(matrix, calculated_results, catalogue=None, options=None):
+    # Greedily assembles a day's menu: each step adds the (item, portion) that brings the totals
+    # closest to the energy and macro targets without breaching the condition limits, evaluated for
+    # every candidate and portion size in one vectorised step. Stops when no addition improves the plan.
+    options = {**SETTINGS.get("meal_planner", {}), **(options or {})}
+    portions = np.asarray(options.get("portion_grams", (50, 100, 150, 200)), dtype=np.float32)
+    max_items = options.get("max_items", 10)
+    limit_penalty = options.get("limit_penalty", 100.0)
+
+    calories = calculated_results["adjusted_tdee"]
+    macros = calculated_results["macros"]
+    targets = np.array([calories] + [macros[MACRO_KEYS[key]] for key in TARGET_NUTRIENTS[1:]], dtype=np.float32)
+    limits_by_key = get_nutrient_limits(calculated_results.get("micronutrient_guidelines", {}), calories, options.get("strict_limit_pct"))
+    limits = np.array([limits_by_key[key] for key in LIMIT_NUTRIENTS], dtype=np.float32)
+
+    # Only a shortlist of the catalogue is searched: the items whose macro balance is closest to the
+    # targets', plus the densest source of each macro so the greedy steps can correct an imbalance
+    candidates = _shortlist(matrix.values, targets, options.get("candidate_pool", 2000))
+    values = matrix.values[candidates]
+    max_item_energy = calories * options.get("max_item_energy_share", 0.25)
+
+    totals = np.zeros(len(MATRIX_NUTRIENTS), dtype=np.float32)
+    score = _score(totals, targets, limits, limit_penalty)
+    portion_values = (portions[:, None, None] / 100) * values[None, :, :] # (portions, items, nutrients)
+    allowed = portion_values[..., 0] <= max_item_energy # No single portion may carry most of the day
+    picks = []
+    for _ in range(max_items):
+        scores = _score(totals + portion_values, targets, limits, limit_penalty)
+        scores[~allowed] = np.inf
+        portion, row = np.unravel_index(np.argmin(scores), scores.shape)
+        if scores[portion, row] >= score:
+            break
+        score = scores[portion, row]
+        totals = totals + portion_values[portion, row]
+        allowed[:, row] = False
+        picks.append((int(candidates[row]), float(portions[portion])))
+
+    return _menu(matrix, picks, totals, targets, limits_by_key, catalogue, options)
+
+def _menu(matrix, picks, totals, targets, limits, catalogue, options):
+    # Spreads the picked items over the meals (largest energy first, into the meal furthest below
+    # its share of the day) and reports the totals next to the targets and limits
+    shares = options.get("meal_shares", {"Breakfast": 0.25, "Lunch": 0.35, "Dinner": 0.3, "Snacks": 0.1})
+    meals = {meal: [] for meal in shares}
+    meal_energy = dict.fromkeys(shares, 0.0)
+    day_energy = float(targets[0])
+
+    entries = []
+    for row, grams in picks:
+        nutrients = {key: round(float(value) * grams / 100, 1) for key, value in zip(MATRIX_NUTRIENTS, matrix.values[row])}
+        index = int(matrix.indices[row])
+        entry = {"index": index, "grams": grams, **nutrients}
+        if catalogue is not None:
+            entry["item"] = catalogue[index].item
+        entries.append(entry)
+
+    for entry in sorted(entries, key=lambda entry: entry["energy"], reverse=True):
+        meal = min(shares, key=lambda meal: meal_energy[meal] - shares[meal] * day_energy)
+        meals[meal].append(entry)
+        meal_energy[meal] += entry["energy"]
+
+    return {
+        "meals": meals,
+        "totals": {key: round(float(value), 1) for key, value in zip(MATRIX_NUTRIENTS, totals)},
+        "targets": {key: round(float(value), 1) for key, value in zip(TARGET_NUTRIENTS, targets)},
+        "limits": {key: (None if value == float("inf") else round(value, 1)) for key, value in limits.items()}
+    }
+
+# Per-process state for plan_days: each worker opens the catalogue store (memory-mapped, so the
+# pages are shared) and builds the nutrient matrix once
+_worker_state = {}
+
+def _init_worker(store_dir):
+    from food_data import build_shared_food_data
+    catalogue = build_shared_food_data(store_dir=store_dir).catalogue
+    _worker_state["catalogue"] = catalogue
+    _worker_state["matrix"] = build_nutrient_matrix(catalogue)
+
+def _plan_day_job(calculated_results):
+    return plan_day(_worker_state["matrix"], calculated_results, _worker_state["catalogue"])
+
+def plan_days(plans, store_dir=None, processes=None, chunk_size=16):
+    # Yields a day menu for each calculated plan, in order, spreading the work over a process pool
+    # when `processes` is set
+    from concurrent.futures import ProcessPoolExecutor # Only batch runs need the process machinery
+
+    if not processes:
+        _init_worker(store_dir)
+        yield from map(_plan_day_job, plans)
+        return
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(store_dir,)) as executor:
+        yield from executor.map(_plan_day_job, plans, chunksize=chunk_size)
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    import json
+    import sys
+    import time
+    from plan_store import PlanStore, plan_from_row
+
+    parser = argparse.ArgumentParser(description="Generate day menus from the Food Wiki catalogue for stored plans.")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    parser.add_argument("--store", help="Catalogue store directory (defaults to the one in settings.json)")
+    parser.add_argument("--patient", help="Only plan for this patient ID")
+    parser.add_argument("--processes", type=int, help="Plan with a pool of this many processes")
+    parser.add_argument("--out", help="Write the menus as JSON lines to this file instead of printing them")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    patient_ids = [args.patient] if args.patient else store.list_patients()
+    rows = [row for patient_id in patient_ids for row in store.get_patient_history(patient_id)]
+    started = time.perf_counter()
+    with open(args.out, "w") if args.out else contextlib.nullcontext(sys.stdout) as f:
+        for row, menu in zip(rows, plan_days((plan_from_row(row)[1] for row in rows), args.store, args.processes)):
+            f.write(json.dumps({"patient_id": row["patient_id"], "plan_id": row["id"], **menu}) + "\n")
+    print(f"Planned {len(rows)} days in {time.perf_counter() - started:.1f} s.")
+    store.close()
@@ -0,0 +1,195 @@
+# metrics.py
+
+import bisect
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from 100 microseconds (a single plan) up to a slow workbook load
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+INF_BUCKET_LABEL = 'le="+Inf"'
+
+class _Metric:
+    # Values are kept in one shard per thread: a thread only ever writes its own shard, so recording
+    # needs no lock. Shards are summed when the metrics are read, which is rare compared to writes.
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock() # Only taken the first time a thread records a value
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _label_text(self, labels, extra=""):
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, labels=()):
+        # `labels` is a tuple of values in `labelnames` order, e.g. ("age",)
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in list(self._shards):
+            for labels, value in shard.copy().items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def value(self, labels=()):
+        return self.values().get(labels, 0)
+
+    def render(self):
+        return [f"{self.name}{self._label_text(labels)} {value}" for labels, value in sorted(self.values().items())]
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, seconds, labels=()):
+        # Each shard entry is [count per bucket..., count above the last bucket, sum, count]
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [0] * (len(self.buckets) + 3)
+        entry[bisect.bisect_left(self.buckets, seconds)] += 1
+        entry[-2] += seconds
+        entry[-1] += 1
+
+    def time(self, labels=()):
+        # Context manager recording how long its block took
+        return _Timer(self, labels)
+
+    def values(self):
+        totals = {}
+        for shard in list(self._shards):
+            for labels, entry in shard.copy().items():
+                total = totals.setdefault(labels, [0] * len(entry))
+                for i, value in enumerate(list(entry)):
+                    total[i] += value
+        return totals
+
+    def render(self):
+        lines = []
+        for labels, entry in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                bucket_label = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._label_text(labels, INF_BUCKET_LABEL)} {entry[-1]}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {entry[-2]}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {entry[-1]}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+        return False
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        # Returns the existing metric of that name so modules can declare the metrics they record
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render_text(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, file_path):
+        # Writes to a temporary file first so a scraper never reads a half-written snapshot
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render_text())
+        os.replace(temp_path, file_path)
+
+REGISTRY = MetricsRegistry()
+
+# Metrics recorded across the application
+PLANS_COMPUTED = REGISTRY.counter("nutrition_plans_computed_total", "Nutrition plans calculated.", ("source",))
+VALIDATION_FAILURES = REGISTRY.counter("nutrition_validation_failures_total", "Rejected patient inputs.", ("field",))
+REPORTS_SAVED = REGISTRY.counter("nutrition_reports_saved_total", "Plan reports written to disk.", ("format",))
+WIKI_SEARCHES = REGISTRY.counter("nutrition_wiki_searches_total", "Food Wiki searches.", ("source",))
+CACHE_REQUESTS = REGISTRY.counter("nutrition_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+CALCULATION_SECONDS = REGISTRY.histogram("nutrition_calculate_plan_seconds", "Time to calculate a plan.", ("source",))
+LOAD_DATA_SECONDS = REGISTRY.histogram("nutrition_load_data_seconds", "Time to load the Food Wiki workbook.")
+SEARCH_SECONDS = REGISTRY.histogram("nutrition_search_seconds", "Time to search the Food Wiki.")
+RENDER_SECONDS = REGISTRY.histogram("nutrition_render_seconds", "Time to render a plan report.", ("format",))
+PAGE_RENDER_SECONDS = REGISTRY.histogram("nutrition_page_render_seconds", "Time to run a Streamlit page.", ("page",))
+
+class MetricsFileWriter:
+    def __init__(self, file_path, interval_s=15, registry=REGISTRY):
+        # Periodically writes the registry to `file_path` (e.g. for a node-exporter textfile collector)
+        self.file_path = file_path
+        self.interval_s = interval_s
+        self.registry = registry
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_s):
+            self._write()
+
+    def _write(self):
+        try:
+            self.registry.write_file(self.file_path)
+        except OSError:
+            pass # Metrics are best-effort and must never disturb the application
+
+    def stop(self):
+        # Stops the thread and writes a final snapshot
+        self.stop_event.set()
+        self._write()
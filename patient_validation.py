@@ -0,0 +1,136 @@
+# patient_validation.py
+
+from config_manager import SETTINGS # The configured conditions are the valid medical_condition keys
+from energy_equations import EQUATIONS # The registered BMR equations are the valid bmr_equation keys
+from condition_rules import order_conditions # Picks the primary of several conditions by precedence
+from metrics import VALIDATION_FAILURES # Counts rejected inputs per field
+
+# Numeric inputs with their type, realistic range, display name and unit (shared by the GUI and the API)
+NUMERIC_FIELDS = (
+    ("age", int, 1, 120, "Age", "years", "age"),
+    ("weight_kg", float, 20, 300, "Weight", "kg", "weight"),
+    ("height_cm", float, 50, 250, "Height", "cm", "height")
+)
+
+WEIGHT_GOALS = ("maintenance", "loss", "gain")
+
+def _to_number(value, cast):
+    # Converts typed text or a JSON number, rejecting fractional values for whole-number fields
+    if cast is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return cast(value)
+
+def _reject(field, error_message):
+    VALIDATION_FAILURES.inc(labels=(field,))
+    return False, None, error_message
+
+def validate_numeric_inputs(raw_values):
+    # Validates the raw age/weight/height values for correctness and reasonable ranges.
+    # Returns (is_valid, parsed_values, error_message), matching InputPanel's existing messages.
+    parsed = {}
+    for field, cast, low, high, label, unit, noun in NUMERIC_FIELDS:
+        value = raw_values.get(field)
+        if value is None or value == "":
+            return _reject(field, f"{label} cannot be empty.")
+        try:
+            number = _to_number(value, cast)
+        except (TypeError, ValueError):
+            return _reject(field, f"Please enter a valid number for {label}.")
+        if not (low <= number <= high):
+            return _reject(field, f"Please enter a realistic {noun} between {low} and {high} {unit}.")
+        parsed[field] = number
+    return True, parsed, None
+
+def validate_goal_weight(value):
+    # Validates the optional goal weight; empty means none. Returns (is_valid, goal_weight_kg, error_message).
+    if value is None or value == "":
+        return True, None, None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return _reject("goal_weight_kg", "Please enter a valid number for Goal Weight.")
+    if not (20 <= number <= 300):
+        return _reject("goal_weight_kg", "Please enter a realistic goal weight between 20 and 300 kg.")
+    return True, number, None
+
+def validate_energy_inputs(bmr_equation, body_fat_pct):
+    # Validates the optional BMR equation and body fat percentage; empty means none (the equation is then
+    # chosen from settings.json). Returns (is_valid, {"bmr_equation": ..., "body_fat_pct": ...}, error_message).
+    if body_fat_pct is None or body_fat_pct == "":
+        body_fat_pct = None
+    else:
+        try:
+            body_fat_pct = float(body_fat_pct)
+        except (TypeError, ValueError):
+            return _reject("body_fat_pct", "Please enter a valid number for Body Fat.")
+        if not (3 <= body_fat_pct <= 70):
+            return _reject("body_fat_pct", "Please enter a realistic body fat between 3 and 70 %.")
+
+    bmr_equation = bmr_equation or None
+    if bmr_equation is not None:
+        if bmr_equation not in EQUATIONS:
+            return _reject("bmr_equation", f"Unknown BMR equation '{bmr_equation}'. Expected one of: {', '.join(EQUATIONS)}.")
+        if EQUATIONS[bmr_equation].needs_body_fat and body_fat_pct is None:
+            return _reject("body_fat_pct", f"The {EQUATIONS[bmr_equation].label} equation needs the body fat percentage.")
+    return True, {"bmr_equation": bmr_equation, "body_fat_pct": body_fat_pct}, None
+
+def validate_patient_request(payload):
+    # Validates a complete patient record from outside the GUI (API requests, CSV imports).
+    # Descriptions are optional and default to the underlying keys.
+    if not isinstance(payload, dict):
+        return _reject("body", "Patient data must be a JSON object.")
+
+    is_valid, parsed, error_message = validate_numeric_inputs(payload)
+    if not is_valid:
+        return False, None, error_message
+
+    sex = str(payload.get("sex", "")).strip().upper()
+    if sex not in ("M", "F"):
+        return _reject("sex", "Sex must be 'M' or 'F'.")
+
+    try:
+        activity_factor = float(payload.get("activity_factor", 1.2))
+    except (TypeError, ValueError):
+        return _reject("activity_factor", "Please enter a valid number for Activity Factor.")
+    if not (1.0 <= activity_factor <= 2.5):
+        return _reject("activity_factor", "Please enter a realistic activity factor between 1.0 and 2.5.")
+
+    # Several conditions may be given as `medical_conditions`; `medical_condition` then defaults to the
+    # one with the highest precedence
+    medical_conditions = payload.get("medical_conditions")
+    if medical_conditions is not None and (not isinstance(medical_conditions, list) or not medical_conditions):
+        return _reject("medical_conditions", "Medical conditions must be a non-empty list.")
+    for condition in [payload.get("medical_condition") or "general"] + (medical_conditions or []):
+        if not isinstance(condition, str) or condition not in SETTINGS["macro_percentages"]:
+            return _reject("medical_condition", f"Unknown medical condition '{condition}'. Expected one of: {', '.join(SETTINGS['macro_percentages'])}.")
+    medical_condition = payload.get("medical_condition") or (order_conditions(medical_conditions)[0] if medical_conditions else "general")
+    if medical_conditions and medical_condition not in medical_conditions:
+        medical_conditions = [medical_condition] + medical_conditions
+
+    weight_goal = payload.get("weight_goal", "maintenance")
+    if weight_goal not in WEIGHT_GOALS:
+        return _reject("weight_goal", f"Unknown weight goal '{weight_goal}'. Expected one of: {', '.join(WEIGHT_GOALS)}.")
+
+    is_valid, goal_weight_kg, error_message = validate_goal_weight(payload.get("goal_weight_kg"))
+    if not is_valid:
+        return False, None, error_message
+
+    is_valid, energy_inputs, error_message = validate_energy_inputs(payload.get("bmr_equation"), payload.get("body_fat_pct"))
+    if not is_valid:
+        return False, None, error_message
+
+    parsed.update({
+        "patient_id": str(payload.get("patient_id", "") or ""),
+        "sex": sex,
+        "activity_factor": activity_factor,
+        "activity_level_description": payload.get("activity_level_description") or f"Activity factor {activity_factor}",
+        "medical_condition": medical_condition,
+        "medical_condition_description": payload.get("medical_condition_description") or " + ".join(medical_conditions or [medical_condition]),
+        "weight_goal": weight_goal,
+        "weight_goal_description": payload.get("weight_goal_description") or weight_goal,
+        "medical_conditions": medical_conditions,
+        "diabetes_subtype": (payload.get("diabetes_subtype") or "N/A") if "diabetes" in (medical_conditions or [medical_condition]) else "N/A",
+        "goal_weight_kg": goal_weight_kg,
+        **energy_inputs
+    })
+    return True, parsed, None
@@ -0,0 +1,126 @@
+# plan_export.py
+
+import argparse
+import sys
+import time
+
+from plan_store import PLAN_COLUMNS, PlanStore, flatten_plan
+
+# Excel sheets hold at most 1,048,576 rows; larger exports continue on a new sheet
+EXCEL_MAX_ROWS = 1048575
+
+# Column types for the Parquet schema (everything not listed is stored as a string)
+NUMERIC_COLUMNS = {
+    "age": "int64",
+    "weight_kg": "float64", "height_cm": "float64", "activity_factor": "float64",
+    "body_fat_pct": "float64", "goal_weight_kg": "float64",
+    "bmi": "float64", "bmr": "float64", "tdee": "float64", "adjusted_tdee": "float64",
+    "protein_g": "float64", "carb_g": "float64", "fat_g": "float64",
+    "protein_pct": "float64", "carb_pct": "float64", "fat_pct": "float64"
+}
+
+def plan_rows(plans):
+    # Flattens (patient_data, calculated_results) pairs into PLAN_COLUMNS rows, lazily
+    for patient_data, calculated_results in plans:
+        yield flatten_plan(patient_data.get("patient_id", ""), patient_data, calculated_results)
+
+def _peak_rss_mb():
+    # Peak resident memory of this process so far (ru_maxrss is KB on Linux, bytes on macOS),
+    # or None where the Unix-only 'resource' module is missing (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _export_stats(row_count, start_time):
+    seconds = time.perf_counter() - start_time
+    return {
+        "rows": row_count,
+        "seconds": seconds,
+        "rows_per_second": row_count / seconds if seconds else 0.0,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+def export_parquet(rows, file_path, chunk_size=50000):
+    # Streams PLAN_COLUMNS rows to a Parquet file one row group per chunk, so memory stays bounded
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the 'pyarrow' package (pip install pyarrow).")
+
+    schema = pa.schema([(column, NUMERIC_COLUMNS.get(column, "string")) for column in PLAN_COLUMNS])
+    start_time = time.perf_counter()
+    row_count = 0
+    with pq.ParquetWriter(file_path, schema, compression="snappy") as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                writer.write_batch(_record_batch(pa, schema, chunk))
+                row_count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_batch(_record_batch(pa, schema, chunk))
+            row_count += len(chunk)
+    return _export_stats(row_count, start_time)
+
+def _record_batch(pa, schema, chunk):
+    # Transposes a chunk of row tuples into typed Arrow columns
+    columns = list(zip(*chunk))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+def export_excel(rows, file_path):
+    # Streams PLAN_COLUMNS rows to an .xlsx workbook in openpyxl's write-only mode,
+    # which writes each row out as it is appended instead of building the sheet in memory
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Excel export needs the 'openpyxl' package (pip install openpyxl).")
+
+    start_time = time.perf_counter()
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    row_count = 0
+    for row in rows:
+        if sheet_rows >= EXCEL_MAX_ROWS:
+            sheet = workbook.create_sheet("Plans" if sheet is None else f"Plans {len(workbook.worksheets) + 1}")
+            sheet.append(PLAN_COLUMNS)
+            sheet_rows = 0
+        sheet.append(row)
+        sheet_rows += 1
+        row_count += 1
+
+    if sheet is None:
+        workbook.create_sheet("Plans").append(PLAN_COLUMNS)
+    workbook.save(file_path)
+    return _export_stats(row_count, start_time)
+
+def export_plans(rows, file_path):
+    # Exports to Parquet or Excel depending on the file extension
+    if file_path.lower().endswith(".parquet"):
+        return export_parquet(rows, file_path)
+    if file_path.lower().endswith(".xlsx"):
+        return export_excel(rows, file_path)
+    raise ValueError("Export file must end in .parquet or .xlsx.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stored plans to Parquet or Excel.")
+    parser.add_argument("file_path", help="Output file ending in .parquet or .xlsx")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    stats = export_plans(store.iter_plan_rows(), args.file_path)
+    store.close()
+    peak_rss = f"{stats['peak_rss_mb']:.0f} MB" if stats["peak_rss_mb"] is not None else "unavailable"
+    print(
+        f"Exported {stats['rows']} plans to {args.file_path} in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:.0f} plans/s, peak RSS {peak_rss})."
+    )
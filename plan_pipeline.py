@@ -0,0 +1,86 @@
+# plan_pipeline.py
+
+from metrics import CACHE_REQUESTS # Reused stages count as cache hits, re-run stages as misses
+from calculations import (
+    calculate_bmi,
+    classify_bmi,
+    calculate_tdee,
+    calculate_adjusted_tdee,
+    get_macro_recommendations
+)
+from condition_rules import compose_profile, patient_conditions # Combined rules of the patient's conditions
+from energy_equations import calculate_patient_bmr # BMR with the equation selected for the patient
+
+class IncrementalPlanner:
+    # Recomputes a nutrition plan stage by stage, re-running only the stages whose inputs changed.
+    # Each stage lists the inputs it depends on; outputs of earlier stages count as inputs of later ones.
+    STAGES = (
+        ("body", ("age", "sex", "weight_kg", "height_cm", "medical_condition", "bmr_equation", "body_fat_pct")),
+        ("energy", ("bmr", "activity_factor")),
+        ("target", ("tdee", "weight_goal", "sex")),
+        ("macros", ("adjusted_tdee", "medical_condition", "medical_conditions", "weight_kg")),
+        ("micronutrients", ("medical_condition", "medical_conditions"))
+    )
+    # Patient inputs that may be left out (None when absent); never read from earlier stages' outputs
+    OPTIONAL_INPUTS = ("bmr_equation", "body_fat_pct", "medical_conditions")
+
+    def __init__(self):
+        self.stage_inputs = {} # Inputs each stage was last run with
+        self.values = {} # Latest output of every stage, keyed by output name
+
+    def _run_stage(self, stage, inputs):
+        if stage == "body":
+            bmi = calculate_bmi(inputs["weight_kg"], inputs["height_cm"])
+            bmr, bmr_equation = calculate_patient_bmr(inputs)
+            return {
+                "bmi": bmi,
+                "bmi_classification": classify_bmi(bmi),
+                "bmr": bmr,
+                "bmr_equation": bmr_equation
+            }
+        if stage == "energy":
+            return {"tdee": calculate_tdee(inputs["bmr"], inputs["activity_factor"])}
+        if stage == "target":
+            adjusted_tdee, at_minimum = calculate_adjusted_tdee(inputs["tdee"], inputs["weight_goal"], inputs["sex"])
+            return {"adjusted_tdee": adjusted_tdee, "at_minimum": at_minimum}
+        profile = compose_profile(patient_conditions(inputs))
+        if stage == "macros":
+            return {"macros": get_macro_recommendations(
+                inputs["adjusted_tdee"], profile.macro_percentages, inputs["weight_kg"], profile.protein_g_per_kg
+            )}
+        return {"micronutrient_guidelines": profile.micronutrient_guidelines}
+
+    def update(self, patient_data):
+        # Brings the plan up to date with `patient_data` and returns (calculated_results, changed_stages).
+        # A goal change, for example, only re-runs the "target" and "macros" stages.
+        changed_stages = []
+        for stage, input_names in self.STAGES:
+            inputs = {
+                name: patient_data.get(name) if name in self.OPTIONAL_INPUTS
+                else patient_data[name] if name in patient_data else self.values[name]
+                for name in input_names
+            }
+            if self.stage_inputs.get(stage) != inputs:
+                self.values.update(self._run_stage(stage, inputs))
+                self.stage_inputs[stage] = inputs
+                changed_stages.append(stage)
+
+        CACHE_REQUESTS.inc(len(self.STAGES) - len(changed_stages), labels=("plan_stages", "hit"))
+        CACHE_REQUESTS.inc(len(changed_stages), labels=("plan_stages", "miss"))
+
+        calculated_results = {
+            "bmi": self.values["bmi"],
+            "bmi_classification": self.values["bmi_classification"],
+            "bmr": self.values["bmr"],
+            "bmr_equation": self.values["bmr_equation"],
+            "tdee": self.values["tdee"],
+            "adjusted_tdee": self.values["adjusted_tdee"],
+            "at_minimum": self.values["at_minimum"],
+            "macros": self.values["macros"],
+            "micronutrient_guidelines": self.values["micronutrient_guidelines"]
+        }
+        return calculated_results, changed_stages
+
+    def reset(self):
+        self.stage_inputs.clear()
+        self.values.clear()
@@ -0,0 +1,430 @@
+# plan_store.py
+
+import argparse
+import csv
+import json
+import sqlite3
+from datetime import date, datetime
+
+from config_manager import SETTINGS # Supplies the database file name
+from calculations import build_nutrition_plan
+from condition_rules import order_conditions # Picks a CSV patient's primary condition by precedence
+
+# Patient inputs stored alongside every plan, in table column order
+PATIENT_FIELDS = (
+    "age", "sex", "weight_kg", "height_cm",
+    "activity_factor", "activity_level_description",
+    "medical_condition", "medical_condition_description",
+    "weight_goal", "weight_goal_description", "diabetes_subtype",
+    "medical_conditions", "body_fat_pct", "bmr_equation", "goal_weight_kg"
+)
+
+# Calculated values stored for every plan, flattened out of the results dictionary; bmr_equation_used is
+# the results' bmr_equation, the equation the plan was calculated with, while the patient's bmr_equation
+# is their own choice (None for the automatic selection)
+RESULT_FIELDS = (
+    "bmi", "bmi_classification", "bmr", "tdee", "adjusted_tdee",
+    "protein_g", "carb_g", "fat_g", "protein_pct", "carb_pct", "fat_pct",
+    "micronutrient_guidelines", "bmr_equation_used"
+)
+
+PLAN_COLUMNS = ("patient_id", "created_at") + PATIENT_FIELDS + RESULT_FIELDS
+
+# Column definitions shared by the patients (latest profile) and plans (every calculation) tables
+PATIENT_COLUMNS_SQL = """
+    age INTEGER, sex TEXT, weight_kg REAL, height_cm REAL,
+    activity_factor REAL, activity_level_description TEXT,
+    medical_condition TEXT, medical_condition_description TEXT,
+    weight_goal TEXT, weight_goal_description TEXT, diabetes_subtype TEXT,
+    medical_conditions TEXT, body_fat_pct REAL, bmr_equation TEXT, goal_weight_kg REAL"""
+
+# Columns added after the first release, with their types: databases created before them get them
+# added (empty for the plans already stored) when they are opened
+ADDED_COLUMNS = {
+    "patients": (("medical_conditions", "TEXT"), ("body_fat_pct", "REAL"), ("bmr_equation", "TEXT"), ("goal_weight_kg", "REAL")),
+    "plans": (
+        ("medical_conditions", "TEXT"), ("body_fat_pct", "REAL"), ("bmr_equation", "TEXT"), ("goal_weight_kg", "REAL"),
+        ("bmr_equation_used", "TEXT")
+    )
+}
+
+# Several conditions are stored in one column separated by semicolons, as in the import CSV
+CONDITION_SEPARATOR = ";"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY,{PATIENT_COLUMNS_SQL},
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL REFERENCES patients(patient_id),
+    created_at TEXT NOT NULL,{PATIENT_COLUMNS_SQL},
+    bmi REAL, bmi_classification TEXT, bmr REAL, tdee REAL, adjusted_tdee REAL,
+    protein_g REAL, carb_g REAL, fat_g REAL, protein_pct REAL, carb_pct REAL, fat_pct REAL,
+    micronutrient_guidelines TEXT, bmr_equation_used TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_plans_patient_date ON plans (patient_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_plans_date ON plans (created_at);
+"""
+
+# Plan values tracked over time, and the periods they are rolled up by ("all" is the whole history)
+PROGRESS_METRICS = ("weight_kg", "bmi", "tdee", "adjusted_tdee")
+ROLLUP_PERIODS = {
+    "week": lambda day: "{0}-W{1:02d}".format(*day.isocalendar()),
+    "month": lambda day: day.strftime("%Y-%m"),
+    "all": lambda day: "all"
+}
+COHORT_ID = "*" # Rollup rows of the whole clinic are stored under this patient id
+
+# Time axis of the trend slopes, in days since this date
+TREND_ORIGIN = date(2000, 1, 1).toordinal()
+
+# Each rollup keeps the sums a mean and a least-squares trend need (count, sum of t and t², and per
+# metric the sum of y and t·y), so adding a plan is an O(1) update and a 5-year history reads back
+# as ~260 weekly rows instead of every plan
+ROLLUP_SUMS = ("plans", "sum_t", "sum_tt") + tuple(f"{metric}_{suffix}" for metric in PROGRESS_METRICS for suffix in ("sum", "sum_t"))
+
+ROLLUP_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS plan_rollups (
+    patient_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_key TEXT NOT NULL,
+    {', '.join(f"{column} REAL NOT NULL DEFAULT 0" for column in ROLLUP_SUMS)},
+    PRIMARY KEY (patient_id, period, period_key)
+);
+"""
+
+UPSERT_ROLLUP_SQL = f"""
+INSERT INTO plan_rollups (patient_id, period, period_key, {', '.join(ROLLUP_SUMS)})
+VALUES (?, ?, ?, {', '.join('?' * len(ROLLUP_SUMS))})
+ON CONFLICT(patient_id, period, period_key) DO UPDATE SET
+    {', '.join(f"{column} = {column} + excluded.{column}" for column in ROLLUP_SUMS)}
+"""
+
+ROLLUPS_SQL = f"""
+SELECT period_key, {', '.join(ROLLUP_SUMS)} FROM plan_rollups
+WHERE patient_id = ? AND period = ? AND period_key >= ? AND (? IS NULL OR period_key <= ?)
+ORDER BY period_key
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses the prepared versions
+INSERT_PLAN_SQL = f"INSERT INTO plans ({', '.join(PLAN_COLUMNS)}) VALUES ({', '.join('?' * len(PLAN_COLUMNS))})"
+
+UPSERT_PATIENT_SQL = f"""
+INSERT INTO patients (patient_id, {', '.join(PATIENT_FIELDS)}, created_at, updated_at)
+VALUES (?, {', '.join('?' * len(PATIENT_FIELDS))}, ?, ?)
+ON CONFLICT(patient_id) DO UPDATE SET
+    {', '.join(f"{field} = excluded.{field}" for field in PATIENT_FIELDS)},
+    updated_at = excluded.updated_at
+WHERE excluded.updated_at >= patients.updated_at
+"""
+
+HISTORY_SQL = f"""
+SELECT id, {', '.join(PLAN_COLUMNS)} FROM plans
+WHERE patient_id = ? AND created_at >= ? AND (? IS NULL OR created_at < date(?, '+1 day'))
+ORDER BY created_at
+"""
+
+def _stored_patient_value(patient_data, field):
+    value = patient_data.get(field)
+    if field == "medical_conditions" and value:
+        return CONDITION_SEPARATOR.join(value)
+    return value
+
+def _patient_from_stored(row):
+    # A stored patients or plans row as a dictionary, with medical_conditions back as a list (or None)
+    patient = dict(row)
+    conditions = patient.get("medical_conditions")
+    patient["medical_conditions"] = conditions.split(CONDITION_SEPARATOR) if conditions else None
+    return patient
+
+def flatten_plan(patient_id, patient_data, calculated_results, created_at=None):
+    # Turns a (patient_data, calculated_results) pair into a flat row in PLAN_COLUMNS order
+    if created_at is None:
+        created_at = datetime.now().isoformat(timespec="seconds")
+    macros = calculated_results["macros"]
+    return (
+        str(patient_id),
+        created_at,
+        *(_stored_patient_value(patient_data, field) for field in PATIENT_FIELDS),
+        calculated_results["bmi"],
+        calculated_results["bmi_classification"],
+        calculated_results["bmr"],
+        calculated_results["tdee"],
+        calculated_results["adjusted_tdee"],
+        macros["protein_g"],
+        macros["carb_g"],
+        macros["fat_g"],
+        macros["protein_pct"],
+        macros["carb_pct"],
+        macros["fat_pct"],
+        json.dumps(calculated_results["micronutrient_guidelines"]),
+        calculated_results.get("bmr_equation")
+    )
+
+def plan_from_row(row):
+    # Rebuilds the (patient_data, calculated_results) pair used by the UIs from a stored plan row
+    patient_data = {field: row[field] for field in PATIENT_FIELDS}
+    conditions = patient_data["medical_conditions"]
+    if isinstance(conditions, str):
+        patient_data["medical_conditions"] = conditions.split(CONDITION_SEPARATOR) if conditions else None
+    calculated_results = {
+        "bmi": row["bmi"],
+        "bmi_classification": row["bmi_classification"],
+        "bmr": row["bmr"],
+        "tdee": row["tdee"],
+        "adjusted_tdee": row["adjusted_tdee"],
+        "macros": {key: row[key] for key in ("protein_g", "carb_g", "fat_g", "protein_pct", "carb_pct", "fat_pct")},
+        "micronutrient_guidelines": json.loads(row["micronutrient_guidelines"] or "{}"),
+        "bmr_equation": row["bmr_equation_used"]
+    }
+    return patient_data, calculated_results
+
+def rollup_sums(rows):
+    # Adds plan rows (in PLAN_COLUMNS order) into {(patient_id, period, period_key): [ROLLUP_SUMS]},
+    # for each patient and for the cohort; plans missing one of the metrics are not tracked
+    metric_positions = [PLAN_COLUMNS.index(metric) for metric in PROGRESS_METRICS]
+    sums = {}
+    for row in rows:
+        metrics = [row[position] for position in metric_positions]
+        if None in metrics:
+            continue
+        day = date.fromisoformat(row[1][:10])
+        t = day.toordinal() - TREND_ORIGIN
+        values = [1, t, t * t]
+        for y in metrics:
+            values += (y, t * y)
+        for patient_id in (row[0], COHORT_ID):
+            for period, period_key in ROLLUP_PERIODS.items():
+                totals = sums.setdefault((patient_id, period, period_key(day)), [0.0] * len(ROLLUP_SUMS))
+                for i, value in enumerate(values):
+                    totals[i] += value
+    return sums
+
+def summarise_rollup(row):
+    # Mean of each metric over the period and its least-squares trend per week (None with fewer
+    # than two distinct plan dates). Returns {"period_key", "plans", "<metric>", "<metric>_per_week"}.
+    n, sum_t, sum_tt = row["plans"], row["sum_t"], row["sum_tt"]
+    spread = n * sum_tt - sum_t * sum_t
+    summary = {"period_key": row["period_key"], "plans": int(n)}
+    for metric in PROGRESS_METRICS:
+        sum_y, sum_ty = row[f"{metric}_sum"], row[f"{metric}_sum_t"]
+        summary[metric] = sum_y / n if n else None
+        summary[f"{metric}_per_week"] = 7 * (n * sum_ty - sum_t * sum_y) / spread if spread > 1e-6 * n * n else None
+    return summary
+
+class PlanStore:
+    def __init__(self, db_path=None):
+        # Opens (creating if needed) the local SQLite database of patients and their calculated plans
+        self.db_path = db_path or SETTINGS.get("database", {}).get("file_name", "nutrition.db")
+        self.connection = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        # WAL lets readers (history lookups) run while a batch insert is writing
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self._add_missing_columns()
+
+        # Databases created before the rollups existed get them built once from the stored plans
+        has_rollups = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'plan_rollups'"
+        ).fetchone()
+        self.connection.executescript(ROLLUP_SCHEMA)
+        if not has_rollups:
+            self.rebuild_rollups()
+
+    def _add_missing_columns(self):
+        with self.connection:
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row["name"] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+                for column, column_type in columns:
+                    if column not in existing:
+                        self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def add_plan(self, patient_id, patient_data, calculated_results, created_at=None):
+        # Stores a single plan and refreshes the patient's profile; returns the new plan id
+        row = flatten_plan(patient_id, patient_data, calculated_results, created_at)
+        with self.connection:
+            self._upsert_patients([row])
+            cursor = self.connection.execute(INSERT_PLAN_SQL, row)
+            self._add_to_rollups([row])
+        return cursor.lastrowid
+
+    def add_plans(self, records, batch_size=5000):
+        # Stores many plans, committing one transaction per batch. Each record is
+        # (patient_id, patient_data, calculated_results) with an optional created_at.
+        total = 0
+        batch = []
+        for record in records:
+            batch.append(flatten_plan(*record))
+            if len(batch) >= batch_size:
+                total += self._insert_batch(batch)
+                batch = []
+        if batch:
+            total += self._insert_batch(batch)
+        return total
+
+    def _insert_batch(self, rows):
+        with self.connection:
+            self._upsert_patients(rows)
+            self.connection.executemany(INSERT_PLAN_SQL, rows)
+            self._add_to_rollups(rows)
+        return len(rows)
+
+    def _add_to_rollups(self, rows):
+        # Folds new plans into their week, month and whole-history rollups, per patient and for the cohort
+        self.connection.executemany(
+            UPSERT_ROLLUP_SQL, [key + tuple(values) for key, values in rollup_sums(rows).items()]
+        )
+
+    def rebuild_rollups(self, batch_size=10000):
+        # Recomputes every rollup from the stored plans
+        with self.connection:
+            self.connection.execute("DELETE FROM plan_rollups")
+            batch = []
+            for row in self.iter_plan_rows(batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._add_to_rollups(batch)
+                    batch = []
+            self._add_to_rollups(batch)
+
+    def _upsert_patients(self, rows):
+        # Keeps the patients table in step with each patient's most recent plan inputs
+        latest = {}
+        for row in rows:
+            patient_id, created_at = row[0], row[1]
+            if patient_id not in latest or created_at >= latest[patient_id][1]:
+                latest[patient_id] = row
+        self.connection.executemany(
+            UPSERT_PATIENT_SQL,
+            [
+                (row[0], *row[2:2 + len(PATIENT_FIELDS)], row[1], row[1])
+                for row in latest.values()
+            ]
+        )
+
+    def get_patient(self, patient_id):
+        # Returns the latest stored profile for a patient, or None if they have no plans
+        row = self.connection.execute(
+            "SELECT * FROM patients WHERE patient_id = ?", (str(patient_id),)
+        ).fetchone()
+        return _patient_from_stored(row) if row else None
+
+    def get_patients(self):
+        # Returns the latest stored profile of every patient, most recently updated first
+        rows = self.connection.execute("SELECT * FROM patients ORDER BY updated_at DESC")
+        return [_patient_from_stored(row) for row in rows]
+
+    def list_patients(self):
+        # Returns all patient ids, most recently updated first
+        rows = self.connection.execute("SELECT patient_id FROM patients ORDER BY updated_at DESC")
+        return [row[0] for row in rows]
+
+    def get_patient_history(self, patient_id, since=None, until=None):
+        # Returns a patient's plans in date order, served from the (patient_id, created_at) index.
+        # `since` and `until` are inclusive "YYYY-MM-DD" dates: until="2026-03-04" includes that whole day.
+        rows = self.connection.execute(
+            HISTORY_SQL, (str(patient_id), since or "", until, until)
+        ).fetchall()
+        return [_patient_from_stored(row) for row in rows]
+
+    def get_progress(self, patient_id=COHORT_ID, period="week", since=None, until=None):
+        # Mean weight, BMI, TDEE and target calories per week or month (or "all") with their weekly
+        # trends, read from the rollups; the default patient id gives the whole clinic cohort
+        rows = self.connection.execute(
+            ROLLUPS_SQL, (str(patient_id), period, since or "", until, until)
+        ).fetchall()
+        return [summarise_rollup(row) for row in rows]
+
+    def iter_plan_rows(self, batch_size=10000):
+        # Streams every stored plan as tuples in PLAN_COLUMNS order, fetching `batch_size` rows at a time
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"SELECT {', '.join(PLAN_COLUMNS)} FROM plans ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def close(self):
+        self.connection.close()
+
+def _patient_from_csv_row(row):
+    # Converts a CSV row of raw inputs into the patient_data dictionary the calculations expect
+    patient_data = {
+        "age": int(row["age"]),
+        "sex": row["sex"].strip().upper(),
+        "weight_kg": float(row["weight_kg"]),
+        "height_cm": float(row["height_cm"]),
+        "activity_factor": float(row.get("activity_factor") or 1.2),
+        "medical_condition": (row.get("medical_condition") or "").strip(),
+        "weight_goal": (row.get("weight_goal") or "maintenance").strip(),
+        "diabetes_subtype": row.get("diabetes_subtype") or "N/A",
+        "body_fat_pct": float(row["body_fat_pct"]) if row.get("body_fat_pct") else None,
+        "bmr_equation": (row.get("bmr_equation") or "").strip() or None,
+        "goal_weight_kg": float(row["goal_weight_kg"]) if row.get("goal_weight_kg") else None,
+        # Several conditions are separated by semicolons, e.g. "diabetes;renal_disease"
+        "medical_conditions": [condition.strip() for condition in (row.get("medical_conditions") or "").split(CONDITION_SEPARATOR) if condition.strip()] or None
+    }
+    # Without an explicit primary condition, the one of the listed conditions with the highest precedence
+    if not patient_data["medical_condition"]:
+        patient_data["medical_condition"] = order_conditions(patient_data["medical_conditions"] or ("general",))[0]
+    patient_data["activity_level_description"] = row.get("activity_level_description") or str(patient_data["activity_factor"])
+    patient_data["medical_condition_description"] = row.get("medical_condition_description") or patient_data["medical_condition"]
+    patient_data["weight_goal_description"] = row.get("weight_goal_description") or patient_data["weight_goal"]
+    return patient_data
+
+def import_patients_csv(store, csv_path, batch_size=5000):
+    # Calculates a plan for every row of a patients CSV and stores them in batches
+    with open(csv_path, newline="") as f:
+        records = (
+            (row["patient_id"], patient_data, build_nutrition_plan(patient_data), row.get("created_at") or None)
+            for row in csv.DictReader(f)
+            for patient_data in (_patient_from_csv_row(row),)
+        )
+        return store.add_plans(records, batch_size=batch_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local patient/plan database.")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Calculate and store plans for every row of a CSV")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+
+    history_parser = subparsers.add_parser("history", help="Print a patient's stored plans")
+    history_parser.add_argument("patient_id")
+
+    progress_parser = subparsers.add_parser("progress", help="Print weekly or monthly progress of a patient or the cohort")
+    progress_parser.add_argument("patient_id", nargs="?", default=COHORT_ID)
+    progress_parser.add_argument("--period", choices=ROLLUP_PERIODS, default="month")
+    subparsers.add_parser("rebuild-rollups", help="Recompute the progress rollups from the stored plans")
+
+    args = parser.parse_args()
+    store = PlanStore(args.db)
+    if args.command == "import":
+        count = import_patients_csv(store, args.csv_path, args.batch_size)
+        print(f"Stored {count} plans in {store.db_path}.")
+    elif args.command == "progress":
+        for summary in store.get_progress(args.patient_id, args.period):
+            trend = summary["weight_kg_per_week"]
+            print(f"{summary['period_key']}  {summary['plans']:6d} plans  weight {summary['weight_kg']:.1f} kg"
+                  f"{'' if trend is None else f' ({trend:+.2f} kg/week)'}  BMI {summary['bmi']:.1f}  "
+                  f"target {summary['adjusted_tdee']:.0f} kcal/day")
+    elif args.command == "rebuild-rollups":
+        store.rebuild_rollups()
+        print(f"Rebuilt the progress rollups in {store.db_path}.")
+    else:
+        for plan in store.get_patient_history(args.patient_id):
+            print(f"{plan['created_at']}  weight {plan['weight_kg']:.1f} kg  BMI {plan['bmi']:.1f}  "
+                  f"TDEE {plan['tdee']:.0f}  target {plan['adjusted_tdee']:.0f} kcal/day")
+    store.close()
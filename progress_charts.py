@@ -0,0 +1,67 @@
+# progress_charts.py
+
+import streamlit as st
+
+from plan_store import COHORT_ID, PROGRESS_METRICS
+
+METRIC_LABELS = {
+    "weight_kg": "Weight (kg)",
+    "bmi": "BMI",
+    "tdee": "TDEE (kcal)",
+    "adjusted_tdee": "Target (kcal)"
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_plan_store():
+    """Opens the plan database once per server process."""
+    from plan_store import PlanStore
+    return PlanStore()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_progress(patient_id, period):
+    """Period means and trends from the precomputed rollups, cached for a minute per (patient, period)."""
+    return get_plan_store().get_progress(patient_id, period)
+
+
+def show_progress():
+    st.header("Progress")
+    st.write("Weekly or monthly means of the stored plans, for one patient or the whole clinic.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        patient_id = st.text_input("Patient ID (leave empty for the whole clinic)", key="progress_patient").strip() or COHORT_ID
+    with col2:
+        period = st.radio("Period", ["week", "month"], format_func=lambda period: f"{period.capitalize()}ly", horizontal=True, key="progress_period")
+    metrics = st.multiselect(
+        "Show", PROGRESS_METRICS, default=["weight_kg", "bmi"], format_func=METRIC_LABELS.get, key="progress_metrics"
+    )
+
+    summaries = get_progress(patient_id, period)
+    if not summaries:
+        st.info("No stored plans were found." if patient_id == COHORT_ID else f"No stored plans were found for patient '{patient_id}'.")
+        return
+
+    overall = get_progress(patient_id, "all")[0]
+    cols = st.columns(len(PROGRESS_METRICS))
+    for col, metric in zip(cols, PROGRESS_METRICS):
+        trend = overall[f"{metric}_per_week"]
+        col.metric(METRIC_LABELS[metric], f"{overall[metric]:.1f}", None if trend is None else f"{trend:+.2f}/week", delta_color="off")
+    st.caption(f"{overall['plans']} plans; means over the whole history, with the least-squares trend.")
+
+    # Weight and BMI are on a different scale from the calorie figures, so each metric gets its own chart
+    for metric in metrics:
+        st.subheader(METRIC_LABELS[metric])
+        st.line_chart({"period": [row["period_key"] for row in summaries], METRIC_LABELS[metric]: [row[metric] for row in summaries]}, x="period")
+
+    with st.expander(f"{period.capitalize()}ly table"):
+        st.dataframe(
+            [
+                {"period": row["period_key"], "plans": row["plans"],
+                 **{METRIC_LABELS[metric]: round(row[metric], 1) for metric in PROGRESS_METRICS},
+                 **{f"{METRIC_LABELS[metric]} / week": None if row[f"{metric}_per_week"] is None else round(row[f"{metric}_per_week"], 2) for metric in PROGRESS_METRICS}}
+                for row in summaries
+            ],
+            hide_index=True
+        )
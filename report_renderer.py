@@ -0,0 +1,422 @@
+# report_renderer.py
+
+import html
+import io
+import json
+import os
+import string
+import textwrap
+
+from config_manager import SETTINGS # Used for referencing specific settings like calorie adjustment values
+from energy_equations import EQUATIONS # Names the BMR equation a plan used
+from condition_rules import order_conditions, patient_conditions # A plan's conditions, most important first
+from weight_projection import project_plan # Week-by-week weight for the projection section (plain Python)
+from metrics import RENDER_SECONDS, REPORTS_SAVED
+
+# Report templates, compiled once into bound format methods and reused for every render
+PATIENT_TEMPLATE = (
+    "--- Patient Information ---\n"
+    "Age: {age} years\n"
+    "Sex: {sex}\n"
+    "Weight: {weight_kg:.1f} kg\n"
+    "Height: {height_cm:.1f} cm\n"
+    "Activity Level: {activity_level_description}\n"
+    "Medical Condition: {medical_condition_description}\n"
+    "{diabetes_line}"
+    "Weight Goal: {weight_goal_description}\n"
+    "\n"
+).format
+DIABETES_LINE_TEMPLATE = "  Diabetes Subtype: {}\n".format
+
+METRICS_TEMPLATE = (
+    "--- Health Metrics ---\n"
+    "BMI: {bmi:.2f} kg/m²\n"
+    "BMI Classification: {bmi_classification}\n"
+    "\n"
+).format
+
+CALORIES_TEMPLATE = (
+    "--- Calorie & Macronutrient Recommendations ---\n"
+    "Basal Metabolic Rate (BMR): {bmr:.0f} kcal/day{bmr_equation_note}\n"
+    "Total Daily Energy Expenditure (TDEE): {tdee:.0f} kcal/day\n"
+    "{target_line}\n"
+    "Macronutrient Breakdown:\n"
+    "  Protein: {protein_g:.0f}g ({protein_pct:.0%}, {protein_g_per_kg:.2f} g/kg)\n"
+    "  Carbohydrates: {carb_g:.0f}g ({carb_pct:.0%})\n"
+    "  Fats: {fat_g:.0f}g ({fat_pct:.0%})\n"
+    "\n"
+).format
+TARGET_LOSS_TEMPLATE = "Target Calories (for Weight Loss): {:.0f} kcal/day (adjusting by -{} kcal)".format
+TARGET_GAIN_TEMPLATE = "Target Calories (for Weight Gain): {:.0f} kcal/day (adjusting by +{} kcal)".format
+TARGET_MAINTAIN_TEMPLATE = "Target Calories (for Weight Maintenance): {:.0f} kcal/day".format
+
+PROJECTION_TEMPLATE = (
+    "--- Weight Projection ---\n"
+    "Projected Weight after {weeks} Weeks: {final_weight_kg:.1f} kg (BMI {final_bmi:.1f})\n"
+    "First-Week Change: {first_week_change_kg:+.2f} kg\n"
+    "Weight Settles Near: {equilibrium_kg:.1f} kg on {target_kcal:.0f} kcal/day\n"
+    "{goal_line}"
+    "  (Expenditure is recalculated from the BMR as weight changes; {kcal_per_kg} kcal per kg of body weight.)\n"
+    "\n"
+).format
+GOAL_REACHED_TEMPLATE = "Goal Weight: {:.1f} kg, reached in about {} weeks\n".format
+GOAL_NOT_REACHED_TEMPLATE = "Goal Weight: {:.1f} kg, not reached on this intake\n".format
+
+GUIDELINE_TEMPLATE = "  {}: {}\n".format
+WARNING_TEMPLATE = "  - {}\n".format
+
+# Condition-specific advice for the 'Important Dietary Considerations' section
+CONDITION_WARNINGS = {
+    "diabetes": (
+        "For Diabetes, focus on consistent carbohydrate intake and complex carbohydrates.",
+        "  - Monitor blood sugar levels regularly.",
+        "  - Prioritize whole foods, fiber-rich vegetables, and lean proteins.",
+        "  - Distribute carbohydrate intake throughout the day.",
+        "  - Avoid skipping meals, especially if on medication that lowers blood sugar."
+    ),
+    "hypertension": (
+        "For Hypertension, focus on a low-sodium diet (e.g., DASH diet). Consult a healthcare professional.",
+    ),
+    "heart_disease": (
+        "For Heart Disease, limit saturated fats to less than 7% of total calories. Consult a healthcare professional.",
+    )
+}
+
+DISCLAIMER_TEXT = (
+    "\n--- IMPORTANT DISCLAIMER ---\n"
+    "These are *estimates* and *examples* based on general guidelines.\n"
+    "Always consult a qualified healthcare professional (like a Registered Dietitian) for personalized nutrition therapy, especially for specific medical conditions."
+)
+# Report sections in display order
+TEXT_SECTIONS = ("patient", "metrics", "calories", "projection", "micronutrients", "considerations", "disclaimer")
+
+def section_key(section, patient_data, calculated_results):
+    # Returns the values a section's text depends on, used to detect whether it needs re-rendering
+    if section == "patient":
+        return tuple(patient_data.get(field) for field in (
+            "age", "sex", "weight_kg", "height_cm", "activity_level_description",
+            "medical_condition", "medical_condition_description", "diabetes_subtype", "weight_goal_description"
+        )) + (patient_conditions(patient_data),)
+    if section == "metrics":
+        return (calculated_results["bmi"], calculated_results["bmi_classification"])
+    if section == "calories":
+        return (
+            calculated_results["bmr"], calculated_results.get("bmr_equation"), calculated_results["tdee"], calculated_results["adjusted_tdee"],
+            patient_data["weight_goal"], patient_data["weight_kg"], tuple(calculated_results["macros"].values()),
+            tuple(SETTINGS["calorie_adjustments"].values())
+        )
+    if section == "projection":
+        return (
+            *(patient_data.get(field) for field in ("age", "sex", "weight_kg", "height_cm", "activity_factor", "goal_weight_kg", "body_fat_pct")),
+            calculated_results["adjusted_tdee"], calculated_results.get("bmr_equation"), tuple(SETTINGS.get("projection", {}).values())
+        )
+    if section == "micronutrients":
+        return tuple(calculated_results["micronutrient_guidelines"].items())
+    if section == "considerations":
+        return patient_conditions(patient_data)
+    return ()
+
+def render_text_section(section, patient_data, calculated_results):
+    # Renders one section of the report from the precompiled templates
+    if section == "patient":
+        diabetes_line = ""
+        if "diabetes" in patient_conditions(patient_data):
+            diabetes_line = DIABETES_LINE_TEMPLATE(patient_data["diabetes_subtype"])
+        return PATIENT_TEMPLATE(diabetes_line=diabetes_line, **patient_data)
+
+    if section == "metrics":
+        return METRICS_TEMPLATE(**calculated_results)
+
+    if section == "calories":
+        # Clarify calorie adjustments based on the user's weight goal
+        adjusted_tdee = calculated_results["adjusted_tdee"]
+        if patient_data["weight_goal"] == "loss":
+            target_line = TARGET_LOSS_TEMPLATE(adjusted_tdee, SETTINGS["calorie_adjustments"]["weight_loss_deficit_kcal"])
+        elif patient_data["weight_goal"] == "gain":
+            target_line = TARGET_GAIN_TEMPLATE(adjusted_tdee, SETTINGS["calorie_adjustments"]["weight_gain_surplus_kcal"])
+        else:
+            target_line = TARGET_MAINTAIN_TEMPLATE(adjusted_tdee)
+        # Plans stored before the equation was recorded show no equation name
+        bmr_equation = calculated_results.get("bmr_equation")
+        bmr_equation_note = f" ({EQUATIONS[bmr_equation].label})" if bmr_equation in EQUATIONS else ""
+        return CALORIES_TEMPLATE(
+            target_line=target_line, bmr_equation_note=bmr_equation_note,
+            protein_g_per_kg=calculated_results["macros"]["protein_g"] / patient_data["weight_kg"],
+            **calculated_results, **calculated_results["macros"]
+        )
+
+    if section == "projection":
+        # Shown for patients with a goal weight, or for everyone when enabled in settings.json
+        if patient_data.get("goal_weight_kg") is None and not SETTINGS.get("projection", {}).get("in_reports", False):
+            return ""
+        projection = project_plan(patient_data, calculated_results)
+        goal_line = ""
+        if projection["goal_weight_kg"] is not None:
+            if projection["weeks_to_goal"] is None:
+                goal_line = GOAL_NOT_REACHED_TEMPLATE(projection["goal_weight_kg"])
+            else:
+                goal_line = GOAL_REACHED_TEMPLATE(projection["goal_weight_kg"], projection["weeks_to_goal"])
+        return PROJECTION_TEMPLATE(
+            goal_line=goal_line, kcal_per_kg=SETTINGS.get("projection", {}).get("kcal_per_kg", 7700), **projection
+        )
+
+    if section == "micronutrients":
+        guidelines = calculated_results["micronutrient_guidelines"]
+        return (
+            "--- General Micronutrient Guidelines ---\n"
+            + "".join(GUIDELINE_TEMPLATE(nutrient, guideline) for nutrient, guideline in guidelines.items())
+            + "\n"
+        )
+
+    if section == "considerations":
+        # Advice for every condition the patient has, in precedence order
+        warnings_list = [
+            warning for condition in order_conditions(patient_conditions(patient_data))
+            for warning in CONDITION_WARNINGS.get(condition, ())
+        ]
+        if warnings_list:
+            body = "".join(WARNING_TEMPLATE(warning) for warning in warnings_list)
+        else:
+            body = "  No specific warnings based on your inputs or conditions.\n"
+        return "--- Important Dietary Considerations ---\n" + body
+
+    return DISCLAIMER_TEXT
+
+
+def render_text(patient_data, calculated_results):
+    # Renders the full plain-text report (the same text the Tk ResultsPanel shows)
+    return "".join(render_text_section(section, patient_data, calculated_results) for section in TEXT_SECTIONS)
+
+HTML_DOCUMENT = string.Template(
+    "<!DOCTYPE html>\n"
+    "<html lang=\"en\">\n"
+    "<head>\n"
+    "<meta charset=\"utf-8\">\n"
+    "<title>$title</title>\n"
+    "<style>body{font-family:Arial,sans-serif;max-width:800px;margin:2em auto;}"
+    "h2{border-bottom:1px solid #ccc;}ul{list-style:none;padding-left:0;}li.indent{padding-left:2em;}</style>\n"
+    "</head>\n"
+    "<body>\n"
+    "<h1>$title</h1>\n"
+    "$sections"
+    "</body>\n"
+    "</html>\n"
+)
+HTML_SECTION_TEMPLATE = "<section>\n<h2>{}</h2>\n<ul>\n{}</ul>\n</section>\n".format
+HTML_ITEM_TEMPLATE = "<li{}>{}</li>\n".format
+
+def render_html(patient_data, calculated_results):
+    # Renders the report as a standalone HTML page, one <section> per text section
+    sections = []
+    for section in TEXT_SECTIONS:
+        lines = [line for line in render_text_section(section, patient_data, calculated_results).split("\n") if line.strip()]
+        if not lines:
+            continue # Sections with nothing to show, e.g. the projection without a goal weight
+        heading = lines[0].strip("- ").title() if lines else ""
+        items = "".join(
+            HTML_ITEM_TEMPLATE(' class="indent"' if line.startswith("    ") else "", html.escape(line.strip()))
+            for line in lines[1:]
+        )
+        sections.append(HTML_SECTION_TEMPLATE(html.escape(heading), items))
+    return HTML_DOCUMENT.substitute(title="Nutrition Plan", sections="".join(sections))
+
+def render_json(patient_data, calculated_results):
+    # Renders the plan inputs and results as JSON, for other systems to consume
+    return json.dumps({"patient": patient_data, "results": calculated_results}, indent=2, default=str)
+
+# PDF page layout: A4 in points, Courier 10pt (6pt per character)
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 10
+PDF_LEADING = 13
+PDF_CHARS_PER_LINE = (PDF_PAGE_WIDTH - 2 * PDF_MARGIN) // 6
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+
+def _pdf_escape(line):
+    # Escapes PDF string delimiters and maps the text into the font's Latin-1 encoding
+    line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return line.encode("latin-1", errors="replace")
+
+def render_pdf(patient_data, calculated_results):
+    # Writes the text report as a minimal PDF using the built-in Courier font, with no external libraries
+    lines = []
+    for line in render_text(patient_data, calculated_results).split("\n"):
+        lines.extend(textwrap.wrap(line, PDF_CHARS_PER_LINE, subsequent_indent="    ") or [""])
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    # Object layout: 1 catalog, 2 page tree, 3 font, then a (page, content stream) pair per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None, # Page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"
+    ]
+    page_refs = []
+    for page_lines in pages:
+        stream = io.BytesIO()
+        stream.write(b"BT /F1 %d Tf %d TL %d %d Td\n" % (
+            PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, PDF_PAGE_HEIGHT - PDF_MARGIN
+        ))
+        for line in page_lines:
+            stream.write(b"(" + _pdf_escape(line) + b") Tj T*\n")
+        stream.write(b"ET")
+        content = stream.getvalue()
+
+        page_number = len(objects) + 1
+        page_refs.append(b"%d 0 R" % page_number)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, page_number + 1)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(page_refs) + b"] /Count %d >>" % len(page_refs)
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref_offset = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return output.getvalue()
+
+# Renderer and file extension for each supported format
+RENDERERS = {
+    "text": (render_text, "txt"),
+    "html": (render_html, "html"),
+    "json": (render_json, "json"),
+    "pdf": (render_pdf, "pdf")
+}
+
+# File extensions accepted when saving, mapped back to their format
+EXTENSION_FORMATS = {"txt": "text", "html": "html", "htm": "html", "json": "json", "pdf": "pdf"}
+
+def render_report(patient_data, calculated_results, report_format="text"):
+    # Renders one plan in the requested format; returns str for text formats and bytes for PDF
+    if report_format not in RENDERERS:
+        raise ValueError(f"Unknown report format '{report_format}'. Expected one of: {', '.join(RENDERERS)}.")
+    with RENDER_SECONDS.time(labels=(report_format,)):
+        return RENDERERS[report_format][0](patient_data, calculated_results)
+
+def format_for_path(file_path):
+    # Picks the report format from a file name's extension, defaulting to plain text
+    extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+    return EXTENSION_FORMATS.get(extension, "text")
+
+def write_report(file_path, patient_data, calculated_results, report_format=None):
+    # Renders a plan and writes it to `file_path`, choosing the format from the extension if not given
+    report_format = report_format or format_for_path(file_path)
+    content = render_report(patient_data, calculated_results, report_format)
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    with open(file_path, "wb") as f:
+        f.write(content)
+    REPORTS_SAVED.inc(labels=(report_format,))
+
+def _render_batch_item(job):
+    # Worker for batch rendering (also run in child processes): returns (file name, encoded content) pairs
+    index, name, patient_data, calculated_results, formats = job
+    rendered = []
+    for report_format in formats:
+        renderer, extension = RENDERERS[report_format]
+        content = renderer(patient_data, calculated_results)
+        rendered.append((f"{name}.{extension}", content.encode("utf-8") if isinstance(content, str) else content))
+    return rendered
+
+def _render_batch_chunk(chunk):
+    # Worker for pooled batch rendering: renders a list of jobs, so one round trip carries many plans
+    return [_render_batch_item(job) for job in chunk]
+
+def render_reports(plans, destination, formats=("text",), processes=None, chunk_size=256):
+    # Renders many plans and streams them into a directory, or a zip file if `destination` ends in .zip.
+    # `plans` is an iterable of (patient_data, calculated_results) pairs, consumed lazily; with
+    # `processes` set, rendering is spread over a process pool with at most two chunks per process in
+    # flight, so memory stays bounded however many plans there are. Returns the number of files written.
+    for report_format in formats:
+        if report_format not in RENDERERS:
+            raise ValueError(f"Unknown report format '{report_format}'. Expected one of: {', '.join(RENDERERS)}.")
+
+    def jobs():
+        for index, (patient_data, calculated_results) in enumerate(plans):
+            name = f"{patient_data.get('patient_id') or 'plan'}_{index:06d}"
+            yield index, name, patient_data, calculated_results, tuple(formats)
+
+    # Batch-only dependencies are imported here so the GUI does not pay for them at start-up
+    import zipfile
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import islice
+
+    if destination.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(destination, "w", compression=zipfile.ZIP_DEFLATED)
+        def write(name, content):
+            archive.writestr(name, content)
+    else:
+        archive = None
+        os.makedirs(destination, exist_ok=True)
+        def write(name, content):
+            with open(os.path.join(destination, name), "wb") as f:
+                f.write(content)
+
+    def write_all(rendered):
+        nonlocal written
+        for name, content in rendered:
+            write(name, content)
+            written += 1
+
+    written = 0
+    executor = ProcessPoolExecutor(max_workers=processes) if processes else None
+    try:
+        if executor:
+            # Chunking amortises the cost of sending plans between processes. Only a bounded window of
+            # chunks is submitted at a time (Executor.map would submit them all up front), and the oldest
+            # is written before another is read from `plans`, which keeps the output in order
+            pending = deque()
+            job_iter = jobs()
+            while True:
+                while len(pending) < 2 * processes:
+                    chunk = list(islice(job_iter, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_render_batch_chunk, chunk))
+                if not pending:
+                    break
+                for rendered in pending.popleft().result():
+                    write_all(rendered)
+        else:
+            for job in jobs():
+                write_all(_render_batch_item(job))
+    finally:
+        if executor:
+            executor.shutdown()
+        if archive:
+            archive.close()
+    return written
+
+if __name__ == "__main__":
+    import argparse
+    from plan_store import PlanStore, plan_from_row
+
+    parser = argparse.ArgumentParser(description="Render stored plans to text/HTML/JSON/PDF reports.")
+    parser.add_argument("destination", help="Output directory, or a .zip file")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    parser.add_argument("--patient", help="Only render plans for this patient ID")
+    parser.add_argument("--formats", default="text", help="Comma-separated formats: " + ", ".join(RENDERERS))
+    parser.add_argument("--processes", type=int, help="Render with a pool of this many processes")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    patient_ids = [args.patient] if args.patient else store.list_patients()
+    stored_plans = (
+        ({**patient_data, "patient_id": patient_id}, calculated_results)
+        for patient_id in patient_ids
+        for row in store.get_patient_history(patient_id)
+        for patient_data, calculated_results in (plan_from_row(row),)
+    )
+    count = render_reports(stored_plans, args.destination, args.formats.split(","), args.processes)
+    print(f"Wrote {count} reports to {args.destination}.")
+    store.close()
@@ -0,0 +1,108 @@
+# scenario_explorer.py
+
+import altair as alt
+import streamlit as st
+
+from config_manager import SETTINGS
+from scenario_sweep import patient_arrays, scenario_grid, summarise_sweep
+
+ACTIVITY_FACTORS = (1.2, 1.375, 1.55, 1.725, 1.9)
+
+# Summary values the heatmap can colour by
+HEATMAP_VALUES = {
+    "adjusted_tdee_mean": "Target calories (kcal, mean)",
+    "protein_g_mean": "Protein (g, mean)",
+    "carb_g_mean": "Carbohydrate (g, mean)",
+    "fat_g_mean": "Fat (g, mean)",
+    "share_at_minimum": "Share held at minimum calories"
+}
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_stored_patients():
+    """Latest profile of every stored patient, refreshed at most once a minute."""
+    from plan_store import PlanStore
+    store = PlanStore()
+    try:
+        return store.get_patients()
+    finally:
+        store.close()
+
+
+def split_label(split):
+    return "/".join(f"{split[key] * 100:.0f}" for key in ("protein", "carb", "fat"))
+
+
+def show_patient_form():
+    """One patient entered by hand; returns their patient_data."""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        age = st.number_input("Age (years)", min_value=1, max_value=120, value=45, key="sweep_age")
+        sex = st.selectbox("Sex", ["F", "M"], key="sweep_sex")
+    with col2:
+        weight_kg = st.number_input("Weight (kg)", min_value=20.0, max_value=300.0, value=85.0, step=0.5, key="sweep_weight")
+        height_cm = st.number_input("Height (cm)", min_value=50.0, max_value=250.0, value=168.0, step=0.5, key="sweep_height")
+    with col3:
+        medical_condition = st.selectbox("Condition", list(SETTINGS["macro_percentages"]), key="sweep_condition")
+        weight_goal = st.selectbox("Weight goal", ["loss", "maintenance", "gain"], key="sweep_goal")
+    return {
+        "age": age, "sex": sex, "weight_kg": weight_kg, "height_cm": height_cm, "activity_factor": 1.2,
+        "medical_condition": medical_condition, "weight_goal": weight_goal
+    }
+
+
+def show_scenario_sweep():
+    st.header("Scenario Sweep")
+    st.write("See how deficits, activity levels and macro splits change the targets, without editing settings.json.")
+
+    source = st.radio("Patients", ["One patient", "All stored patients"], horizontal=True, key="sweep_source")
+    if source == "One patient":
+        patients = [show_patient_form()]
+    else:
+        patients = [patient for patient in get_stored_patients() if None not in (patient["age"], patient["weight_kg"], patient["height_cm"])]
+        if not patients:
+            st.info("No stored patients were found.")
+            return
+        st.caption(f"{len(patients)} stored patients, each with their own condition and weight goal.")
+
+    low, high = st.slider("Weight-loss deficit (kcal/day)", 0, 1500, (250, 1000), step=50, key="sweep_deficits")
+    step = st.select_slider("Deficit step (kcal)", [50, 100, 125, 250], value=250, key="sweep_step")
+    activity_factors = st.multiselect("Activity factors", ACTIVITY_FACTORS, default=list(ACTIVITY_FACTORS), key="sweep_activity")
+    splits = {split_label(split): split for split in SETTINGS["macro_percentages"].values()}
+    chosen_splits = st.multiselect("Macro splits (protein/carb/fat %)", list(splits), default=list(splits)[:1], key="sweep_splits")
+
+    grid = {"weight_loss_deficit_kcal": list(range(low, high + 1, step))}
+    if activity_factors:
+        grid["activity_factor"] = sorted(activity_factors)
+    if chosen_splits:
+        grid["macro_split"] = [splits[label] for label in chosen_splits]
+    try:
+        scenarios = scenario_grid(grid)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    rows = summarise_sweep(patient_arrays(patients), scenarios)
+    for row in rows:
+        if "macro_split" in row:
+            row["macro_split"] = split_label(row["macro_split"])
+
+    # Heatmap of deficit against activity factor for one macro split (the split only changes the grams)
+    st.subheader("Heatmap")
+    value = st.selectbox("Colour by", list(HEATMAP_VALUES), format_func=HEATMAP_VALUES.get, key="sweep_value")
+    shown = rows
+    if chosen_splits and len(chosen_splits) > 1:
+        split = st.selectbox("Macro split", chosen_splits, key="sweep_heatmap_split")
+        shown = [row for row in rows if row["macro_split"] == split]
+    encoding = {
+        "x": alt.X("weight_loss_deficit_kcal:O", title="Deficit (kcal/day)"),
+        "color": alt.Color(f"{value}:Q", title=HEATMAP_VALUES[value]),
+        # Plain rows carry no column types, so each tooltip field states its own
+        "tooltip": [alt.Tooltip(f"{key}:{'N' if isinstance(field, str) else 'Q'}") for key, field in shown[0].items()]
+    }
+    if activity_factors:
+        encoding["y"] = alt.Y("activity_factor:O", title="Activity factor")
+    chart = alt.Chart(alt.Data(values=shown)).mark_rect().encode(**encoding)
+    st.altair_chart(chart)
+
+    with st.expander(f"All {len(rows)} scenarios"):
+        st.dataframe(rows, hide_index=True)
@@ -0,0 +1,180 @@
+# scenario_sweep.py
+
+from collections import namedtuple
+
+import numpy as np
+
+from config_manager import SETTINGS # Supplies the default adjustments, minimum calories and macro splits
+from energy_equations import bmr_array, equation_codes # Batch BMR with each patient's own equation
+from condition_rules import profile_for # Combined macro rules of each patient's conditions (cached per condition set)
+
+# Parameters a sweep can vary; any left out keep the settings (or the patient's own) value
+SWEEP_PARAMETERS = ("weight_loss_deficit_kcal", "weight_gain_surplus_kcal", "activity_factor", "macro_split")
+PARAMETER_RANGES = {
+    "weight_loss_deficit_kcal": (0, 1500),
+    "weight_gain_surplus_kcal": (0, 1500),
+    "activity_factor": (1.0, 2.5)
+}
+MACRO_KEYS = ("protein", "carb", "fat")
+CALORIES_PER_GRAM = np.array([4, 4, 9], dtype=np.float32)
+
+GOAL_CODES = {"maintenance": 0, "loss": 1, "gain": 2}
+
+# Patients as parallel arrays (one entry per patient); macro_pct has shape (patients, 3), equation holds
+# each patient's EQUATION_CODES, and body_fat_pct, protein_g_per_kg and macro_pct's protein share are NaN where not set
+PatientArrays = namedtuple("PatientArrays", (
+    "age", "male", "weight_kg", "height_cm", "activity_factor", "goal", "macro_pct", "equation", "body_fat_pct",
+    "protein_g_per_kg"
+))
+
+# The scenario grid as parallel arrays (one entry per scenario); NaN means "not varied".
+# `parameters` lists each scenario's values as given, for reporting.
+Scenarios = namedtuple("Scenarios", ("deficit", "surplus", "activity_factor", "macro_pct", "parameters"))
+
+def patient_arrays(patients):
+    # Turns validated patient_data dictionaries into PatientArrays
+    profiles = [profile_for(patient) for patient in patients]
+    return PatientArrays(
+        np.array([patient["age"] for patient in patients], dtype=np.float32),
+        np.array([patient["sex"] == "M" for patient in patients], dtype=bool),
+        np.array([patient["weight_kg"] for patient in patients], dtype=np.float32),
+        np.array([patient["height_cm"] for patient in patients], dtype=np.float32),
+        np.array([patient["activity_factor"] for patient in patients], dtype=np.float32),
+        np.array([GOAL_CODES[patient.get("weight_goal", "maintenance")] for patient in patients], dtype=np.int8),
+        np.array([
+            [profile.macro_percentages[key] for key in MACRO_KEYS] for profile in profiles
+        ], dtype=np.float32).reshape(-1, len(MACRO_KEYS)),
+        equation_codes(patients),
+        np.array([patient.get("body_fat_pct") for patient in patients], dtype=np.float32),
+        np.array([profile.protein_g_per_kg for profile in profiles], dtype=np.float32)
+    )
+
+def scenario_grid(grid):
+    # Expands {"weight_loss_deficit_kcal": [250, 500], "activity_factor": [1.2, 1.55], "macro_split":
+    # [{"protein": 0.2, "carb": 0.5, "fat": 0.3}]} into the Cartesian product of the listed values.
+    # Raises ValueError naming the first unknown parameter or unrealistic value.
+    max_scenarios = SETTINGS.get("scenarios", {}).get("max_scenarios", 10000)
+    axes = []
+    for name, values in grid.items():
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError(f"Unknown sweep parameter '{name}'. Expected one of: {', '.join(SWEEP_PARAMETERS)}.")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"'{name}' must be a non-empty list of values.")
+        for value in values:
+            _check_value(name, value)
+        axes.append((name, values))
+
+    count = int(np.prod([len(values) for _, values in axes]))
+    if count > max_scenarios:
+        raise ValueError(f"The grid has {count} scenarios; at most {max_scenarios} are allowed.")
+
+    # Row i of `choice` gives, per axis, the index of the value scenario i uses
+    choice = np.indices([len(values) for _, values in axes]).reshape(len(axes), -1).T if axes else np.zeros((1, 0), dtype=int)
+    columns = {name: np.full(count, np.nan, dtype=np.float32) for name in SWEEP_PARAMETERS if name != "macro_split"}
+    macro_pct = np.full((count, len(MACRO_KEYS)), np.nan, dtype=np.float32)
+    for axis, (name, values) in enumerate(axes):
+        if name == "macro_split":
+            macro_pct[:] = np.array([[split[key] for key in MACRO_KEYS] for split in values], dtype=np.float32)[choice[:, axis]]
+        else:
+            columns[name][:] = np.array(values, dtype=np.float32)[choice[:, axis]]
+    parameters = [{name: values[i] for (name, values), i in zip(axes, row)} for row in choice.tolist()]
+    return Scenarios(columns["weight_loss_deficit_kcal"], columns["weight_gain_surplus_kcal"], columns["activity_factor"], macro_pct, parameters)
+
+def _check_value(name, value):
+    if name == "macro_split":
+        if not isinstance(value, dict) or any(not isinstance(value.get(key), (int, float)) or value[key] < 0 for key in MACRO_KEYS):
+            raise ValueError("Each macro_split must give non-negative 'protein', 'carb' and 'fat' fractions.")
+        if abs(sum(value[key] for key in MACRO_KEYS) - 1) > 0.01:
+            raise ValueError("Each macro_split's protein, carb and fat fractions must add up to 1.")
+        return
+    low, high = PARAMETER_RANGES[name]
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not (low <= value <= high):
+        raise ValueError(f"'{name}' values must be numbers between {low} and {high}.")
+
+def _override(scenario_values, patient_values):
+    # (scenarios, patients) array of the scenario's value where it sets one, else the patient's
+    if np.isnan(scenario_values).all():
+        return patient_values[None, :]
+    return np.where(np.isnan(scenario_values)[:, None], patient_values[None, :], scenario_values[:, None])
+
+def sweep(patients, scenarios):
+    # Every patient under every scenario in one set of broadcast operations, following
+    # build_nutrition_plan (BMR with the patient's equation, activity factor, goal adjustment with the
+    # minimum calories floor, macro grams with g/kg protein). A scenario's macro_split replaces the
+    # patient's macro rules outright. Returns (scenarios, patients) float32 arrays.
+    adjustments = SETTINGS["calorie_adjustments"]
+    min_calories = SETTINGS["min_calories"]
+
+    bmr = bmr_array(patients.equation, patients.age, patients.male, patients.weight_kg, patients.height_cm, patients.body_fat_pct).astype(np.float32)
+    tdee = bmr[None, :] * _override(scenarios.activity_factor, patients.activity_factor)
+
+    deficit = np.nan_to_num(scenarios.deficit, nan=adjustments["weight_loss_deficit_kcal"])[:, None]
+    surplus = np.nan_to_num(scenarios.surplus, nan=adjustments["weight_gain_surplus_kcal"])[:, None]
+    floor = np.where(patients.male, min_calories["male"], min_calories["female"]).astype(np.float32)[None, :]
+    goal = patients.goal[None, :]
+    adjusted = np.where(goal == GOAL_CODES["loss"], np.maximum(tdee - deficit, floor),
+                        np.where(goal == GOAL_CODES["gain"], tdee + surplus, tdee))
+
+    # The patients' own shares, following get_macro_recommendations: where protein is set in g/kg it is
+    # capped by any protein share, carbohydrates keep their share where it fits and fat takes the rest
+    protein_pct, carb_pct, fat_pct = (patients.macro_pct[None, :, i] for i in range(len(MACRO_KEYS)))
+    per_kg = ~np.isnan(patients.protein_g_per_kg)[None, :]
+    if per_kg.any():
+        protein_g = np.fmin(patients.protein_g_per_kg * patients.weight_kg, adjusted * protein_pct / CALORIES_PER_GRAM[0])
+        by_weight = protein_g * CALORIES_PER_GRAM[0] / adjusted
+        protein_pct = np.where(per_kg, by_weight, protein_pct)
+        carb_pct = np.where(per_kg, np.minimum(carb_pct, np.maximum(0, 1 - by_weight)), carb_pct)
+        fat_pct = np.where(per_kg, np.maximum(0, 1 - protein_pct - carb_pct), fat_pct)
+
+    results = {"tdee": np.broadcast_to(tdee, adjusted.shape), "adjusted_tdee": adjusted}
+    for i, (key, patient_pct) in enumerate(zip(MACRO_KEYS, (protein_pct, carb_pct, fat_pct))):
+        scenario_pct = scenarios.macro_pct[:, i, None]
+        results[f"{key}_g"] = adjusted * np.where(np.isnan(scenario_pct), patient_pct, scenario_pct) / CALORIES_PER_GRAM[i]
+    results["at_minimum"] = (goal == GOAL_CODES["loss"]) & (tdee - deficit <= floor)
+    return results
+
+def summarise_sweep(patients, scenarios, chunk_cells=None):
+    # One row per scenario: its parameters, then the mean (and range) over the patients of the target
+    # calories and macro grams, and the share of patients held at the minimum calories. Scenarios are
+    # swept in blocks of about `chunk_cells` scenario-patient pairs so memory stays bounded.
+    chunk_cells = chunk_cells or SETTINGS.get("scenarios", {}).get("chunk_cells", 2000000)
+    count = len(scenarios.parameters)
+    block = max(1, chunk_cells // max(len(patients.age), 1))
+    stats = {name: np.zeros(count) for name in (
+        "adjusted_tdee_mean", "adjusted_tdee_min", "adjusted_tdee_max", "protein_g_mean", "carb_g_mean", "fat_g_mean", "share_at_minimum"
+    )}
+    for start in range(0, count, block):
+        part = Scenarios(*(values[start:start + block] for values in scenarios))
+        results = sweep(patients, part)
+        rows = slice(start, start + block)
+        stats["adjusted_tdee_mean"][rows] = results["adjusted_tdee"].mean(axis=1)
+        stats["adjusted_tdee_min"][rows] = results["adjusted_tdee"].min(axis=1)
+        stats["adjusted_tdee_max"][rows] = results["adjusted_tdee"].max(axis=1)
+        for key in MACRO_KEYS:
+            stats[f"{key}_g_mean"][rows] = results[f"{key}_g"].mean(axis=1)
+        stats["share_at_minimum"][rows] = results["at_minimum"].mean(axis=1)
+    return [
+        {**parameters, **{name: round(float(values[i]), 3 if name == "share_at_minimum" else 1) for name, values in stats.items()}}
+        for i, parameters in enumerate(scenarios.parameters)
+    ]
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+    from plan_store import PlanStore
+
+    parser = argparse.ArgumentParser(description="Sweep calorie and macro settings over the stored patients.")
+    parser.add_argument("grid", help='JSON grid, e.g. \'{"weight_loss_deficit_kcal": [250, 500, 750, 1000]}\'')
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    patients = patient_arrays(store.get_patients())
+    store.close()
+    scenarios = scenario_grid(json.loads(args.grid))
+    started = time.perf_counter()
+    rows = summarise_sweep(patients, scenarios)
+    print(f"Swept {len(rows)} scenarios x {len(patients.age)} patients in {time.perf_counter() - started:.2f} s.")
+    for row in rows:
+        print(json.dumps(row))
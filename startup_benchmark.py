@@ -0,0 +1,77 @@
+# startup_benchmark.py
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules whose import time makes up each entry point's start-up: (budget in milliseconds,
+# framework imports excluded from the measurement because the app cannot avoid them)
+STARTUP_BUDGETS = {
+    "gui.app": (80, ()), # Everything main.py imports before the window can be drawn
+    "user_input": (40, ("streamlit",)), # The Streamlit calculator page
+    "api_server": (150, ())
+}
+
+def measure_import(module, python=sys.executable):
+    # Imports `module` in a fresh interpreter with `-X importtime` and returns
+    # (total microseconds for the module, {imported module: cumulative microseconds})
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None) # Measure with cached bytecode, as an installed app would run
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|") # "import time: self | cumulative | name"
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative.get(module, 0), cumulative
+
+def benchmark(module, runs=5, exclude=()):
+    # Warm-up run first (writes bytecode caches), then the median of `runs` measurements
+    measure_import(module)
+    samples = [measure_import(module) for _ in range(runs)]
+    median_us = statistics.median(
+        total - sum(cumulative.get(name, 0) for name in exclude) for total, cumulative in samples
+    )
+    return median_us / 1000, samples[-1][1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure start-up import time against a budget (fails if exceeded).")
+    parser.add_argument("modules", nargs="*", help=f"Modules to measure (default: {', '.join(STARTUP_BUDGETS)})")
+    parser.add_argument("--threshold-ms", type=float, help="Budget for every module, overriding the defaults")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Show the slowest imports of each module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or STARTUP_BUDGETS:
+        budget_ms, exclude = STARTUP_BUDGETS.get(module, (100, ()))
+        budget_ms = args.threshold_ms or budget_ms
+        try:
+            total_ms, cumulative = benchmark(module, args.runs, exclude)
+        except RuntimeError as e:
+            print(f"SKIP  {module}: {e}")
+            continue
+
+        status = "OK  " if total_ms <= budget_ms else "FAIL"
+        failed = failed or total_ms > budget_ms
+        print(f"{status}  {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        slowest = sorted(
+            (
+                (us, name) for name, us in cumulative.items()
+                if name != module and not any(name == x or name.startswith(x + ".") for x in exclude)
+            ),
+            reverse=True
+        )[:args.top]
+        for us, name in slowest:
+            print(f"        {us / 1000:7.1f} ms  {name}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,75 @@
+# substitutions.py
+
+import warnings
+
+import numpy as np
+
+from config_manager import SETTINGS # Supplies the nutrients each condition must not make worse
+from food_catalogue import NUTRIENT_KEYS
+
+class SubstitutionIndex:
+    # Nearest-neighbour index over nutrient-profile vectors, blocked by (category, Type): a query only
+    # scans the items of its own block, which NumPy compares in one pass (blocked brute force)
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        count = len(catalogue)
+
+        # Raw values (NaN where a cell holds no number), then standardised so every nutrient weighs the
+        # same in the distance; a missing value sits at the mean and so neither helps nor hurts
+        self.raw = np.full((count, len(NUTRIENT_KEYS)), np.nan, dtype=np.float32)
+        block_keys = np.zeros(count, dtype=np.int64)
+        type_count = len(catalogue.types.values)
+        for category_code, table in enumerate(catalogue.tables):
+            rows = slice(table.start, table.start + len(table))
+            for key, column in table.nutrients.items():
+                codes = np.frombuffer(column.codes, dtype=np.uint8)
+                values = np.frombuffer(column.values, dtype=np.float32)
+                self.raw[rows, NUTRIENT_KEYS.index(key)] = np.where(codes > 1, values, np.nan)
+            types = np.frombuffer(table.types, dtype=np.dtype(f"u{table.types.itemsize}"))
+            block_keys[rows] = category_code * type_count + types
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # Nutrients no item declares get mean 0 and scale 1
+            mean = np.nan_to_num(np.nanmean(self.raw, axis=0))
+            std = np.nan_to_num(np.nanstd(self.raw, axis=0))
+        std[std == 0] = 1
+        self.vectors = np.nan_to_num((self.raw - mean) / std)
+
+        # Rows of each block, in catalogue order
+        order = np.argsort(block_keys, kind="stable")
+        keys, starts = np.unique(block_keys[order], return_index=True)
+        self.blocks = dict(zip(keys.tolist(), np.split(order, starts[1:])))
+        self.block_keys = block_keys
+
+    def substitutes(self, index, condition=None, k=5):
+        # Up to k items of the same category and Type closest in nutrient profile to item `index`.
+        # With a condition, a substitute must be no worse on any of the condition's nutrients and
+        # better on at least one; items missing one of those values are not suggested, and an item
+        # that lists none of them gets no suggestions, as nothing can be shown to be healthier.
+        # Without a condition (or for one with no nutrients) these are just similar items, and
+        # items with an identical profile are left out. Returns [(catalogue index, distance)] nearest first.
+        rows = self.blocks[int(self.block_keys[index])]
+        rows = rows[rows != index]
+
+        keys = SETTINGS.get("substitutions", {}).get("condition_nutrients", {}).get(condition, [])
+        columns = [NUTRIENT_KEYS.index(key) for key in keys if not np.isnan(self.raw[index, NUTRIENT_KEYS.index(key)])]
+        if keys and not columns:
+            return []
+        if columns:
+            candidate = self.raw[np.ix_(rows, columns)]
+            current = self.raw[index, columns]
+            with np.errstate(invalid="ignore"):
+                keep = (candidate <= current).all(axis=1) & (candidate < current).any(axis=1)
+            rows = rows[keep]
+
+        distances = ((self.vectors[rows] - self.vectors[index]) ** 2).sum(axis=1)
+        if not columns:
+            rows, distances = rows[distances > 0], distances[distances > 0]
+        if not len(rows):
+            return []
+        if len(rows) > k:
+            nearest = np.argpartition(distances, k)[:k]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return [(int(rows[i]), float(np.sqrt(distances[i]))) for i in order]
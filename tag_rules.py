@@ -0,0 +1,159 @@
+# tag_rules.py
+
+import csv
+from collections import namedtuple
+
+import numpy as np
+
+from config_manager import SETTINGS # Supplies the tag rules
+from food_catalogue import RANGE_OPERATORS, parse_predicate
+
+# A compiled rule: the tag is earned by items of `category` (None = every category) meeting all predicates
+TagRule = namedtuple("TagRule", ("tag", "category", "predicates"))
+
+# Derived and hand-entered tags of one CategoryTable, as boolean matrices of shape (tags, rows)
+TableTags = namedtuple("TableTags", ("table", "derived", "existing"))
+
+# NumPy type of a pool-code column by its item size (see food_catalogue._code_array)
+CODE_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+DIFF_COLUMNS = ("index", "Category_Key", "Item", "existing", "derived", "added", "removed")
+
+# Example rules showing the syntax (python tag_rules.py --example). They are not tuned to the sheet:
+# its hand-entered tags do not follow these thresholds, so most of them would change.
+EXAMPLE_RULES = [
+    {"tag": "T001", "category": "Beverage", "when": ["sugar<=5"]},
+    {"tag": "T003", "when": ["sugar<=0.5"]},
+    {"tag": "T004", "category": "Beverage", "when": ["saturated_fat<=1.2"]},
+    {"tag": "T005", "category": "Food", "when": ["sodium<=120"]},
+    {"tag": "T005", "category": "Beverage", "when": ["sodium<=40"]},
+    {"tag": "T007", "when": ["wholegrain>=25"]},
+    {"tag": "T008", "when": ["calcium>=60"]}
+]
+
+def compile_rules(rules=None):
+    # Turns the "tag_rules" settings ({"tag": "T001", "category": "Beverage", "when": ["sugar<=5"]})
+    # into TagRules; a malformed predicate raises ValueError naming it. No rules are configured by default.
+    if rules is None:
+        rules = SETTINGS.get("tag_rules", [])
+    return [
+        TagRule(rule["tag"], rule.get("category"), tuple(parse_predicate(text) for text in rule["when"]))
+        for rule in rules
+    ]
+
+def split_tag_ids(tag_text):
+    # "T007, T001" -> ["T007", "T001"], the same split the Food Wiki page uses
+    return [tag_id.strip() for tag_id in tag_text.split(",") if tag_id.strip()] if tag_text else []
+
+def _rule_mask(table, rule):
+    # Rows of one table meeting every predicate, evaluated over whole columns at once.
+    # The columns are read in place (arrays or memory-mapped views), without copying.
+    mask = np.ones(len(table), dtype=bool)
+    for key, op, bound in rule.predicates:
+        column = table.nutrients.get(key)
+        if column is None:
+            return None # The category has no such nutrient, so the rule does not apply to it
+        codes = np.frombuffer(column.codes, dtype=np.uint8)
+        values = np.frombuffer(column.values, dtype=np.float32)
+        mask &= (codes > 1) & RANGE_OPERATORS[op](values, np.float32(bound))
+    return mask
+
+def derive_tags(catalogue, rules=None):
+    # Evaluates the rules over the whole catalogue. Returns (tag ids, [TableTags per table]); a tag is
+    # derived when any of its rules matches, and hand-entered tags are decoded from the Tag ID pool.
+    rules = compile_rules() if rules is None else rules
+    tag_ids = tuple(dict.fromkeys(rule.tag for rule in rules))
+    tag_rows = {tag_id: i for i, tag_id in enumerate(tag_ids)}
+
+    # Each distinct Tag ID string is split once; rows then look up their pool code
+    pool_tags = np.zeros((len(catalogue.tags.values), len(tag_ids)), dtype=bool)
+    for code, tag_text in enumerate(catalogue.tags.values):
+        for tag_id in split_tag_ids(tag_text):
+            if tag_id in tag_rows:
+                pool_tags[code, tag_rows[tag_id]] = True
+
+    results = []
+    for table in catalogue.tables:
+        derived = np.zeros((len(tag_ids), len(table)), dtype=bool)
+        for rule in rules:
+            if rule.category and rule.category != table.category:
+                continue
+            mask = _rule_mask(table, rule)
+            if mask is not None:
+                derived[tag_rows[rule.tag]] |= mask
+        tag_codes = np.frombuffer(table.tags, dtype=CODE_DTYPES[table.tags.itemsize])
+        results.append(TableTags(table, derived, pool_tags[tag_codes].T))
+    return tag_ids, results
+
+def summarise_diff(tag_ids, results):
+    # Per tag: items that already have it and keep it, items gaining it and items losing it
+    summary = {tag_id: {"kept": 0, "added": 0, "removed": 0} for tag_id in tag_ids}
+    for result in results:
+        kept = (result.derived & result.existing).sum(axis=1)
+        added = (result.derived & ~result.existing).sum(axis=1)
+        removed = (result.existing & ~result.derived).sum(axis=1)
+        for i, tag_id in enumerate(tag_ids):
+            summary[tag_id]["kept"] += int(kept[i])
+            summary[tag_id]["added"] += int(added[i])
+            summary[tag_id]["removed"] += int(removed[i])
+    return summary
+
+def iter_diff_rows(tag_ids, results):
+    # One row (DIFF_COLUMNS) per item whose derived tags differ from its hand-entered ones.
+    # Hand-entered tags that no rule covers are left out of the comparison. Each row's tags are
+    # packed into one integer bit set, so the tag lists are only built once per distinct set.
+    weights = np.left_shift(1, np.arange(len(tag_ids), dtype=np.int64))
+    labels = {}
+    def label(bits):
+        if bits not in labels:
+            labels[bits] = ", ".join(tag_id for i, tag_id in enumerate(tag_ids) if bits >> i & 1)
+        return labels[bits]
+
+    for result in results:
+        table = result.table
+        derived_bits = weights @ result.derived
+        existing_bits = weights @ result.existing
+        for row in np.flatnonzero(derived_bits != existing_bits).tolist():
+            derived, existing = int(derived_bits[row]), int(existing_bits[row])
+            yield (
+                table.start + row, table.category, table.names[row],
+                label(existing), label(derived), label(derived & ~existing), label(existing & ~derived)
+            )
+
+def write_diff_csv(tag_ids, results, csv_path):
+    # Writes the differing items for review; returns how many were written
+    count = 0
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(DIFF_COLUMNS)
+        for row in iter_diff_rows(tag_ids, results):
+            writer.writerow(row)
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from food_data import build_shared_food_data
+
+    parser = argparse.ArgumentParser(description="Derive Food Wiki tags from the nutrient rules in settings.json and compare them with the Tag ID column.")
+    parser.add_argument("--store", help="Catalogue store directory (defaults to the one in settings.json)")
+    parser.add_argument("--csv", help="Write the items whose tags would change to this CSV file")
+    parser.add_argument("--example", action="store_true", help="Evaluate the example rules instead of the configured ones")
+    args = parser.parse_args()
+
+    rules = compile_rules(EXAMPLE_RULES if args.example else None)
+    if not rules:
+        parser.exit(message="No tag_rules are configured in settings.json (use --example to try the example rules).\n")
+
+    catalogue = build_shared_food_data(store_dir=args.store).catalogue
+    started = time.perf_counter()
+    tag_ids, results = derive_tags(catalogue, rules)
+    elapsed = time.perf_counter() - started
+
+    print(f"Evaluated {len(tag_ids)} tags over {len(catalogue)} items in {elapsed:.2f} s.")
+    for tag_id, counts in summarise_diff(tag_ids, results).items():
+        print(f"  {tag_id}: {counts['kept']} kept, {counts['added']} added, {counts['removed']} removed")
+    if args.csv:
+        count = write_diff_csv(tag_ids, results, args.csv)
+        print(f"Wrote {count} changed items to {args.csv}.")
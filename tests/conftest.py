@@ -0,0 +1,19 @@
+# conftest.py
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The application modules live at the repository root, one level above the tests
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+@pytest.fixture(autouse=True, scope="session")
+def repository_root():
+    # settings.json is read from the working directory, so the tests run from the repository root
+    previous = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(previous)
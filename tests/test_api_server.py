@@ -0,0 +1,77 @@
+# test_api_server.py
+
+import asyncio
+import json
+
+from api_server import NutritionApi
+from metrics import VALIDATION_FAILURES
+
+PATIENT = {
+    "age": 40, "sex": "M", "weight_kg": 80, "height_cm": 180, "activity_factor": 1.55,
+    "weight_goal": "maintenance", "medical_condition": "general"
+}
+
+async def request(port, method, path, payload=None):
+    # Sends one request with "Connection: close" and reads the response until the server closes the socket
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), timeout=30) # Hangs if any process still holds the socket
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    headers = dict(line.decode("latin-1").lower().split(": ", 1) for line in head.split(b"\r\n")[1:])
+    assert int(headers["content-length"]) == len(body)
+    return status, headers, body
+
+def run_api(scenario):
+    async def main():
+        api = NutritionApi(batch_processes=2)
+        await api.start("127.0.0.1", 0)
+        try:
+            return await scenario(api.server.sockets[0].getsockname()[1])
+        finally:
+            await api.close()
+    return asyncio.run(main())
+
+def test_plan_and_batch_responses_are_read_to_eof():
+    async def scenario(port):
+        status, headers, body = await request(port, "POST", "/plan", PATIENT)
+        assert status == 200
+        assert headers["connection"] == "close"
+        assert json.loads(body)["plan"]["bmi"] > 0
+
+        status, _, body = await request(port, "POST", "/plans/batch", {"patients": [PATIENT, {**PATIENT, "age": 500}]})
+        batch = json.loads(body)
+        assert status == 200
+        assert (batch["count"], batch["errors"]) == (2, 1)
+        assert "error" in batch["results"][1]
+
+        # The first batch request started the worker processes; this one must close cleanly too
+        status, _, body = await request(port, "POST", "/plan", PATIENT)
+        assert status == 200
+    run_api(scenario)
+
+def test_batch_validation_failures_reach_the_metrics():
+    before = VALIDATION_FAILURES.value(("age",))
+    async def scenario(port):
+        await request(port, "POST", "/plans/batch", [{**PATIENT, "age": 0}, {**PATIENT, "age": 500}])
+        _, headers, body = await request(port, "GET", "/metrics")
+        assert headers["content-type"].startswith("text/plain")
+        return body.decode("utf-8")
+    metrics = run_api(scenario)
+    assert VALIDATION_FAILURES.value(("age",)) == before + 2
+    assert f'nutrition_validation_failures_total{{field="age"}} {before + 2}' in metrics
+
+def test_errors_are_json():
+    async def scenario(port):
+        assert (await request(port, "GET", "/nowhere"))[0] == 404
+        assert (await request(port, "GET", "/plan"))[0] == 405
+        status, _, body = await request(port, "POST", "/plan", {**PATIENT, "sex": "X"})
+        assert status == 400
+        assert "error" in json.loads(body)
+    run_api(scenario)
@@ -0,0 +1,66 @@
+# test_condition_rules.py
+
+import pytest
+
+from config_manager import SETTINGS
+from condition_rules import _limit_value, compose_profile, order_conditions, patient_conditions, profile_for
+
+def test_single_condition_keeps_its_own_rules():
+    profile = compose_profile(("diabetes",))
+    assert profile.conditions == ("diabetes",)
+    assert profile.primary == "diabetes"
+    assert profile.macro_percentages == SETTINGS["macro_percentages"]["diabetes"]
+    assert profile.micronutrient_guidelines == SETTINGS["micronutrient_guidelines"]["diabetes"]
+    assert profile.protein_g_per_kg is None
+
+def test_conditions_are_deduplicated_and_ordered_by_precedence():
+    assert order_conditions(("hypertension", "diabetes", "hypertension")) == ("diabetes", "hypertension")
+    assert order_conditions(("general", "heart_disease")) == ("heart_disease",)
+    assert order_conditions(("general",)) == ("general",)
+    assert compose_profile(("hypertension", "renal_disease")).primary == "renal_disease"
+
+def test_most_restrictive_macros_win_and_fat_takes_the_rest():
+    macros = SETTINGS["macro_percentages"]
+    profile = compose_profile(("diabetes", "hypertension"))
+    split = profile.macro_percentages
+    assert split["carb"] == min(macros["diabetes"]["carb"], macros["hypertension"]["carb"])
+    assert split["protein"] == min(macros["diabetes"]["protein"], macros["hypertension"]["protein"])
+    assert split["carb"] + split["protein"] + split["fat"] == pytest.approx(1.0)
+
+def test_protein_in_g_per_kg():
+    g_per_kg = SETTINGS["condition_rules"]["protein_g_per_kg"]["renal_disease"]
+    assert compose_profile(("renal_disease",)).protein_g_per_kg == g_per_kg
+    assert compose_profile(("renal_disease",)).macro_percentages["protein"] is None
+    combined = compose_profile(("diabetes", "renal_disease"))
+    assert combined.protein_g_per_kg == g_per_kg
+    assert combined.macro_percentages["protein"] == SETTINGS["macro_percentages"]["diabetes"]["protein"] # Cap from diabetes
+
+def test_limit_value_reads_the_lowest_limit():
+    assert _limit_value("<2300 mg/day (aim for <1500 mg/day)") == (1500.0, -2)
+    assert _limit_value("2300 mg/day") == (2300.0, -1)
+    assert _limit_value("<7% of total calories") < _limit_value("<10% of total calories")
+    assert _limit_value("Minimize strictly") < _limit_value("<1 mg/day")
+    assert _limit_value("Consult your dietitian") == (float("inf"), 0)
+    # On equal lowest limits the text stating more of them is stricter
+    assert _limit_value("<2300 mg/day (aim for <1500 mg/day)") < _limit_value("1500 mg/day")
+
+def test_strictest_limit_text_is_kept_whole():
+    guidelines = SETTINGS["micronutrient_guidelines"]
+    sodium = compose_profile(("diabetes", "hypertension")).micronutrient_guidelines["Sodium"]
+    assert sodium == guidelines["hypertension"]["Sodium"]
+    assert "1500" in sodium
+    assert compose_profile(("diabetes", "heart_disease")).micronutrient_guidelines["Added Sugars"] == guidelines["diabetes"]["Added Sugars"]
+
+def test_patient_conditions_fall_back_to_the_single_condition():
+    assert patient_conditions({"medical_condition": "diabetes"}) == ("diabetes",)
+    assert patient_conditions({"medical_condition": "diabetes", "medical_conditions": ["diabetes", "hypertension"]}) == ("diabetes", "hypertension")
+    assert patient_conditions({}) == ("general",)
+    assert profile_for({"medical_conditions": ["hypertension", "diabetes"]}).primary == "diabetes"
+
+def test_profiles_are_cached_until_the_settings_reload():
+    first = compose_profile(("diabetes", "renal_disease"))
+    assert compose_profile(("diabetes", "renal_disease")) is first
+    SETTINGS.reload()
+    recomposed = compose_profile(("diabetes", "renal_disease"))
+    assert recomposed is not first
+    assert recomposed == first
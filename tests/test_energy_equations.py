@@ -0,0 +1,60 @@
+# test_energy_equations.py
+
+import pytest
+
+from config_manager import SETTINGS
+from energy_equations import EQUATION_CODES, EQUATIONS, bmr_array, calculate_patient_bmr, mifflin_st_jeor, select_equation
+
+np = pytest.importorskip("numpy") # Only the batch form needs NumPy
+
+def random_patients(count=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(1, 100, count), rng.random(count) < 0.5, rng.uniform(8, 200, count),
+        rng.uniform(60, 210, count), rng.uniform(5, 50, count)
+    )
+
+def scalar_bmr(name, age, male, weight_kg, height_cm, body_fat_pct):
+    return np.array([
+        EQUATIONS[name].scalar(int(a), "M" if m else "F", float(w), float(h), float(f))
+        for a, m, w, h, f in zip(age, male, weight_kg, height_cm, body_fat_pct)
+    ])
+
+@pytest.mark.parametrize("name", list(EQUATIONS))
+def test_batch_form_matches_scalar_form(name):
+    age, male, weight_kg, height_cm, body_fat_pct = random_patients()
+    batch = bmr_array(EQUATION_CODES[name], age, male, weight_kg, height_cm, body_fat_pct)
+    assert batch == pytest.approx(scalar_bmr(name, age, male, weight_kg, height_cm, body_fat_pct), abs=1e-6)
+
+def test_mixed_equations_in_one_batch():
+    age, male, weight_kg, height_cm, body_fat_pct = random_patients()
+    codes = np.random.default_rng(1).integers(0, len(EQUATIONS), len(age))
+    names = list(EQUATIONS)
+    expected = np.array([
+        EQUATIONS[names[code]].scalar(int(a), "M" if m else "F", float(w), float(h), float(f))
+        for code, a, m, w, h, f in zip(codes, age, male, weight_kg, height_cm, body_fat_pct)
+    ])
+    assert bmr_array(codes, age, male, weight_kg, height_cm, body_fat_pct) == pytest.approx(expected, abs=1e-6)
+
+def test_age_band_edges_match_the_scalar_form():
+    ages = np.array([2, 3, 9, 10, 17, 18, 29, 30, 59, 60])
+    ones = np.ones(len(ages))
+    for name in ("schofield", "schofield_paediatric"):
+        for male in (False, True):
+            batch = bmr_array(EQUATION_CODES[name], ages, male, 50 * ones, 150 * ones)
+            assert batch == pytest.approx(scalar_bmr(name, ages, [male] * len(ages), 50 * ones, 150 * ones, 20 * ones))
+
+def test_lean_mass_equation_without_body_fat():
+    assert np.isnan(bmr_array(EQUATION_CODES["katch_mcardle"], [40], [True], [80.0], [180.0])).all()
+    with pytest.raises(ValueError):
+        EQUATIONS["katch_mcardle"].scalar(40, "M", 80.0, 180.0)
+
+def test_equation_selection(monkeypatch):
+    adult = {"age": 40, "sex": "M", "weight_kg": 80.0, "height_cm": 180.0, "medical_condition": "general"}
+    assert select_equation(adult) == "mifflin_st_jeor"
+    assert select_equation({**adult, "age": 8}) == "mifflin_st_jeor" # The paediatric equation is opt-in
+    monkeypatch.setitem(SETTINGS["energy_equations"], "paediatric", "schofield_paediatric")
+    assert select_equation({**adult, "age": 8}) == "schofield_paediatric"
+    assert select_equation(adult) == "mifflin_st_jeor"
+    assert select_equation({**adult, "bmr_equation": "harris_benedict"}) == "harris_benedict"
+    assert calculate_patient_bmr(adult) == (mifflin_st_jeor(40, "M", 80.0, 180.0), "mifflin_st_jeor")
@@ -0,0 +1,56 @@
+# test_intake_log.py
+
+from datetime import datetime
+
+import pytest
+
+from intake_log import IntakeLog
+
+LUNCH = datetime(2026, 3, 4, 12, 30)
+
+@pytest.fixture
+def log(tmp_path):
+    intake_log = IntakeLog(str(tmp_path / "intake.db"))
+    yield intake_log
+    intake_log.close()
+
+def test_entries_add_to_every_period(log):
+    log.add_entry("p1", "Rice", 150, {"energy": 195, "carbohydrate": 42}, logged_at=LUNCH)
+    log.add_entry("p1", "Milk", 250, {"energy": 160, "protein": 8}, logged_at=LUNCH.replace(hour=18))
+    for period in ("day", "week", "month"):
+        totals = log.totals("p1", LUNCH.date(), period)
+        assert totals["entries"] == 2
+        assert totals["energy"] == pytest.approx(355)
+        assert totals["protein"] == pytest.approx(8)
+    assert log.totals("p2", LUNCH.date())["entries"] == 0
+
+def test_removal_appends_a_reversal_and_reverses_the_totals(log):
+    kept = log.add_entry("p1", "Rice", 150, {"energy": 195}, logged_at=LUNCH)
+    removed = log.add_entry("p1", "Cake", 100, {"energy": 400, "sugar": 35}, logged_at=LUNCH)
+    reversal = log.remove_entry(removed)
+
+    totals = log.totals("p1", LUNCH.date())
+    assert totals["entries"] == 1
+    assert totals["energy"] == pytest.approx(195)
+    assert totals["sugar"] == pytest.approx(0)
+    assert log.totals("p1", LUNCH.date(), "month")["energy"] == pytest.approx(195)
+    assert [entry["id"] for entry in log.entries("p1", LUNCH.date())] == [kept]
+
+    # The original entry is kept; the reversal negates it on the same day
+    rows = log.connection.execute("SELECT id, day, grams, energy, voids FROM intake_entries ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [
+        (kept, "2026-03-04", 150, 195, None),
+        (removed, "2026-03-04", 100, 400, None),
+        (reversal, "2026-03-04", -100, -400, removed)
+    ]
+
+def test_entries_cannot_be_removed_twice(log):
+    entry = log.add_entry("p1", "Cake", 100, {"energy": 400}, logged_at=LUNCH)
+    reversal = log.remove_entry(entry)
+    with pytest.raises(ValueError):
+        log.remove_entry(entry)
+    with pytest.raises(ValueError):
+        log.remove_entry(reversal) # A reversal is not itself removable
+    with pytest.raises(ValueError):
+        log.remove_entry(9999)
+    assert log.totals("p1", LUNCH.date())["energy"] == pytest.approx(0)
@@ -0,0 +1,79 @@
+# test_label_parser.py
+
+import pytest
+
+from label_parser import MISSING_VALUE, SHEET_COLUMNS, parse_label, parse_label_nutrients, sheet_rows
+
+TWO_COLUMN_LABEL = """NUTRITION INFORMATION
+Serving size: 30 g
+                 Per Serving   Per 100 g
+Energy           502 kJ / 120 kcal   1673 kJ / 400 kcal
+Protein          3.0 g        10.0 g
+Fat, total       1.5 g        5.0 g
+ - Saturated     0.3 g        1.0 g
+Carbohydrate     21.0 g       70.0 g
+ - Sugars        3.6 g        12.0 g
+Dietary Fibre    2.4 g        8.0 g
+Salt             0.15 g       0.5 g
+"""
+
+BEVERAGE_LABEL = """Serving size: 250 ml
+Energy 100 kcal
+Sugars 20 g
+Sodium 50 mg
+Fat nil
+"""
+
+def test_reads_the_per_100_column_and_prefers_kcal():
+    parsed = parse_label_nutrients(TWO_COLUMN_LABEL)
+    nutrients = parsed["nutrients"]
+    assert parsed["serving_size"] == 30.0
+    assert parsed["base_unit"] == "g"
+    assert nutrients["energy"] == 400.0
+    assert nutrients["calories_serving"] == 120.0
+    assert nutrients["protein"] == 10.0
+
+def test_sub_nutrients_are_not_read_as_their_parents():
+    # "Saturated" must not overwrite fat, nor "Sugars" carbohydrate
+    nutrients = parse_label_nutrients(TWO_COLUMN_LABEL)["nutrients"]
+    assert nutrients["fat"] == 5.0
+    assert nutrients["saturated_fat"] == 1.0
+    assert nutrients["carbohydrate"] == 70.0
+    assert nutrients["sugar"] == 12.0
+
+def test_salt_is_converted_to_sodium():
+    nutrients = parse_label_nutrients(TWO_COLUMN_LABEL)["nutrients"]
+    assert nutrients["sodium"] == pytest.approx(200.0) # 0.5 g of salt per 100 g
+
+def test_sodium_line_wins_over_salt():
+    nutrients = parse_label_nutrients("Sodium 120 mg\nSalt 1 g\n")["nutrients"]
+    assert nutrients["sodium"] == 120.0
+
+def test_per_serving_label_is_scaled_to_per_100_ml():
+    parsed = parse_label_nutrients(BEVERAGE_LABEL)
+    nutrients = parsed["nutrients"]
+    assert parsed["base_unit"] == "ml"
+    assert nutrients["energy"] == pytest.approx(40.0)
+    assert nutrients["sugar"] == pytest.approx(8.0)
+    assert nutrients["sodium"] == pytest.approx(20.0)
+    assert nutrients["fat"] == 0.0 # "nil" is a declared zero
+    assert nutrients["calories_serving"] == 100.0
+
+def test_parse_label_infers_category_and_fills_missing_columns():
+    row = parse_label(BEVERAGE_LABEL, item="Cola")
+    assert row["Category_Key"] == "Beverage"
+    assert row["Item"] == "Cola"
+    assert row["Sugar (g/100ml)"] == 8.0
+    assert row["Protein (g/100ml)"] == MISSING_VALUE
+    assert set(SHEET_COLUMNS["Beverage"]) <= set(row)
+
+def test_parse_label_rejects_unknown_category():
+    with pytest.raises(ValueError):
+        parse_label(BEVERAGE_LABEL, category="Snack")
+
+def test_sheet_rows_groups_rows_in_sheet_column_order():
+    beverage = parse_label(BEVERAGE_LABEL, item="Cola")
+    food = parse_label(TWO_COLUMN_LABEL, item="Cereal")
+    grouped = sheet_rows([beverage, food])
+    assert grouped["Beverages"] == [[beverage[column] for column in SHEET_COLUMNS["Beverage"]]]
+    assert grouped["Food"] == [[food[column] for column in SHEET_COLUMNS["Food"]]]
@@ -0,0 +1,117 @@
+# test_plan_store.py
+
+import re
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import plan_store
+from calculations import build_nutrition_plan
+from plan_store import COHORT_ID, PlanStore, plan_from_row
+
+def patient(weight_kg, **fields):
+    return {
+        "age": 40, "sex": "F", "weight_kg": weight_kg, "height_cm": 165.0, "activity_factor": 1.375,
+        "activity_level_description": "Lightly active", "medical_condition": "general",
+        "medical_condition_description": "General", "weight_goal": "loss", "weight_goal_description": "Lose Weight",
+        "diabetes_subtype": "N/A", **fields
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    plan_store_ = PlanStore(str(tmp_path / "plans.db"))
+    yield plan_store_
+    plan_store_.close()
+
+def weekly_plans(patient_id, start_kg, loss_per_week, weeks, start=date(2026, 1, 5)):
+    # One plan every Monday, losing `loss_per_week` kg a week
+    for week in range(weeks):
+        data = patient(start_kg - loss_per_week * week)
+        yield patient_id, data, build_nutrition_plan(data), (start + timedelta(weeks=week)).isoformat() + "T09:00:00"
+
+def test_rollups_give_period_means_and_weekly_trends(store):
+    store.add_plans(weekly_plans("a", 90.0, 0.5, 8))
+    weeks = store.get_progress("a", "week")
+    assert len(weeks) == 8
+    assert weeks[0]["weight_kg"] == pytest.approx(90.0)
+    assert weeks[0]["weight_kg_per_week"] is None # A single plan has no trend
+
+    overall = store.get_progress("a", "all")[0]
+    assert overall["plans"] == 8
+    assert overall["weight_kg"] == pytest.approx(90.0 - 0.5 * 3.5)
+    assert overall["weight_kg_per_week"] == pytest.approx(-0.5)
+
+    months = store.get_progress("a", "month")
+    assert [month["period_key"] for month in months] == ["2026-01", "2026-02"]
+    assert sum(month["plans"] for month in months) == 8
+
+def test_cohort_rollups_cover_every_patient(store):
+    store.add_plans(weekly_plans("a", 90.0, 0.5, 4))
+    store.add_plans(weekly_plans("b", 70.0, 0, 1))
+    cohort = store.get_progress(COHORT_ID, "all")[0]
+    assert cohort["plans"] == 5
+    assert cohort["weight_kg"] == pytest.approx((90 + 89.5 + 89 + 88.5 + 70) / 5)
+
+def test_incremental_rollups_match_a_rebuild(store):
+    store.add_plans(weekly_plans("a", 90.0, 0.5, 6))
+    for record in weekly_plans("b", 80.0, -0.25, 5, start=date(2026, 1, 7)):
+        store.add_plan(*record)
+    incremental = {period: store.get_progress(COHORT_ID, period) for period in ("week", "month", "all")}
+    store.rebuild_rollups()
+    for period, summaries in incremental.items():
+        rebuilt = store.get_progress(COHORT_ID, period)
+        assert [summary["period_key"] for summary in rebuilt] == [summary["period_key"] for summary in summaries]
+        for before, after in zip(summaries, rebuilt):
+            for key, value in before.items():
+                assert after[key] == (None if value is None else pytest.approx(value))
+
+def test_history_date_bounds_are_inclusive(store):
+    for day, weight in (("03", 80.0), ("04", 79.0), ("05", 78.0)):
+        data = patient(weight)
+        store.add_plan("d", data, build_nutrition_plan(data), created_at=f"2026-03-{day}T18:30:00")
+
+    def dates(**bounds):
+        return [plan["created_at"][:10] for plan in store.get_patient_history("d", **bounds)]
+    assert dates(until="2026-03-04") == ["2026-03-03", "2026-03-04"]
+    assert dates(since="2026-03-04", until="2026-03-04") == ["2026-03-04"]
+    assert dates(since="2026-03-05") == ["2026-03-05"]
+    assert len(dates()) == 3
+
+def test_combined_conditions_and_energy_inputs_round_trip(store):
+    data = patient(
+        85.0, medical_condition="renal_disease", medical_conditions=["diabetes", "renal_disease"],
+        body_fat_pct=32.0, bmr_equation="katch_mcardle", goal_weight_kg=75.0
+    )
+    results = build_nutrition_plan(data)
+    store.add_plan("c", data, results)
+
+    stored_data, stored_results = plan_from_row(store.get_patient_history("c")[-1])
+    assert stored_data["medical_conditions"] == ["diabetes", "renal_disease"]
+    assert stored_data["body_fat_pct"] == 32.0
+    assert stored_data["goal_weight_kg"] == 75.0
+    assert stored_results["bmr_equation"] == "katch_mcardle"
+    assert stored_results["micronutrient_guidelines"] == results["micronutrient_guidelines"]
+    assert store.get_patients()[0]["medical_conditions"] == ["diabetes", "renal_disease"]
+
+def test_older_databases_get_the_added_columns(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    old_schema = plan_store.SCHEMA
+    for columns in plan_store.ADDED_COLUMNS.values():
+        for column, column_type in columns:
+            old_schema = re.sub(rf",\s*{column} {column_type}\b", "", old_schema)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(old_schema)
+    assert "medical_conditions" not in {row[1] for row in connection.execute("PRAGMA table_info(plans)")}
+    connection.close()
+
+    store = PlanStore(db_path)
+    store.add_plan("d", patient(80.0, medical_conditions=["hypertension", "diabetes"]), build_nutrition_plan(patient(80.0)))
+    assert store.get_patient("d")["medical_conditions"] == ["hypertension", "diabetes"]
+    store.close()
+
+def test_csv_primary_condition_follows_precedence():
+    row = {"age": "60", "sex": "f", "weight_kg": "70", "height_cm": "160", "medical_conditions": "hypertension;renal_disease"}
+    data = plan_store._patient_from_csv_row(row)
+    assert data["medical_conditions"] == ["hypertension", "renal_disease"]
+    assert data["medical_condition"] == "renal_disease"
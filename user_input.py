@@ -1,15 +1,13 @@
 # user_input.py
 
 import streamlit as st
-from calculations import (
-    calculate_bmi,
-    classify_bmi,
-    calculate_bmr,
-    calculate_tdee,
-    get_macro_recommendations,
-    get_micronutrient_guidelines
-)
-from config_manager import SETTINGS
+from calculations import build_nutrition_plan
+from energy_equations import EQUATIONS
+from condition_rules import order_conditions
+from patient_validation import validate_energy_inputs
+from report_renderer import render_report
+from weight_projection import project_plan
+from metrics import PLANS_COMPUTED, CALCULATION_SECONDS
 
 def show_calculator():
     st.header("Patient Information")
@@ -34,17 +32,19 @@ def show_calculator():
     activity_factor = activity_levels[activity_description]
 
     medical_conditions = {
-        "General": "general",
         "Diabetes": "diabetes",
         "Renal Disease": "renal_disease",
         "Hypertension": "hypertension",
         "Heart Disease": "heart_disease"
     }
-    medical_condition_description = st.selectbox("Medical Condition", list(medical_conditions.keys()))
-    medical_condition = medical_conditions[medical_condition_description]
+    # Several conditions can be chosen; their rules are combined, the most restrictive winning
+    condition_descriptions = st.multiselect("Medical Conditions", list(medical_conditions.keys()), placeholder="None (general)")
+    conditions = [medical_conditions[description] for description in condition_descriptions] or ["general"]
+    medical_condition = order_conditions(conditions)[0]
+    medical_condition_description = " + ".join(condition_descriptions) or "General"
 
     diabetes_subtype = st.selectbox("Diabetes Subtype", ["Type 1", "Type 2", "Gestational"]) \
-        if medical_condition == "diabetes" else None
+        if "diabetes" in conditions else None
 
     weight_goal_options = {
         "Maintain Weight": "maintenance",
@@ -54,42 +54,93 @@ def show_calculator():
     
     weight_goal_description = st.selectbox("Weight Goal", list(weight_goal_options.keys()))
     weight_goal = weight_goal_options[weight_goal_description]
+    goal_weight_kg = st.number_input(
+        "Goal Weight (kg, optional)", min_value=0.0, max_value=300.0, value=0.0, step=0.1, format="%.1f",
+        help="Leave at 0 for no goal weight."
+    )
+
+    # BMR equation: "Automatic" follows settings.json (paediatric, per condition or default)
+    bmr_equations = {"Automatic": None, **{equation.label: name for name, equation in EQUATIONS.items()}}
+    bmr_equation_description = st.selectbox("BMR Equation", list(bmr_equations.keys()))
+    body_fat_pct = st.number_input(
+        "Body Fat (%, optional)", min_value=0.0, max_value=70.0, value=0.0, step=0.5, format="%.1f",
+        help="Needed for Katch-McArdle. Leave at 0 if unknown."
+    )
 
     if st.button("Calculate Nutrition Plan"):
+        energy_valid, energy_inputs, energy_error = validate_energy_inputs(
+            bmr_equations[bmr_equation_description], body_fat_pct or None
+        )
         if age == 0 or weight_kg == 0 or height_cm == 0 or sex == "Select...":
             st.error("⚠️ Please enter valid values for age, sex, weight, and height before calculating.")
+        elif not energy_valid:
+            st.error(f"⚠️ {energy_error}")
         else:
-            bmi = calculate_bmi(weight_kg, height_cm)
-            bmi_classification = classify_bmi(bmi)
-            bmr = calculate_bmr(age, sex, weight_kg, height_cm)
-            tdee = calculate_tdee(bmr, activity_factor)
-
-            adjusted_tdee = tdee
-            if weight_goal == "loss":
-                adjusted_tdee -= SETTINGS["calorie_adjustments"]["weight_loss_deficit_kcal"]
-                min_cal = SETTINGS["min_calories"]["female"] if sex == "F" else SETTINGS["min_calories"]["male"]
-                adjusted_tdee = max(adjusted_tdee, min_cal)
-            elif weight_goal == "gain":
-                adjusted_tdee += SETTINGS["calorie_adjustments"]["weight_gain_surplus_kcal"]
-
-            macro_percentages = SETTINGS["macro_percentages"].get(
-                medical_condition, SETTINGS["macro_percentages"]["general"]
-            )
-            macros = get_macro_recommendations(adjusted_tdee, macro_percentages, weight_kg)
-            micronutrients = get_micronutrient_guidelines(medical_condition)
+            patient_data = {
+                "age": age,
+                "sex": sex,
+                "weight_kg": weight_kg,
+                "height_cm": height_cm,
+                "activity_factor": activity_factor,
+                "medical_condition": medical_condition,
+                "medical_conditions": conditions if len(conditions) > 1 else None,
+                "weight_goal": weight_goal,
+                "diabetes_subtype": diabetes_subtype or "N/A",
+                "goal_weight_kg": goal_weight_kg or None,
+                **energy_inputs
+            }
+            with CALCULATION_SECONDS.time(labels=("streamlit",)):
+                results = build_nutrition_plan(patient_data)
+            PLANS_COMPUTED.inc(labels=("streamlit",))
+            bmi = results["bmi"]
+            bmi_classification = results["bmi_classification"]
+            bmr = results["bmr"]
+            tdee = results["tdee"]
+            adjusted_tdee = results["adjusted_tdee"]
+            macros = results["macros"]
+            micronutrients = results["micronutrient_guidelines"]
 
             # Display
             st.success("Nutrition Plan Calculated Successfully!")
             st.subheader("Health Metrics")
             st.write(f"**BMI:** {bmi:.1f} ({bmi_classification})")
-            st.write(f"**BMR:** {bmr:.0f} kcal/day")
+            st.write(f"**BMR:** {bmr:.0f} kcal/day ({EQUATIONS[results['bmr_equation']].label})")
             st.write(f"**TDEE:** {tdee:.0f} kcal/day")
             st.write(f"**Adjusted Calories:** {adjusted_tdee:.0f} kcal/day")
 
             st.subheader("Macronutrient Recommendations")
-            st.write(f"**Protein:** {macros['protein_g']:.0f}g ({macro_percentages['protein']:.0%})")
-            st.write(f"**Carbohydrates:** {macros['carb_g']:.0f}g ({macro_percentages['carb']:.0%})")
-            st.write(f"**Fats:** {macros['fat_g']:.0f}g ({macro_percentages['fat']:.0%})")
+            st.write(f"**Protein:** {macros['protein_g']:.0f}g ({macros['protein_pct']:.0%}, {macros['protein_g'] / weight_kg:.2f} g/kg)")
+            st.write(f"**Carbohydrates:** {macros['carb_g']:.0f}g ({macros['carb_pct']:.0%})")
+            st.write(f"**Fats:** {macros['fat_g']:.0f}g ({macros['fat_pct']:.0%})")
+
+            # Week-by-week weight on the target calories, with BMR recalculated as weight changes
+            projection = project_plan(patient_data, results)
+            st.subheader("Weight Projection")
+            st.line_chart(
+                {"Week": list(range(projection["weeks"] + 1)), "Weight (kg)": projection["weight_kg"]}, x="Week", y="Weight (kg)"
+            )
+            st.write(f"**After {projection['weeks']} weeks:** {projection['final_weight_kg']:.1f} kg (BMI {projection['final_bmi']:.1f})")
+            if projection["goal_weight_kg"] is not None:
+                if projection["weeks_to_goal"] is None:
+                    st.write(f"**Goal weight:** {goal_weight_kg:.1f} kg is not reached on this intake "
+                             f"(weight settles near {projection['equilibrium_kg']:.1f} kg).")
+                else:
+                    st.write(f"**Goal weight:** {goal_weight_kg:.1f} kg in about {projection['weeks_to_goal']} weeks.")
 
             st.subheader("Micronutrient Guidelines")
             st.json(micronutrients)
+
+            # Same report the desktop app saves, rendered from the plan data
+            patient_data.update({
+                "activity_level_description": activity_description,
+                "medical_condition_description": medical_condition_description,
+                "weight_goal_description": weight_goal_description
+            })
+            st.subheader("Download Plan")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.download_button("Text", render_report(patient_data, results, "text"), file_name="nutrition_plan.txt")
+            with col2:
+                st.download_button("HTML", render_report(patient_data, results, "html"), file_name="nutrition_plan.html", mime="text/html")
+            with col3:
+                st.download_button("PDF", render_report(patient_data, results, "pdf"), file_name="nutrition_plan.pdf", mime="application/pdf")
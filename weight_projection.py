@@ -0,0 +1,139 @@
+# weight_projection.py
+
+import math
+from collections import namedtuple
+
+from calculations import calculate_bmi
+from energy_equations import EQUATIONS, EQUATION_CODES, bmr_array, select_equation # Batch BMR with a per-patient equation
+from config_manager import SETTINGS # Supplies the projection horizon and the energy content of body weight
+
+# Projection of a group of patients. weight_kg has shape (patients, weeks + 1), column 0 being the
+# starting weight; equilibrium_kg is where each patient's weight settles on their intake, and
+# weeks_to_goal is NaN where the goal weight is never reached.
+Projection = namedtuple("Projection", ("weeks", "weight_kg", "equilibrium_kg", "weeks_to_goal"))
+
+def _projection_settings(weeks=None, kcal_per_kg=None):
+    projection = SETTINGS.get("projection", {})
+    return (
+        projection.get("weeks", 52) if weeks is None else weeks,
+        projection.get("kcal_per_kg", 7700) if kcal_per_kg is None else kcal_per_kg
+    )
+
+def project_weights(age, male, weight_kg, height_cm, activity_factor, target_kcal, goal_weight_kg=None, weeks=None,
+                    kcal_per_kg=None, equation=None, body_fat_pct=None):
+    # Simulates each patient eating `target_kcal` a day while their expenditure (BMR x activity factor)
+    # follows their weight, week by week: w[t+1] = w[t] + 7 * (target - activity * BMR(w[t])) / kcal_per_kg.
+    # Every BMR equation is linear in weight, so the recurrence has the closed form w[t] = w_eq + (w[0] - w_eq) * r**t
+    # with r = 1 - 7 * activity * dBMR/dw / kcal_per_kg; every patient and week is one broadcast expression.
+    # Age and body fat percentage are held at their starting values. Arguments are per-patient arrays
+    # (`equation` holds EQUATION_CODES, default Mifflin-St Jeor); goal_weight_kg may hold NaN.
+    import numpy as np
+    weeks, kcal_per_kg = _projection_settings(weeks, kcal_per_kg)
+    if equation is None:
+        equation = EQUATION_CODES["mifflin_st_jeor"]
+    age, weight_kg, height_cm, activity_factor, target_kcal = (
+        np.asarray(values, dtype=np.float64) for values in (age, weight_kg, height_cm, activity_factor, target_kcal)
+    )
+
+    bmr = bmr_array(equation, age, male, weight_kg, height_cm, body_fat_pct)
+    slope = bmr_array(equation, age, male, weight_kg + 1, height_cm, body_fat_pct) - bmr # kcal/day of BMR per kg of body weight
+    burn_per_kg = activity_factor * slope
+    equilibrium = weight_kg + (target_kcal - activity_factor * bmr) / burn_per_kg
+    ratio = 1 - 7 * burn_per_kg / kcal_per_kg
+
+    # r**t as exp(t * log r), built in place in float32: a (patients, weeks + 1) array is the only large allocation
+    steps = np.arange(weeks + 1)
+    trajectory = np.multiply.outer(np.log(ratio).astype(np.float32), steps.astype(np.float32))
+    np.exp(trajectory, out=trajectory)
+    trajectory *= (weight_kg - equilibrium).astype(np.float32)[:, None]
+    trajectory += equilibrium.astype(np.float32)[:, None]
+
+    weeks_to_goal = np.full(weight_kg.shape, np.nan)
+    if goal_weight_kg is not None:
+        goal = np.asarray(goal_weight_kg, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Share of the starting gap to equilibrium still left at the goal; the goal is reached only
+            # if it lies between the starting weight and the equilibrium (0 < remaining <= 1)
+            remaining = (goal - equilibrium) / (weight_kg - equilibrium)
+            reachable = (remaining > 0) & (remaining <= 1)
+            exact = np.log(np.where(reachable, remaining, 1)) / np.log(ratio)
+        weeks_to_goal = np.where(reachable, np.ceil(np.round(exact, 9)), np.nan)
+        weeks_to_goal[goal == weight_kg] = 0
+    return Projection(steps, trajectory, equilibrium, weeks_to_goal)
+
+def project_plan(patient_data, calculated_results, weeks=None):
+    # Projection of one plan for the reports and UIs, on the plan's target calories and BMR equation. The
+    # goal weight is the optional `goal_weight_kg` in patient_data. The same closed form as project_weights,
+    # in plain Python with the scalar equation, so rendering a report does not need NumPy.
+    # Returns a dictionary of plain Python values.
+    weeks, kcal_per_kg = _projection_settings(weeks)
+    goal_weight_kg = patient_data.get("goal_weight_kg")
+    equation = EQUATIONS[calculated_results.get("bmr_equation") or select_equation(patient_data)].scalar
+    age, sex, weight_kg, height_cm = (patient_data[field] for field in ("age", "sex", "weight_kg", "height_cm"))
+    body_fat_pct = patient_data.get("body_fat_pct")
+    activity_factor = patient_data["activity_factor"]
+    target_kcal = calculated_results["adjusted_tdee"]
+
+    bmr = equation(age, sex, weight_kg, height_cm, body_fat_pct)
+    burn_per_kg = activity_factor * (equation(age, sex, weight_kg + 1, height_cm, body_fat_pct) - bmr)
+    equilibrium = weight_kg + (target_kcal - activity_factor * bmr) / burn_per_kg
+    ratio = 1 - 7 * burn_per_kg / kcal_per_kg
+    weights = [round(equilibrium + (weight_kg - equilibrium) * ratio ** week, 2) for week in range(weeks + 1)]
+
+    weeks_to_goal = None
+    if goal_weight_kg is not None:
+        if goal_weight_kg == weight_kg:
+            weeks_to_goal = 0
+        elif weight_kg != equilibrium:
+            remaining = (goal_weight_kg - equilibrium) / (weight_kg - equilibrium)
+            if 0 < remaining <= 1:
+                weeks_to_goal = math.ceil(round(math.log(remaining) / math.log(ratio), 9))
+    return {
+        "weeks": weeks,
+        "target_kcal": target_kcal,
+        "weight_kg": weights,
+        "final_weight_kg": weights[-1],
+        "final_bmi": calculate_bmi(weights[-1], height_cm),
+        "first_week_change_kg": weights[1] - weights[0] if len(weights) > 1 else 0.0,
+        "equilibrium_kg": equilibrium,
+        "goal_weight_kg": goal_weight_kg,
+        "weeks_to_goal": weeks_to_goal
+    }
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import numpy as np
+    from plan_store import PlanStore
+    from scenario_sweep import patient_arrays, scenario_grid, sweep
+
+    parser = argparse.ArgumentParser(description="Project the weight of every stored patient on their target calories.")
+    parser.add_argument("--db", help="Database file (defaults to the one in settings.json)")
+    parser.add_argument("--weeks", type=int, help="Weeks to project (defaults to the one in settings.json)")
+    parser.add_argument("--goal-bmi", type=float, help="Goal weight for patients losing or gaining: this BMI at their height")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    patients = [patient for patient in store.get_patients() if None not in (patient["age"], patient["weight_kg"], patient["height_cm"])]
+    store.close()
+    if not patients:
+        raise SystemExit("No stored patients were found.")
+    arrays = patient_arrays(patients)
+    # Target calories under the current settings: a sweep with a single, default scenario
+    target_kcal = sweep(arrays, scenario_grid({}))["adjusted_tdee"][0]
+    goal_weight_kg = None
+    if args.goal_bmi:
+        goal_weight_kg = np.where(arrays.goal > 0, args.goal_bmi * (arrays.height_cm.astype(np.float64) / 100) ** 2, np.nan)
+
+    started = time.perf_counter()
+    projection = project_weights(
+        arrays.age, arrays.male, arrays.weight_kg, arrays.height_cm, arrays.activity_factor, target_kcal, goal_weight_kg, args.weeks,
+        equation=arrays.equation, body_fat_pct=arrays.body_fat_pct
+    )
+    print(f"Projected {len(patients)} patients over {projection.weeks[-1]} weeks in {time.perf_counter() - started:.3f} s.")
+    for week in sorted({4, 12, 26, int(projection.weeks[-1])} & set(projection.weeks.tolist())):
+        print(f"Week {week:3d}: mean weight {projection.weight_kg[:, week].mean():.1f} kg")
+    if goal_weight_kg is not None:
+        reached = projection.weeks_to_goal[~np.isnan(projection.weeks_to_goal)]
+        print(f"{len(reached)} of {int((arrays.goal > 0).sum())} patients reach BMI {args.goal_bmi}"
+              + (f", in a median of {np.median(reached):.0f} weeks." if len(reached) else "."))